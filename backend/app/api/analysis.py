@@ -1,44 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
+import asyncio
 import time
+import orjson
 from loguru import logger
 
+from app.api.deps import get_ai_analyzer, get_search_engine
+from app.core.cache import get_cached_json, get_generation, set_cached_json, make_cache_key, normalize_query
 from app.core.database import get_db
+from app.models.document import Document
 from app.schemas.search import (
     LegalAnalysisQuery,
     LegalAnalysisResponse
 )
 from app.services.ai_analyzer import AIAnalyzer
-from app.services.search_engine import SearchEngine
+from app.services.search_engine import SEARCH_CACHE_GENERATION_KEY, SearchEngine
 
 router = APIRouter()
 
+MAX_SYNC_ANALYSES = 5
+MAX_BATCH_ANALYSES = 1000
+
 @router.post("/legal-reasoning", response_model=LegalAnalysisResponse)
 async def perform_legal_analysis(
     analysis_query: LegalAnalysisQuery,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Perform comprehensive legal analysis using AI reasoning"""
     
+    cache_key = make_cache_key(
+        "ans:legal-reasoning",
+        await get_generation(SEARCH_CACHE_GENERATION_KEY),
+        normalize_query(analysis_query.query),
+        analysis_query.model_dump(exclude={"query"})
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        # Initialize AI analyzer
-        ai_analyzer = AIAnalyzer()
-        search_engine = SearchEngine(db)
-        
-        # Get relevant context from documents
-        if analysis_query.context_documents:
-            # Use specified documents as context
-            context_docs = await search_engine.get_documents_by_ids(
-                analysis_query.context_documents
-            )
-        else:
-            # Search for relevant documents based on query
-            search_results = await search_engine.hybrid_search(
-                query=analysis_query.query,
-                limit=10
-            )
-            context_docs = [result.chunk_text for result in search_results if result.chunk_text]
+        context_docs = await _gather_context(analysis_query, search_engine)
         
         # Perform AI analysis
         analysis_result = await ai_analyzer.perform_legal_reasoning(
@@ -49,28 +54,114 @@ async def perform_legal_analysis(
             include_counterarguments=analysis_query.include_counterarguments
         )
         
-        logger.info(f"Legal analysis completed for query: {analysis_query.query[:50]}...")
+        logger.info("Legal analysis completed for query: {}...", analysis_query.query[:50])
         
+        # An answer without context is canned; don't let it outlive newly added documents
+        if context_docs:
+            await set_cached_json(cache_key, analysis_result.model_dump(mode="json"))
         return analysis_result
         
     except Exception as e:
         logger.error(f"Legal analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail="Legal analysis failed")
 
+@router.post("/legal-reasoning/stream")
+async def stream_legal_analysis(
+    analysis_query: LegalAnalysisQuery,
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
+):
+    """Stream a legal analysis as server-sent events
+    
+    Emits ``delta`` events with text as the model generates it, then a
+    ``result`` event carrying the same body as /legal-reasoning.
+    """
+    
+    cache_key = make_cache_key(
+        "ans:legal-reasoning",
+        await get_generation(SEARCH_CACHE_GENERATION_KEY),
+        normalize_query(analysis_query.query),
+        analysis_query.model_dump(exclude={"query"})
+    )
+    cached = await get_cached_json(cache_key)
+    
+    # Gather context before streaming starts, so lookup failures still get an HTTP error
+    if cached is None:
+        try:
+            context_docs = await _gather_context(analysis_query, search_engine)
+        except Exception as e:
+            logger.error(f"Legal analysis error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Legal analysis failed")
+    
+    async def events():
+        if cached is not None:
+            yield _sse_event("result", cached)
+            return
+        
+        try:
+            async for event in ai_analyzer.stream_legal_reasoning(
+                query=analysis_query.query,
+                context=context_docs,
+                analysis_type=analysis_query.analysis_type,
+                include_citations=analysis_query.include_citations,
+                include_counterarguments=analysis_query.include_counterarguments
+            ):
+                if event["type"] == "delta":
+                    yield _sse_event("delta", {"content": event["content"]})
+                else:
+                    result = event["result"].model_dump(mode="json")
+                    logger.info("Streamed legal analysis completed for query: {}...", analysis_query.query[:50])
+                    if context_docs:
+                        await set_cached_json(cache_key, result)
+                    yield _sse_event("result", result)
+        except Exception as e:
+            logger.error(f"Streamed legal analysis error: {str(e)}")
+            yield _sse_event("error", {"detail": "Legal analysis failed"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # identity keeps GZipMiddleware from buffering the events until the stream ends
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"}
+    )
+
+async def _gather_context(analysis_query: LegalAnalysisQuery, search_engine: SearchEngine) -> List[str]:
+    """Context texts for a reasoning query: the requested documents, or the best search hits"""
+    if analysis_query.context_documents:
+        # Use specified documents as context
+        return await search_engine.get_documents_by_ids(analysis_query.context_documents)
+    
+    # Search for relevant documents based on query
+    query_embedding = await search_engine.embed_query(analysis_query.query)
+    search_results = await search_engine.hybrid_search(
+        query=analysis_query.query,
+        limit=10,
+        query_embedding=query_embedding
+    )
+    return [result.chunk_text for result in search_results if result.chunk_text]
+
+def _sse_event(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
 @router.post("/document-summary/{document_id}")
 async def generate_document_summary(
     document_id: int,
     summary_type: str = "comprehensive",  # comprehensive, executive, key_points
     max_length: int = 1000,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Generate AI-powered summary of a specific document"""
     
+    cache_key = make_cache_key(
+        "ans:document-summary", await get_generation(SEARCH_CACHE_GENERATION_KEY), document_id, summary_type, max_length
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ai_analyzer = AIAnalyzer()
-        
         # Get document content
-        search_engine = SearchEngine(db)
         document_content = await search_engine.get_document_content(document_id)
         
         if not document_content:
@@ -83,29 +174,117 @@ async def generate_document_summary(
             max_length=max_length
         )
         
-        return {
+        response = {
             "document_id": document_id,
             "summary_type": summary_type,
             "summary": summary,
             "generated_at": time.time()
         }
+        if summary:
+            await set_cached_json(cache_key, response)
+        
+        return response
         
     except Exception as e:
         logger.error(f"Document summary error: {str(e)}")
         raise HTTPException(status_code=500, detail="Document summary generation failed")
 
+@router.post("/document-analysis")
+async def analyze_documents(
+    document_ids: List[int],
+    run_async: bool = Query(False, alias="async"),
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
+):
+    """Analyze documents now, or with async=true queue them on the Batch API
+    
+    Batched analyses cost less but complete within 24 hours; poll
+    /document-analysis/batches/{batch_id} for the results.
+    """
+    
+    max_documents = MAX_BATCH_ANALYSES if run_async else MAX_SYNC_ANALYSES
+    if len(document_ids) > max_documents:
+        raise HTTPException(status_code=400, detail=f"Maximum {max_documents} documents allowed")
+    
+    try:
+        contents = await search_engine.get_document_contents(document_ids)
+        documents = [
+            {"id": doc_id, "content": contents[doc_id]}
+            for doc_id in document_ids if doc_id in contents
+        ]
+        
+        if not documents:
+            raise HTTPException(status_code=404, detail="Documents not found")
+        
+        if run_async:
+            batch_id = await ai_analyzer.submit_batch(documents)
+            return {
+                "batch_id": batch_id,
+                "status": "submitted",
+                "documents_submitted": len(documents)
+            }
+        
+        analyses = await asyncio.gather(
+            *(ai_analyzer.analyze_document(document["content"]) for document in documents)
+        )
+        return {
+            "analyses": {document["id"]: analysis for document, analysis in zip(documents, analyses)},
+            "analyzed_at": time.time()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Document analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Document analysis failed")
+
+@router.get("/document-analysis/batches/{batch_id}")
+async def get_document_analysis_batch(
+    batch_id: str,
+    db: AsyncSession = Depends(get_db),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
+):
+    """Check a queued analysis batch, storing its results once it completes"""
+    
+    try:
+        batch = await ai_analyzer.get_batch_results(batch_id)
+        
+        results = batch["results"]
+        if results:
+            # One executemany UPDATE keyed by primary key
+            await db.execute(update(Document), [
+                {
+                    "id": document_id,
+                    "ai_analysis_completed": True,
+                    **({"summary": analysis["summary"]} if isinstance(analysis.get("summary"), str) else {})
+                }
+                for document_id, analysis in results.items()
+            ])
+            await db.commit()
+        
+        return {"batch_id": batch_id, **batch}
+        
+    except Exception as e:
+        logger.error(f"Batch status error for {batch_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Batch status check failed")
+
 @router.post("/extract-entities/{document_id}")
 async def extract_legal_entities(
     document_id: int,
     entity_types: Optional[List[str]] = None,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Extract legal entities from a document"""
     
+    cache_key = make_cache_key(
+        "ans:extract-entities", await get_generation(SEARCH_CACHE_GENERATION_KEY), document_id, entity_types
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ai_analyzer = AIAnalyzer()
-        search_engine = SearchEngine(db)
-        
         # Get document content
         document_content = await search_engine.get_document_content(document_id)
         
@@ -118,11 +297,15 @@ async def extract_legal_entities(
             entity_types=entity_types
         )
         
-        return {
+        response = {
             "document_id": document_id,
             "entities": entities,
             "extracted_at": time.time()
         }
+        if entities:
+            await set_cached_json(cache_key, response)
+        
+        return response
         
     except Exception as e:
         logger.error(f"Entity extraction error: {str(e)}")
@@ -132,7 +315,8 @@ async def extract_legal_entities(
 async def compare_documents(
     document_ids: List[int],
     comparison_type: str = "similarity",  # similarity, differences, legal_alignment
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Compare multiple legal documents using AI analysis"""
     
@@ -142,16 +326,20 @@ async def compare_documents(
     if len(document_ids) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 documents allowed for comparison")
     
+    cache_key = make_cache_key(
+        "ans:compare-documents", await get_generation(SEARCH_CACHE_GENERATION_KEY), document_ids, comparison_type
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ai_analyzer = AIAnalyzer()
-        search_engine = SearchEngine(db)
-        
         # Get document contents
-        documents = []
-        for doc_id in document_ids:
-            content = await search_engine.get_document_content(doc_id)
-            if content:
-                documents.append({"id": doc_id, "content": content})
+        contents = await search_engine.get_document_contents(document_ids)
+        documents = [
+            {"id": doc_id, "content": contents[doc_id]}
+            for doc_id in document_ids if doc_id in contents
+        ]
         
         if len(documents) < 2:
             raise HTTPException(status_code=404, detail="Some documents not found")
@@ -162,12 +350,16 @@ async def compare_documents(
             comparison_type=comparison_type
         )
         
-        return {
+        response = {
             "document_ids": document_ids,
             "comparison_type": comparison_type,
             "comparison_result": comparison_result,
             "compared_at": time.time()
         }
+        if comparison_result:
+            await set_cached_json(cache_key, response)
+        
+        return response
         
     except Exception as e:
         logger.error(f"Document comparison error: {str(e)}")
@@ -180,21 +372,29 @@ async def generate_legal_brief(
     jurisdiction: Optional[str] = None,
     brief_type: str = "research",  # research, argument, motion
     max_length: int = 2000,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Generate a legal brief on a specific topic"""
     
+    cache_key = make_cache_key(
+        "ans:generate-brief",
+        await get_generation(SEARCH_CACHE_GENERATION_KEY),
+        normalize_query(topic),
+        document_ids,
+        jurisdiction,
+        brief_type,
+        max_length
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ai_analyzer = AIAnalyzer()
-        search_engine = SearchEngine(db)
-        
         # Get relevant documents
         if document_ids:
-            relevant_docs = []
-            for doc_id in document_ids:
-                content = await search_engine.get_document_content(doc_id)
-                if content:
-                    relevant_docs.append(content)
+            contents = await search_engine.get_document_contents(document_ids)
+            relevant_docs = [contents[doc_id] for doc_id in document_ids if doc_id in contents]
         else:
             # Search for relevant documents
             search_results = await search_engine.hybrid_search(
@@ -213,7 +413,7 @@ async def generate_legal_brief(
             max_length=max_length
         )
         
-        return {
+        response = {
             "topic": topic,
             "brief_type": brief_type,
             "jurisdiction": jurisdiction,
@@ -221,6 +421,10 @@ async def generate_legal_brief(
             "sources_count": len(relevant_docs),
             "generated_at": time.time()
         }
+        if brief:
+            await set_cached_json(cache_key, response)
+        
+        return response
         
     except Exception as e:
         logger.error(f"Brief generation error: {str(e)}")
@@ -229,14 +433,12 @@ async def generate_legal_brief(
 @router.get("/analytics/document/{document_id}")
 async def get_document_analytics(
     document_id: int,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine),
+    ai_analyzer: AIAnalyzer = Depends(get_ai_analyzer)
 ):
     """Get analytics and insights for a specific document"""
     
     try:
-        ai_analyzer = AIAnalyzer()
-        search_engine = SearchEngine(db)
-        
         # Get document and its metadata
         document = await search_engine.get_document_by_id(document_id)
         if not document:
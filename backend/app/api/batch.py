@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, Request
+import asyncio
+from urllib.parse import unquote
+import httpx
+from loguru import logger
+
+from app.schemas.batch import (
+    BatchRequest,
+    BatchResponse,
+    BatchSubRequest,
+    BatchSubResponse
+)
+
+router = APIRouter()
+
+MAX_BATCH_REQUESTS = 20
+# Set on every sub-request so a batch can't reach this endpoint again, however its path is spelled
+SUBREQUEST_HEADER = "x-batch-subrequest"
+
+def _is_allowed_path(path: str) -> bool:
+    # httpx resolves dot segments before dispatch, so refuse them outright
+    if ".." in unquote(path).split("/"):
+        return False
+    return path.startswith("/api/") and not path.startswith("/api/v1/batch")
+
+async def _dispatch(client: httpx.AsyncClient, sub_request: BatchSubRequest) -> BatchSubResponse:
+    """Run one sub-request through the application in-process"""
+    try:
+        response = await client.request(
+            sub_request.method.upper(),
+            sub_request.path,
+            params=sub_request.params,
+            json=sub_request.body,
+            headers={SUBREQUEST_HEADER: "1"}
+        )
+        
+        if response.headers.get("content-type", "").startswith("application/json"):
+            body = response.json()
+        else:
+            body = response.text
+        
+        return BatchSubResponse(status_code=response.status_code, body=body)
+        
+    except Exception as e:
+        logger.error(f"Batch sub-request to {sub_request.path} failed: {str(e)}")
+        return BatchSubResponse(status_code=500, body={"detail": "Sub-request failed"})
+
+@router.post("/", response_model=BatchResponse)
+async def execute_batch(batch: BatchRequest, request: Request):
+    """Execute several API calls concurrently in a single round trip"""
+    
+    if SUBREQUEST_HEADER in request.headers:
+        raise HTTPException(status_code=400, detail="Batches cannot be nested")
+    
+    if len(batch.requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {MAX_BATCH_REQUESTS} requests allowed per batch"
+        )
+    
+    for key, sub_request in batch.requests.items():
+        if not _is_allowed_path(sub_request.path):
+            raise HTTPException(status_code=400, detail=f"Invalid path for request '{key}'")
+    
+    # Dispatch straight into the ASGI app: no extra sockets, and shared app state
+    transport = httpx.ASGITransport(app=request.app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://batch",
+        follow_redirects=True
+    ) as client:
+        results = await asyncio.gather(
+            *(_dispatch(client, sub_request) for sub_request in batch.requests.values())
+        )
+    
+    return BatchResponse(responses=dict(zip(batch.requests.keys(), results)))
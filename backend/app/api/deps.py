@@ -0,0 +1,27 @@
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.services.ai_analyzer import AIAnalyzer
+from app.services.document_processor import DocumentProcessor
+from app.services.search_engine import SearchEngine
+from app.services.vector_store import VectorStore
+
+def get_vector_store(request: Request) -> VectorStore:
+    """Shared vector store created at application startup"""
+    return request.app.state.vector_store
+
+def get_document_processor(request: Request) -> DocumentProcessor:
+    """Shared document processor created at application startup"""
+    return request.app.state.document_processor
+
+def get_ai_analyzer(request: Request) -> AIAnalyzer:
+    """Shared AI analyzer created at application startup"""
+    return request.app.state.ai_analyzer
+
+def get_search_engine(
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStore = Depends(get_vector_store)
+) -> SearchEngine:
+    """Request-scoped search engine bound to the shared vector store"""
+    return SearchEngine(db, vector_store=vector_store)
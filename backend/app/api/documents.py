@@ -1,40 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import shutil
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, func, text
+from datetime import datetime
+from typing import Any, List, Literal, Optional, Tuple
+import aiofiles
+import hashlib
+import os
 import uuid
 from pathlib import Path
 from loguru import logger
 
+from app.api.deps import get_document_processor, get_vector_store
 from app.core.database import get_db
 from app.core.config import settings
-from app.models.document import Document, DocumentChunk
+from app.models.document import (
+    Document,
+    DocumentChunk,
+    SearchResult,
+    delete_unreferenced_chunk_bodies,
+    document_citations
+)
 from app.schemas.document import (
     Document as DocumentSchema, 
     DocumentCreate, 
     DocumentUpdate,
     DocumentList,
     DocumentUploadResponse,
-    DocumentProcessingStatus
+    DocumentChunk as DocumentChunkSchema,
+    DocumentProcessingStatus,
+    ProcessingStatusName,
+    encode_embedding
 )
 from app.services.document_processor import DocumentProcessor
-from app.services.ai_analyzer import AIAnalyzer
+from app.services.ingestion import ingest_document
+from app.services.search_engine import invalidate_search_caches
+from app.services.vector_store import VectorStore
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # Allowance for multipart boundaries and form fields
+ALLOWED_EXTS = frozenset(settings.ALLOWED_EXTENSIONS_LOWER)
+
+async def _count_rows(db: AsyncSession, query, table_name: str, filtered: bool) -> Tuple[int, bool]:
+    """Count rows, using the planner's estimate for unfiltered Postgres tables
+    
+    Returns the count and whether it is an estimate.
+    """
+    if not filtered and db.bind.dialect.name == "postgresql":
+        estimate = (await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+            {"table": table_name}
+        )).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate), True
+    return (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one(), False
+
+async def limit_upload_size(request: Request, call_next):
+    """Reject uploads whose Content-Length is already over the limit
+    
+    Runs as middleware because form bodies are parsed before the route's
+    own size check ever sees the file.
+    """
+    if request.method == "POST" and request.url.path.endswith("/documents/upload"):
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + UPLOAD_FORM_OVERHEAD:
+            return ORJSONResponse(
+                status_code=413,
+                content={"detail": f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE} bytes"}
+            )
+    return await call_next(request)
+
+async def _get_etag_fields(db: AsyncSession, document_id: int):
+    """Read just the columns that version a document"""
+    return (await db.execute(
+        select(Document.id, Document.updated_at, Document.processing_status)
+        .where(Document.id == document_id)
+    )).first()
+
+def _document_etag(
+    document_id: int,
+    updated_at: Optional[datetime],
+    processing_status: str,
+    *variant: Any
+) -> str:
+    """Weak ETag that changes whenever the document row changes"""
+    # Microseconds, so two updates within the same second still get different tags
+    timestamp = round(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    tag = "-".join(str(part) for part in (document_id, timestamp, processing_status, *variant))
+    return f'W/"{tag}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+async def _load_document(db: AsyncSession, document_id: int) -> Optional[Document]:
+    """Load a document with its chunks, which the response schema includes"""
+    return (await db.scalars(
+        select(Document)
+        .options(selectinload(Document.chunks))
+        .where(Document.id == document_id)
+        .execution_options(populate_existing=True)
+    )).first()
+
+def _schedule_processing(
+    background_tasks: BackgroundTasks,
+    document_id: int,
+    processor: DocumentProcessor,
+    vector_store: VectorStore
+):
+    """Queue document ingestion to run after the response is sent"""
+    if settings.PROCESSING_BACKEND == "celery":
+        from app.worker import process_document_task
+        process_document_task.delay(document_id)
+    else:
+        background_tasks.add_task(ingest_document, document_id, processor, vector_store)
+
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     document_type: Optional[str] = Form(None),
     jurisdiction: Optional[str] = Form(None),
     source: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store)
 ):
     """Upload a new legal document for processing"""
     
     # Validate file type
-    if not file.filename.lower().endswith(tuple(settings.ALLOWED_EXTENSIONS)):
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTS:
         raise HTTPException(
             status_code=400,
             detail=f"File type not allowed. Supported types: {settings.ALLOWED_EXTENSIONS}"
@@ -43,7 +145,7 @@ async def upload_document(
     # Validate file size
     if file.size and file.size > settings.MAX_FILE_SIZE:
         raise HTTPException(
-            status_code=400,
+            status_code=413,
             detail=f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE} bytes"
         )
     
@@ -53,21 +155,36 @@ async def upload_document(
         upload_dir.mkdir(exist_ok=True)
         
         # Generate unique filename
-        file_extension = Path(file.filename).suffix
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = upload_dir / unique_filename
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream file to disk without blocking the event loop, hashing and
+        # enforcing the size limit as chunks arrive
+        hasher = hashlib.sha256()
+        bytes_written = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                bytes_written += len(chunk)
+                if bytes_written > settings.MAX_FILE_SIZE:
+                    break
+                hasher.update(chunk)
+                await buffer.write(chunk)
+        
+        if bytes_written > settings.MAX_FILE_SIZE:
+            file_path.unlink(missing_ok=True)
+            raise HTTPException(
+                status_code=413,
+                detail=f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE} bytes"
+            )
         
         # Create document record
         document = Document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=str(file_path),
-            file_size=file.size or 0,
-            file_type=file_extension.lower(),
+            file_size=bytes_written,
+            file_type=file_extension,
+            file_hash=hasher.hexdigest(),
             title=title or file.filename,
             document_type=document_type,
             jurisdiction=jurisdiction,
@@ -76,11 +193,11 @@ async def upload_document(
         )
         
         db.add(document)
-        db.commit()
-        db.refresh(document)
+        await db.commit()
+        await invalidate_search_caches()
         
         # Start background processing
-        # TODO: Implement Celery task for async processing
+        _schedule_processing(background_tasks, document.id, processor, vector_store)
         logger.info(f"Document uploaded successfully: {document.id}")
         
         return DocumentUploadResponse(
@@ -90,81 +207,124 @@ async def upload_document(
             processing_status="pending"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail="Error uploading document")
 
 @router.get("/", response_model=DocumentList)
 async def list_documents(
-    page: int = 1,
-    per_page: int = 20,
+    cursor: Optional[int] = None,
+    per_page: int = Query(20, ge=1, le=100),
+    with_total: bool = False,
     document_type: Optional[str] = None,
     jurisdiction: Optional[str] = None,
-    processing_status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    processing_status: Optional[ProcessingStatusName] = None,
+    filename: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all documents with optional filtering"""
+    """List documents newest first with optional filtering
+    
+    Uses keyset pagination: pass the returned next_cursor as cursor to fetch
+    the following page.
+    """
     
-    query = db.query(Document)
+    query = select(Document)
     
     # Apply filters
     if document_type:
-        query = query.filter(Document.document_type == document_type)
+        query = query.where(Document.document_type == document_type)
     if jurisdiction:
-        query = query.filter(Document.jurisdiction == jurisdiction)
+        query = query.where(Document.jurisdiction == jurisdiction)
     if processing_status:
-        query = query.filter(Document.processing_status == processing_status)
+        query = query.where(Document.processing_status == processing_status)
+    if filename:
+        # Case-insensitive; served by the lower(original_filename) index
+        query = query.where(func.lower(Document.original_filename) == filename.lower())
     
-    # Get total count
-    total = query.count()
+    # Counting is a full scan, so only do it on request
+    total = None
+    total_estimated = False
+    if with_total:
+        filtered = bool(document_type or jurisdiction or processing_status or filename)
+        total, total_estimated = await _count_rows(db, query, Document.__tablename__, filtered)
     
-    # Apply pagination
-    offset = (page - 1) * per_page
-    documents = query.offset(offset).limit(per_page).all()
+    # Seek past the cursor instead of scanning and discarding an offset;
+    # fetch one extra row to know whether another page exists
+    if cursor is not None:
+        query = query.where(Document.id < cursor)
+    documents = (await db.scalars(
+        query.order_by(Document.id.desc()).limit(per_page + 1)
+    )).all()
+    
+    next_cursor = None
+    if len(documents) > per_page:
+        documents = documents[:per_page]
+        next_cursor = documents[-1].id
     
     return DocumentList(
         documents=documents,
         total=total,
-        page=page,
-        per_page=per_page
+        total_estimated=total_estimated,
+        per_page=per_page,
+        next_cursor=next_cursor
     )
 
 @router.get("/{document_id}", response_model=DocumentSchema)
-async def get_document(document_id: int, db: Session = Depends(get_db)):
+async def get_document(
+    document_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
     """Get a specific document by ID"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    # Check the version first so unchanged documents skip loading chunks
+    version = await _get_etag_fields(db, document_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    etag = _document_etag(*version)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    document = await _load_document(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    response.headers["ETag"] = etag
     return document
 
 @router.put("/{document_id}", response_model=DocumentSchema)
 async def update_document(
     document_id: int,
     document_update: DocumentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update document metadata"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Update fields
-    for field, value in document_update.dict(exclude_unset=True).items():
+    for field, value in document_update.model_dump(exclude_unset=True).items():
         setattr(document, field, value)
     
-    db.commit()
-    db.refresh(document)
+    await db.commit()
+    await invalidate_search_caches()
     
-    return document
+    # Reload to pick up server-side updated_at along with the chunks
+    return await _load_document(db, document_id)
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a document and its associated data"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = (await db.execute(
+        select(Document.id, Document.file_path).where(Document.id == document_id)
+    )).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -174,9 +334,20 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
         if file_path.exists():
             file_path.unlink()
         
-        # Delete database record (cascades to chunks)
-        db.delete(document)
-        db.commit()
+        # Delete database rows in bulk rather than loading every chunk into the session
+        await db.execute(delete(SearchResult).where(SearchResult.document_id == document_id))
+        chunk_bodies = (await db.scalars(
+            delete(DocumentChunk).where(
+                DocumentChunk.document_id == document_id
+            ).returning(DocumentChunk.text_sha256)
+        )).all()
+        # Bodies are shared between chunks; drop the ones only this document used
+        if chunk_bodies:
+            await db.execute(delete_unreferenced_chunk_bodies(chunk_bodies))
+        await db.execute(delete(document_citations).where(document_citations.c.document_id == document_id))
+        await db.execute(delete(Document).where(Document.id == document_id))
+        await db.commit()
+        await invalidate_search_caches()
         
         logger.info(f"Document deleted successfully: {document_id}")
         return {"message": "Document deleted successfully"}
@@ -186,10 +357,18 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error deleting document")
 
 @router.post("/{document_id}/process")
-async def process_document(document_id: int, db: Session = Depends(get_db)):
+async def process_document(
+    document_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    processor: DocumentProcessor = Depends(get_document_processor),
+    vector_store: VectorStore = Depends(get_vector_store)
+):
     """Manually trigger document processing"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = (await db.execute(
+        select(Document.id, Document.processing_status).where(Document.id == document_id)
+    )).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -198,10 +377,13 @@ async def process_document(document_id: int, db: Session = Depends(get_db)):
     
     try:
         # Update status to processing
-        document.processing_status = "processing"
-        db.commit()
+        await db.execute(
+            update(Document).where(Document.id == document_id).values(processing_status="processing")
+        )
+        await db.commit()
         
-        # TODO: Trigger async processing task
+        # Extract, chunk and index after the response has been sent
+        _schedule_processing(background_tasks, document_id, processor, vector_store)
         logger.info(f"Document processing started: {document_id}")
         
         return {"message": "Document processing started", "document_id": document_id}
@@ -211,13 +393,34 @@ async def process_document(document_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error starting document processing")
 
 @router.get("/{document_id}/status", response_model=DocumentProcessingStatus)
-async def get_processing_status(document_id: int, db: Session = Depends(get_db)):
+async def get_processing_status(
+    document_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
     """Get document processing status"""
     
-    document = db.query(Document).filter(Document.id == document_id).first()
+    # Only the status columns are needed, not the full row
+    document = (await db.execute(
+        select(
+            Document.id,
+            Document.updated_at,
+            Document.processing_status,
+            Document.text_extracted,
+            Document.embeddings_generated,
+            Document.ai_analysis_completed
+        ).where(Document.id == document_id)
+    )).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Pollers get an empty 304 until the status changes
+    etag = _document_etag(document.id, document.updated_at, document.processing_status)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
     # Calculate progress percentage
     progress = 0.0
     if document.text_extracted:
@@ -239,26 +442,74 @@ async def get_processing_status(document_id: int, db: Session = Depends(get_db))
 @router.get("/{document_id}/chunks")
 async def get_document_chunks(
     document_id: int,
-    page: int = 1,
-    per_page: int = 10,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = None,
+    per_page: int = Query(10, ge=1, le=100),
+    with_total: bool = False,
+    include_embeddings: bool = False,
+    embedding_format: Literal["base64", "json"] = Query("base64", alias="format"),
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStore = Depends(get_vector_store)
 ):
-    """Get chunks for a specific document"""
+    """Get chunks for a specific document in order
     
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
+    Uses keyset pagination on chunk_index: pass the returned next_cursor as
+    cursor to fetch the following page. With include_embeddings, each chunk
+    carries its vector as base64-encoded little-endian float32 bytes
+    (embedding_b64), or as a float list (embedding) with format=json.
+    """
+    
+    version = await _get_etag_fields(db, document_id)
+    if not version:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    query = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id)
-    total = query.count()
+    # Chunks are only rewritten by processing, which changes the document row
+    etag = _document_etag(
+        *version, cursor, per_page, int(with_total),
+        embedding_format if include_embeddings else "none"
+    )
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    query = select(DocumentChunk).where(DocumentChunk.document_id == document_id)
+    total = None
+    if with_total:
+        total = (await db.execute(
+            select(func.count()).select_from(query.subquery())
+        )).scalar_one()
     
-    offset = (page - 1) * per_page
-    chunks = query.offset(offset).limit(per_page).all()
+    if cursor is not None:
+        query = query.where(DocumentChunk.chunk_index > cursor)
+    chunks = (await db.scalars(
+        query.order_by(DocumentChunk.chunk_index).limit(per_page + 1)
+    )).all()
+    
+    next_cursor = None
+    if len(chunks) > per_page:
+        chunks = chunks[:per_page]
+        next_cursor = chunks[-1].chunk_index
+    
+    # Serialize through the schema; the rows also carry binary columns (hashes, quantized vectors)
+    chunk_schemas = [DocumentChunkSchema.model_validate(chunk) for chunk in chunks]
+    
+    if include_embeddings:
+        embeddings = await vector_store.get_chunk_embeddings(
+            [chunk.vector_id for chunk in chunks if chunk.vector_id]
+        )
+        for chunk, chunk_schema in zip(chunks, chunk_schemas):
+            vector = embeddings.get(chunk.vector_id)
+            if vector is not None:
+                if embedding_format == "json":
+                    chunk_schema.embedding = vector.tolist()
+                else:
+                    chunk_schema.embedding_b64 = encode_embedding(vector)
     
     return {
         "document_id": document_id,
-        "chunks": chunks,
+        "chunks": chunk_schemas,
         "total": total,
-        "page": page,
-        "per_page": per_page
+        "per_page": per_page,
+        "next_cursor": next_cursor
     } 
\ No newline at end of file
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional, Dict, Any
 import time
+import orjson
 from loguru import logger
 
-from app.core.database import get_db
+from app.api.deps import get_search_engine
+from app.core.cache import (
+    get_cached_json,
+    set_cached_json,
+    get_cached_raw,
+    set_cached_raw,
+    get_generation,
+    make_cache_key,
+    normalize_query
+)
 from app.schemas.search import (
     SearchQuery,
     SearchResponse,
@@ -12,7 +21,8 @@ from app.schemas.search import (
     CitationSearch,
     CitationResult
 )
-from app.services.search_engine import SearchEngine
+from app.services.search_engine import SEARCH_CACHE_GENERATION_KEY, SearchEngine
+from app.services.search_log import log_search
 from app.services.vector_store import VectorStore
 
 router = APIRouter()
@@ -20,15 +30,35 @@ router = APIRouter()
 @router.post("/", response_model=SearchResponse)
 async def search_documents(
     search_query: SearchQuery,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Perform document search using semantic, keyword, or hybrid approach"""
     
     start_time = time.time()
     
+    cache_key = make_cache_key(
+        "ans:search",
+        await get_generation(SEARCH_CACHE_GENERATION_KEY),
+        normalize_query(search_query.query),
+        search_query.model_dump(exclude={"query"})
+    )
+    # Cached responses are stored as encoded JSON and sent back untouched
+    cached = await get_cached_raw(cache_key)
+    if cached is not None:
+        # Still count the search in analytics
+        results = orjson.loads(cached)["results"]
+        log_search(
+            search_query.query,
+            [SearchResult.model_construct(**result) for result in results],
+            search_query.search_type
+        )
+        return Response(content=cached, media_type="application/json")
+    
     try:
-        # Initialize search engine
-        search_engine = SearchEngine(db)
+        # Embed the query through the shared batcher for vector-backed searches
+        query_embedding = None
+        if search_query.search_type in ("semantic", "hybrid"):
+            query_embedding = await search_engine.embed_query(search_query.query)
         
         # Perform search based on type
         if search_query.search_type == "semantic":
@@ -36,7 +66,8 @@ async def search_documents(
                 query=search_query.query,
                 limit=search_query.limit,
                 offset=search_query.offset,
-                filters=search_query.filters
+                filters=search_query.filters,
+                query_embedding=query_embedding
             )
         elif search_query.search_type == "keyword":
             results = await search_engine.keyword_search(
@@ -50,7 +81,8 @@ async def search_documents(
                 query=search_query.query,
                 limit=search_query.limit,
                 offset=search_query.offset,
-                filters=search_query.filters
+                filters=search_query.filters,
+                query_embedding=query_embedding
             )
         
         search_time_ms = (time.time() - start_time) * 1000
@@ -58,9 +90,9 @@ async def search_documents(
         # Generate search suggestions
         suggestions = await search_engine.get_search_suggestions(search_query.query)
         
-        logger.info(f"Search completed: {len(results)} results in {search_time_ms:.2f}ms")
+        logger.info("Search completed: {} results in {:.2f}ms", len(results), search_time_ms)
         
-        return SearchResponse(
+        response = SearchResponse(
             query=search_query.query,
             results=results,
             total_results=len(results),
@@ -70,6 +102,15 @@ async def search_documents(
             suggestions=suggestions
         )
         
+        # Encode once in pydantic-core; returning a Response skips FastAPI's
+        # re-validation and jsonable_encoder pass over every result
+        body = response.model_dump_json()
+        # An empty or partial response from a failed search must not outlive the failure
+        if not search_engine.search_failed:
+            await set_cached_raw(cache_key, body)
+        
+        return Response(content=body, media_type="application/json")
+        
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail="Search failed")
@@ -78,15 +119,24 @@ async def search_documents(
 async def get_search_suggestions(
     query: str = Query(..., min_length=2),
     limit: int = Query(5, ge=1, le=10),
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Get search suggestions based on partial query"""
     
+    cache_key = make_cache_key(
+        "ans:suggestions", await get_generation(SEARCH_CACHE_GENERATION_KEY), normalize_query(query), limit
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        search_engine = SearchEngine(db)
         suggestions = await search_engine.get_search_suggestions(query, limit)
         
-        return {"suggestions": suggestions}
+        response = {"suggestions": suggestions}
+        if not search_engine.search_failed:
+            await set_cached_json(cache_key, response)
+        return response
         
     except Exception as e:
         logger.error(f"Error getting suggestions: {str(e)}")
@@ -95,12 +145,11 @@ async def get_search_suggestions(
 @router.post("/citations", response_model=List[CitationResult])
 async def search_citations(
     citation_search: CitationSearch,
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Search for specific legal citations in documents"""
     
     try:
-        search_engine = SearchEngine(db)
         results = await search_engine.search_citations(
             citation=citation_search.citation,
             exact_match=citation_search.exact_match
@@ -113,11 +162,10 @@ async def search_citations(
         raise HTTPException(status_code=500, detail="Citation search failed")
 
 @router.get("/filters")
-async def get_available_filters(db: Session = Depends(get_db)):
+async def get_available_filters(search_engine: SearchEngine = Depends(get_search_engine)):
     """Get available filter options for search"""
     
     try:
-        search_engine = SearchEngine(db)
         filters = await search_engine.get_available_filters()
         
         return filters
@@ -130,12 +178,11 @@ async def get_available_filters(db: Session = Depends(get_db)):
 async def find_similar_documents(
     document_id: int,
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Find documents similar to a given document"""
     
     try:
-        search_engine = SearchEngine(db)
         similar_docs = await search_engine.find_similar_documents(
             document_id=document_id,
             limit=limit
@@ -151,12 +198,11 @@ async def find_similar_documents(
 async def get_trending_searches(
     limit: int = Query(10, ge=1, le=20),
     timeframe: str = Query("week", regex="^(day|week|month)$"),
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Get trending search queries"""
     
     try:
-        search_engine = SearchEngine(db)
         trending = await search_engine.get_trending_searches(limit, timeframe)
         
         return {"trending_searches": trending}
@@ -169,15 +215,24 @@ async def get_trending_searches(
 async def autocomplete_search(
     query: str = Query(..., min_length=1),
     limit: int = Query(10, ge=1, le=20),
-    db: Session = Depends(get_db)
+    search_engine: SearchEngine = Depends(get_search_engine)
 ):
     """Get autocomplete suggestions for search queries"""
     
+    cache_key = make_cache_key(
+        "ans:autocomplete", await get_generation(SEARCH_CACHE_GENERATION_KEY), normalize_query(query), limit
+    )
+    cached = await get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        search_engine = SearchEngine(db)
         suggestions = await search_engine.get_autocomplete_suggestions(query, limit)
         
-        return {"suggestions": suggestions}
+        response = {"suggestions": suggestions}
+        if not search_engine.search_failed:
+            await set_cached_json(cache_key, response)
+        return response
         
     except Exception as e:
         logger.error(f"Autocomplete error: {str(e)}")
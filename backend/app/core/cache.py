@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import time
+import zlib
+from typing import Any, List, Optional, Union
+import numpy as np
+import orjson
+import redis.asyncio as redis
+from cachetools import TTLCache
+from loguru import logger
+
+from app.core.config import settings
+from app.services.batching import AsyncBatcher
+
+# Back off for a while after a Redis failure so requests don't each pay a connect timeout
+_RETRY_AFTER_SECONDS = 30
+
+_redis_client: Optional[redis.Redis] = None
+_disabled_until = 0.0
+
+# Hot entries are served from process memory; cached values are never
+# invalidated early, so the only staleness is the shorter local TTL
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.LOCAL_CACHE_MAX_ENTRIES,
+    ttl=settings.LOCAL_CACHE_TTL_SECONDS
+)
+
+def get_redis() -> Optional[redis.Redis]:
+    """Return the shared Redis client, or None while caching is unavailable"""
+    global _redis_client
+    if not settings.CACHE_ENABLED or time.monotonic() < _disabled_until:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5
+        )
+    return _redis_client
+
+async def close_redis():
+    """Close the shared client; the next get_redis() opens one on the running loop
+    
+    The client is bound to the event loop it was first used on, so code that runs
+    each job under its own asyncio.run() (the Celery worker) must close it per job.
+    """
+    global _redis_client
+    if _redis_client is not None:
+        client, _redis_client = _redis_client, None
+        await client.aclose()
+
+def _mark_unavailable(error: Exception):
+    global _disabled_until
+    _disabled_until = time.monotonic() + _RETRY_AFTER_SECONDS
+    logger.warning(f"Redis cache unavailable, bypassing for {_RETRY_AFTER_SECONDS}s: {str(error)}")
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different queries share a cache entry"""
+    return " ".join(query.split())
+
+def make_cache_key(prefix: str, *parts: Any) -> str:
+    """Build a cache key from a prefix and a SHA1 of the JSON-encoded parts"""
+    payload = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS, default=str)
+    return f"{prefix}:{hashlib.sha1(payload).hexdigest()}"
+
+async def _mget(keys: List[str]) -> List[Optional[bytes]]:
+    """Fetch a batch of coalesced lookups with one MGET"""
+    client = get_redis()
+    if client is None:
+        return [None] * len(keys)
+    try:
+        return await client.mget(keys)
+    except Exception as e:
+        _mark_unavailable(e)
+        return [None] * len(keys)
+
+_get_batcher = AsyncBatcher(_mget, max_batch_size=256, max_queue_time_ms=settings.CACHE_BATCH_WINDOW_MS)
+
+async def get_cached_raw(key: str) -> Optional[bytes]:
+    """Fetch a cached value as raw bytes, returning None on miss or cache failure
+    
+    Checks the in-process tier first; concurrent Redis lookups are coalesced
+    into a single MGET.
+    """
+    value = _local_cache.get(key)
+    if value is not None:
+        return value
+    if get_redis() is None:
+        return None
+    
+    value = await _get_batcher.process(key)
+    if value is not None:
+        _local_cache[key] = value
+    return value
+
+async def set_cached_raw(key: str, value: Union[bytes, str], ttl: int = settings.CACHE_TTL_SECONDS):
+    """Store an already-encoded value with a TTL"""
+    if not settings.CACHE_ENABLED:
+        return
+    if isinstance(value, str):
+        value = value.encode()
+    _local_cache[key] = value
+    
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl)
+    except Exception as e:
+        _mark_unavailable(e)
+
+async def get_cached_json(key: str) -> Optional[Any]:
+    """Fetch a cached JSON value, returning None on miss or cache failure"""
+    value = await get_cached_raw(key)
+    return orjson.loads(value) if value is not None else None
+
+async def set_cached_json(key: str, value: Any, ttl: int = settings.CACHE_TTL_SECONDS):
+    """Store a JSON-serializable value with a TTL"""
+    await set_cached_raw(key, orjson.dumps(value, default=str), ttl)
+
+async def get_cached_compressed_json(key: str) -> Optional[Any]:
+    """Fetch a value stored by set_cached_compressed_json, straight from Redis"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        value = await client.get(key)
+    except Exception as e:
+        _mark_unavailable(e)
+        return None
+    if value is None:
+        return None
+    return orjson.loads(await asyncio.to_thread(zlib.decompress, value))
+
+async def set_cached_compressed_json(key: str, value: Any, ttl: int, max_bytes: int):
+    """Store a large JSON value zlib-compressed in Redis only
+    
+    Skips the in-process tier, which is bounded by entry count rather than
+    size, and values still over ``max_bytes`` once compressed.
+    """
+    client = get_redis()
+    if client is None:
+        return
+    payload = await asyncio.to_thread(zlib.compress, orjson.dumps(value, default=str))
+    if len(payload) > max_bytes:
+        logger.debug("Not caching {}: {} bytes compressed", key, len(payload))
+        return
+    try:
+        await client.set(key, payload, ex=ttl)
+    except Exception as e:
+        _mark_unavailable(e)
+
+def _embedding_key(model: str, text: str) -> str:
+    return f"emb:{model}:{hashlib.sha1(normalize_query(text).encode()).hexdigest()}"
+
+async def get_cached_embedding(model: str, text: str) -> Optional[np.ndarray]:
+    """Fetch a cached embedding vector (stored as float16)"""
+    value = await get_cached_raw(_embedding_key(model, text))
+    if value is None:
+        return None
+    return np.frombuffer(value, dtype=np.float16).astype(np.float32)
+
+async def set_cached_embedding(
+    model: str,
+    text: str,
+    embedding: np.ndarray,
+    ttl: int = settings.CACHE_TTL_SECONDS
+):
+    """Store an embedding vector as float16 bytes to halve its footprint"""
+    await set_cached_raw(_embedding_key(model, text), np.asarray(embedding, dtype=np.float16).tobytes(), ttl)
+
+async def get_generation(key: str) -> int:
+    """Current value of an invalidation counter, 0 when unset or Redis is unavailable
+    
+    Read from Redis on every call (bypassing the in-process tier) so a bump in
+    any process is seen at once; including it in cache keys retires old entries.
+    """
+    if get_redis() is None:
+        return 0
+    value = await _get_batcher.process(key)
+    return int(value) if value is not None else 0
+
+async def bump_generation(key: str):
+    """Advance an invalidation counter, retiring every entry keyed on it"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.incr(key)
+    except Exception as e:
+        _mark_unavailable(e)
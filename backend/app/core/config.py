@@ -1,5 +1,6 @@
+from functools import cached_property, lru_cache
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
 
 class Settings(BaseSettings):
@@ -20,6 +21,7 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./legal_docs.db"
     
     # Vector Database Configuration  
+    CHROMA_MODE: str = "local"  # "local" (embedded, ./chroma_db) or "http" (CHROMA_HOST:CHROMA_PORT)
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8001
     CHROMA_COLLECTION_NAME: str = "legal_documents"
@@ -27,6 +29,22 @@ class Settings(BaseSettings):
     # OpenRouter API Configuration
     OPENROUTER_API_KEY: Optional[str] = None
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_MAX_CONCURRENCY: int = 8  # In-flight completions per process
+    OPENROUTER_BATCH_WINDOW_MS: int = 20  # Window for coalescing same-model requests
+    OPENROUTER_PROMPT_CACHING: bool = True  # Mark system prompts cacheable (cache_control)
+    OPENROUTER_PAD_REASONING_PROMPT: bool = False  # Append the legal glossary so the reasoning prompt reaches the caching minimum
+    OPENROUTER_MERGE_BATCHES: bool = False  # Answer batched same-prompt queries in one numbered completion
+    OPENROUTER_MERGE_WINDOW_MS: int = 250  # Batch window when merging
+    OPENROUTER_MAX_OUTPUT_TOKENS: int = 4096  # Largest merged completion to request
+    OPENROUTER_CONTEXT_TOKENS: int = 200_000  # Context window of the configured models
+    OPENROUTER_REQUESTS_PER_MINUTE: int = 500  # Client-side rate limit per process
+    OPENROUTER_MAX_RETRIES: int = 4  # Retries for rate-limited or overloaded completions
+    OPENROUTER_MAX_RETRY_DELAY_SECONDS: float = 60.0  # Cap on Retry-After and backoff waits
+    
+    # Batch API Configuration (OpenAI-compatible, for offline bulk analyses)
+    BATCH_API_BASE_URL: str = "https://api.openai.com/v1"
+    BATCH_API_KEY: Optional[str] = None
+    BATCH_ANALYSIS_MODEL: str = "gpt-4o-mini"
     
     # AI Model Configuration
     DOCUMENT_ANALYSIS_MODEL: str = "anthropic/claude-3-sonnet"
@@ -36,26 +54,55 @@ class Settings(BaseSettings):
     # File Storage
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
-    ALLOWED_EXTENSIONS: List[str] = [".pdf", ".docx", ".txt"]
+    ALLOWED_EXTENSIONS: Tuple[str, ...] = (".pdf", ".docx", ".txt")
     
     # Processing Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     MAX_TOKENS_PER_CHUNK: int = 512
+    SEMANTIC_CHUNK_THRESHOLD: float = 0.3  # Adjacent-sentence similarity below which a chunk may end
+    SEMANTIC_CHUNK_MIN_SIZE: int = 200  # Words a chunk needs before it can end at a topic shift
+    CPU_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)  # Process pool size for CPU-bound work
+    PROCESSING_BACKEND: str = "background"  # "background" (in-process) or "celery"
     
     # Search Configuration
     DEFAULT_SEARCH_RESULTS: int = 10
     MAX_SEARCH_RESULTS: int = 50
+    SEARCH_LOG_STREAM: str = "search:log"  # Redis Stream buffering search analytics
+    SEARCH_LOG_STREAM_MAXLEN: int = 100_000  # Approximate cap; oldest entries are trimmed
+    SEARCH_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
     
     # Redis Configuration (for caching and queues)
     REDIS_URL: str = "redis://localhost:6379"
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_SECONDS: int = 3600
+    LOCAL_CACHE_MAX_ENTRIES: int = 10_000  # In-process tier in front of Redis
+    LOCAL_CACHE_TTL_SECONDS: int = 300
+    CACHE_BATCH_WINDOW_MS: float = 2  # Window for coalescing concurrent GETs into one MGET
+    EXTRACTION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # Extracted chunks of uploaded files, keyed by file hash
+    EXTRACTION_CACHE_MAX_BYTES: int = 8 * 1024 * 1024  # Larger extractions (after compression) aren't cached
+    FILTERS_CACHE_TTL_SECONDS: int = 300  # Search filter options, per process
+    SEMANTIC_CACHE_ENABLED: bool = True  # Reuse AI answers for near-duplicate queries
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Minimum cosine similarity for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500  # Recent entries compared per scope
     
     # Elasticsearch Configuration
     ELASTICSEARCH_URL: str = "http://localhost:9200"
     ELASTICSEARCH_INDEX: str = "legal_documents"
     
+    @cached_property
+    def ALLOWED_EXTENSIONS_LOWER(self) -> Tuple[str, ...]:
+        """Lower-cased extensions, ready for str.endswith"""
+        return tuple(ext.lower() for ext in self.ALLOWED_EXTENSIONS)
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings instance"""
+    return Settings()
+
+settings = get_settings()
+ 
\ No newline at end of file
@@ -1,24 +1,63 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from typing import AsyncIterator
 from app.core.config import settings
 
-# Create engine
+# Async drivers used for request handling, keyed by backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg"
+}
+
+def _async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed during bulk chunk inserts and batches fsyncs
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+# Sync engine, used for table creation and standalone scripts
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
 )
 
+# Async engine, used by the API so DB I/O doesn't block the event loop
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+    **({} if engine.dialect.name == "sqlite" else {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_recycle": 300
+    })
+)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create Base class
-Base = declarative_base()
+class Base(DeclarativeBase):
+    # Fetch server-generated values (timestamps, computed columns) via RETURNING on flush
+    __mapper_args__ = {"eager_defaults": True}
+
+def dialect_insert(session):
+    """Dialect-specific insert() for the session's engine, supporting ON CONFLICT"""
+    return postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
 
 # Dependency to get database session
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
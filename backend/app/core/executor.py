@@ -0,0 +1,36 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import functools
+from loguru import logger
+
+from app.core.config import settings
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def start_process_pool():
+    """Create the shared process pool for CPU-bound work"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.CPU_WORKERS)
+        logger.info(f"Process pool started with {settings.CPU_WORKERS} workers")
+
+def shutdown_process_pool():
+    """Stop the shared process pool, dropping any queued work"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def has_process_pool() -> bool:
+    """Whether run_cpu_bound will use worker processes rather than threads"""
+    return _process_pool is not None
+
+async def run_cpu_bound(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a picklable CPU-bound function without blocking the event loop
+
+    Uses the process pool when the app has started it, otherwise falls back to
+    the default thread pool (e.g. in standalone scripts).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_process_pool, functools.partial(fn, *args))
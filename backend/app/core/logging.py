@@ -8,12 +8,15 @@ def setup_logging():
     # Remove default handler
     logger.remove()
     
-    # Console logging
+    # Console logging (written from a background thread, off the request path)
     logger.add(
         sys.stdout,
         level="DEBUG" if settings.DEBUG else "INFO",
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        colorize=True
+        colorize=True,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
     )
     
     # File logging
@@ -21,9 +24,11 @@ def setup_logging():
         "logs/app.log",
         rotation="10 MB",
         retention="10 days",
+        compression="gz",
         level="INFO",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        enqueue=True
+        enqueue=True,
+        diagnose=False
     )
     
     # Error file logging
@@ -31,9 +36,11 @@ def setup_logging():
         "logs/errors.log",
         rotation="10 MB",
         retention="30 days",
+        compression="gz",
         level="ERROR",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        enqueue=True
+        enqueue=True,
+        diagnose=False
     )
     
     logger.info("Logging configured successfully") 
\ No newline at end of file
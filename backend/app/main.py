@@ -1,13 +1,22 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from pathlib import Path
 
-from app.api import documents, search, analysis
+from app.api import documents, search, analysis, batch
+from app.core.cache import close_redis
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base
 from app.core.logging import setup_logging
+from app.core.executor import start_process_pool, shutdown_process_pool
+from app.services.ai_analyzer import AIAnalyzer, close_http_client
+from app.services.document_processor import DocumentProcessor
+from app.services.search_log import SearchLogFlusher
+from app.services.semantic_cache import SemanticCache
+from app.services.vector_store import VectorStore
 
 # Setup logging
 setup_logging()
@@ -20,7 +29,8 @@ app = FastAPI(
     description="AI-powered legal document search and analysis platform",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -32,6 +42,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refuse oversized uploads before their bodies are read
+app.middleware("http")(documents.limit_upload_size)
+
+# Compress larger responses such as briefs and document comparisons
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Mount static files
 static_path = Path("static")
 static_path.mkdir(exist_ok=True)
@@ -41,6 +57,30 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
 app.include_router(search.router, prefix="/api/search", tags=["search"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["analysis"])
+app.include_router(batch.router, prefix="/api/v1/batch", tags=["batch"])
+
+@app.on_event("startup")
+async def startup():
+    start_process_pool()
+    
+    # Load models and clients once per process and share them across requests
+    app.state.vector_store = VectorStore()
+    semantic_cache = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        semantic_cache = SemanticCache("reasoning", embed_fn=app.state.vector_store.embed_query)
+    app.state.ai_analyzer = AIAnalyzer(semantic_cache=semantic_cache)
+    app.state.document_processor = DocumentProcessor()
+    
+    app.state.search_log_flusher = SearchLogFlusher()
+    app.state.search_log_flusher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.search_log_flusher.stop()
+    await close_http_client()
+    await close_redis()
+    await async_engine.dispose()
+    shutdown_process_pool()
 
 @app.get("/")
 async def root():
@@ -1,97 +1,298 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Float
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import CheckConstraint, Column, Computed, DDL, Integer, SmallInteger, String, Text, DateTime, Boolean, ForeignKey, JSON, Float, Index, LargeBinary, Table, delete, event, exists, select
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime
+import hashlib
+from enum import IntEnum
+from typing import Iterable, List, Optional
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func, literal_column
 from app.core.database import Base
 
+# Binary JSONB on Postgres (indexable with GIN), plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+def gin_index(name: str, column: str) -> Index:
+    """GIN index for JSONB containment queries, only created on Postgres"""
+    return Index(name, column, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+def brin_index(name: str, column: str) -> Index:
+    """BRIN index for append-ordered timestamps, only created on Postgres"""
+    return Index(
+        name,
+        column,
+        postgresql_using="brin",
+        postgresql_with={"pages_per_range": 32}
+    ).ddl_if(dialect="postgresql")
+
+# Text search configuration for chunk full-text search; inlined as a constant so
+# queries match the expression index
+TEXT_SEARCH_CONFIG = literal_column("'english'")
+
+def text_search_vector(column):
+    """to_tsvector expression matching the chunk full-text index"""
+    return func.to_tsvector(TEXT_SEARCH_CONFIG, column)
+
+class ProcessingStatus(IntEnum):
+    PENDING = 0
+    PROCESSING = 1
+    COMPLETED = 2
+    FAILED = 3
+
+class ProcessingStatusType(TypeDecorator):
+    """Stores a processing status name ("pending", ...) as a small integer"""
+    impl = SmallInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return int(ProcessingStatus[value.upper()])
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return ProcessingStatus(value).name.lower()
+
+class EmbeddingModel(Base):
+    __tablename__ = "embedding_models"
+    
+    id: Mapped[int] = mapped_column(Integer().with_variant(SmallInteger, "postgresql"), primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True)
+    dim: Mapped[Optional[int]] = mapped_column(Integer)
+
+def normalize_citation(citation: str) -> str:
+    """Lowercase and collapse whitespace so equivalent citations share one row"""
+    return " ".join(citation.lower().split())
+
+class Citation(Base):
+    __tablename__ = "citations"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text: Mapped[str] = mapped_column(String(500))  # Citation as first seen
+    text_norm: Mapped[str] = mapped_column(String(500), unique=True)  # See normalize_citation
+    
+    __table_args__ = (
+        # Trigram GIN for ILIKE '%...%' and % similarity lookups
+        Index(
+            "ix_citations_text_norm_trgm",
+            "text_norm",
+            postgresql_using="gin",
+            postgresql_ops={"text_norm": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+event.listen(
+    Citation.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+# Which citations each document contains
+document_citations = Table(
+    "document_citations",
+    Base.metadata,
+    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True),
+    Column("citation_id", Integer, ForeignKey("citations.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key covers document -> citations; this covers citation -> documents
+    Index("ix_document_citations_citation_document", "citation_id", "document_id"),
+)
+
 class Document(Base):
     __tablename__ = "documents"
     
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String(255), nullable=False)
-    original_filename = Column(String(255), nullable=False)
-    file_path = Column(String(500), nullable=False)
-    file_size = Column(Integer, nullable=False)
-    file_type = Column(String(50), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    filename: Mapped[str] = mapped_column(String(255))
+    original_filename: Mapped[str] = mapped_column(String(255))
+    file_path: Mapped[str] = mapped_column(Text)
+    file_size: Mapped[int] = mapped_column(Integer)
+    file_type: Mapped[str] = mapped_column(String(50))
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # SHA-256 of file contents
     
     # Document metadata
-    title = Column(String(500))
-    document_type = Column(String(100))  # court_decision, statute, regulation, etc.
-    jurisdiction = Column(String(100))
-    date_published = Column(DateTime)
-    source = Column(String(200))
+    title: Mapped[Optional[str]] = mapped_column(Text)
+    document_type: Mapped[Optional[str]] = mapped_column(String(100))  # court_decision, statute, regulation, etc.
+    jurisdiction: Mapped[Optional[str]] = mapped_column(String(100))
+    date_published: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    source: Mapped[Optional[str]] = mapped_column(Text)
     
     # Processing status
-    processing_status = Column(String(50), default="pending")  # pending, processing, completed, failed
-    text_extracted = Column(Boolean, default=False)
-    embeddings_generated = Column(Boolean, default=False)
-    ai_analysis_completed = Column(Boolean, default=False)
+    processing_status: Mapped[Optional[str]] = mapped_column(ProcessingStatusType(), default="pending")  # pending, processing, completed, failed
+    text_extracted: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    embeddings_generated: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    ai_analysis_completed: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
     
     # AI-generated metadata
-    legal_concepts = Column(JSON)  # List of extracted legal concepts
-    citations = Column(JSON)  # List of legal citations found
-    summary = Column(Text)  # AI-generated summary
-    key_points = Column(JSON)  # List of key legal points
+    legal_concepts: Mapped[Optional[List[str]]] = mapped_column(JSONType)  # List of extracted legal concepts
+    citations: Mapped[Optional[List[str]]] = mapped_column(JSONType)  # List of legal citations found
+    summary: Mapped[Optional[str]] = mapped_column(Text)  # AI-generated summary
+    key_points: Mapped[Optional[List[str]]] = mapped_column(JSONType)  # List of key legal points
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
-    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
-    search_results = relationship("SearchResult", back_populates="document")
+    chunks: Mapped[List["DocumentChunk"]] = relationship(
+        "DocumentChunk",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        order_by="DocumentChunk.chunk_index",
+        lazy="raise"  # Load explicitly with selectinload
+    )
+    search_results: Mapped[List["SearchResult"]] = relationship(back_populates="document", lazy="raise")
+    
+    __table_args__ = (
+        gin_index("ix_documents_legal_concepts_gin", "legal_concepts"),
+        gin_index("ix_documents_citations_gin", "citations"),
+        # Matches the search filter order: type, then jurisdiction, then date range
+        Index("ix_documents_type_jurisdiction_date", "document_type", "jurisdiction", "date_published"),
+        # Dates rise with insertion order, so tiny BRIN indexes prune time-range scans
+        brin_index("ix_documents_date_published_brin", "date_published"),
+        brin_index("ix_documents_created_at_brin", "created_at"),
+        # Case-insensitive filename lookups
+        Index("ix_documents_original_filename_lower", func.lower(original_filename)),
+        # Free-form text columns are TEXT; these keep the old width limits as validation
+        CheckConstraint("length(file_path) <= 500", name="ck_documents_file_path_length"),
+        CheckConstraint("length(title) <= 500", name="ck_documents_title_length"),
+        CheckConstraint("length(source) <= 200", name="ck_documents_source_length"),
+    )
+
+def chunk_text_sha256(text: str) -> bytes:
+    """Content address of a chunk body"""
+    return hashlib.sha256(text.encode()).digest()
+
+class ChunkBody(Base):
+    __tablename__ = "chunk_bodies"
+    
+    sha256: Mapped[bytes] = mapped_column(LargeBinary(32), primary_key=True)  # See chunk_text_sha256
+    text: Mapped[str] = mapped_column(Text)
+    
+    # Computed by the database on insert; chunk text is whitespace-normalized to single spaces
+    word_count: Mapped[Optional[int]] = mapped_column(Integer, Computed(
+        """CASE WHEN trim("text") = '' THEN 0 """
+        """ELSE length(trim("text")) - length(replace(trim("text"), ' ', '')) + 1 END""",
+        persisted=True
+    ))
+    char_count: Mapped[Optional[int]] = mapped_column(Integer, Computed('length("text")', persisted=True))
+    
+    __table_args__ = (
+        # Full-text GIN index for keyword search; see text_search_vector
+        Index(
+            "ix_chunk_bodies_text_fts",
+            text_search_vector(text),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
     
-    id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
-    
-    # Chunk content
-    text = Column(Text, nullable=False)
-    chunk_index = Column(Integer, nullable=False)  # Order within document
-    page_number = Column(Integer)
-    section_title = Column(String(200))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"))
     
-    # Chunk metadata
-    word_count = Column(Integer)
-    char_count = Column(Integer)
+    # Chunk content; the text itself lives in chunk_bodies, stored once per distinct body
+    text_sha256: Mapped[bytes] = mapped_column(LargeBinary(32), ForeignKey("chunk_bodies.sha256"))
+    chunk_index: Mapped[int] = mapped_column(Integer)  # Order within document
+    page_number: Mapped[Optional[int]] = mapped_column(Integer)
+    section_title: Mapped[Optional[str]] = mapped_column(Text)
     
-    # Vector embeddings (stored as JSON for simplicity)
-    embedding = Column(JSON)  # Vector embedding
-    embedding_model = Column(String(100))  # Model used for embedding
+    # Vector embeddings live in the ChromaDB collection, not in this row
+    vector_id: Mapped[Optional[str]] = mapped_column(String(100), unique=True, index=True)  # ID in the vector store
+    embedding_sq8: Mapped[Optional[bytes]] = mapped_column(LargeBinary)  # float32 min/max header + uint8 codes
+    embedding_binary: Mapped[Optional[bytes]] = mapped_column(LargeBinary)  # Sign bits, 8 dimensions per byte
+    embedding_model_id: Mapped[Optional[int]] = mapped_column(SmallInteger, ForeignKey("embedding_models.id"))  # Model used for embedding
     
     # AI analysis
-    legal_concepts = Column(JSON)  # Legal concepts in this chunk
-    citations = Column(JSON)  # Citations found in this chunk
-    importance_score = Column(Float)  # AI-assigned importance score
-    chunk_summary = Column(Text)  # AI-generated chunk summary
+    legal_concepts: Mapped[Optional[List[str]]] = mapped_column(JSONType)  # Legal concepts in this chunk
+    citations: Mapped[Optional[List[str]]] = mapped_column(JSONType)  # Citations found in this chunk
+    importance_score: Mapped[Optional[float]] = mapped_column(Float)  # AI-assigned importance score
+    chunk_summary: Mapped[Optional[str]] = mapped_column(Text)  # AI-generated chunk summary
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Timestamps; chunks are replaced rather than updated, so updated_at isn't bumped on UPDATE
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    document = relationship("Document", back_populates="chunks")
+    document: Mapped["Document"] = relationship(back_populates="chunks", lazy="raise")  # Load explicitly with joinedload
+    body: Mapped["ChunkBody"] = relationship(lazy="joined", innerjoin=True)  # Text is read with every chunk
+    
+    word_count = association_proxy("body", "word_count")
+    char_count = association_proxy("body", "char_count")
+    
+    @hybrid_property
+    def text(self) -> str:
+        return self.body.text
+    
+    @text.inplace.setter
+    def _text_setter(self, value: str):
+        self.body = ChunkBody(sha256=chunk_text_sha256(value), text=value)
+        self.text_sha256 = self.body.sha256
+    
+    @text.inplace.expression
+    @classmethod
+    def _text_expression(cls):
+        # Correlated lookup; hot queries join ChunkBody and filter on its text directly
+        return select(ChunkBody.text).where(ChunkBody.sha256 == cls.text_sha256).scalar_subquery()
+    
+    __table_args__ = (
+        gin_index("ix_document_chunks_legal_concepts_gin", "legal_concepts"),
+        gin_index("ix_document_chunks_citations_gin", "citations"),
+        # Chunk listing, content assembly and reprocessing all go by document in order
+        Index("ix_document_chunks_document_chunk_index", "document_id", "chunk_index"),
+        # Finds the chunks still using a body when unlinked bodies are garbage collected
+        Index("ix_document_chunks_text_sha256", "text_sha256"),
+        CheckConstraint("length(section_title) <= 200", name="ck_document_chunks_section_title_length"),
+    )
+
+def delete_unreferenced_chunk_bodies(sha256s: Iterable[bytes]):
+    """DELETE for those of the given chunk bodies that no chunk references any more
+    
+    Run after unlinking chunks, in the same transaction, so a deleted
+    document's text doesn't outlive it.
+    """
+    return delete(ChunkBody).where(
+        ChunkBody.sha256.in_(set(sha256s)),
+        ~exists().where(DocumentChunk.text_sha256 == ChunkBody.sha256)
+    )
+
+class QueryLog(Base):
+    __tablename__ = "queries"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text_sha1: Mapped[bytes] = mapped_column(LargeBinary(20), unique=True)  # SHA-1 of the query text
+    text: Mapped[str] = mapped_column(Text)
+    
+    # Timestamps
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 class SearchResult(Base):
     __tablename__ = "search_results"
     
-    id = Column(Integer, primary_key=True, index=True)
-    query = Column(Text, nullable=False)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
-    chunk_id = Column(Integer, ForeignKey("document_chunks.id"))
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    query_id: Mapped[int] = mapped_column(Integer, ForeignKey("queries.id"))
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"))
+    chunk_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("document_chunks.id"))
     
     # Search scores
-    semantic_score = Column(Float)  # Semantic similarity score
-    keyword_score = Column(Float)  # Keyword matching score
-    final_score = Column(Float)  # Combined final score
+    semantic_score: Mapped[Optional[float]] = mapped_column(Float)  # Semantic similarity score
+    keyword_score: Mapped[Optional[float]] = mapped_column(Float)  # Keyword matching score
+    final_score: Mapped[Optional[float]] = mapped_column(Float)  # Combined final score
     
     # Search metadata
-    search_type = Column(String(50))  # semantic, keyword, hybrid
+    search_type: Mapped[Optional[str]] = mapped_column(String(50))  # semantic, keyword, hybrid
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    document = relationship("Document", back_populates="search_results")
-    chunk = relationship("DocumentChunk") 
\ No newline at end of file
+    document: Mapped["Document"] = relationship(back_populates="search_results", lazy="raise")
+    chunk: Mapped[Optional["DocumentChunk"]] = relationship(lazy="raise")
+    query: Mapped["QueryLog"] = relationship(lazy="raise")
+    
+    __table_args__ = (
+        Index("ix_search_results_query_score", "query_id", "final_score"),
+        Index("ix_search_results_document_chunk", "document_id", "chunk_id"),
+    ) 
\ No newline at end of file
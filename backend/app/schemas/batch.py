@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+class BatchSubRequest(BaseModel):
+    path: str  # e.g. "/api/search/filters"
+    method: str = "GET"
+    params: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: Dict[str, BatchSubRequest]  # Keyed by a client-chosen name
+
+class BatchSubResponse(BaseModel):
+    status_code: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: Dict[str, BatchSubResponse]
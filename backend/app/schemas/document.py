@@ -1,6 +1,14 @@
-from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
+import base64
+import numpy as np
+
+def encode_embedding(vector) -> str:
+    """Base64 of the vector's little-endian float32 bytes"""
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode()
+
+ProcessingStatusName = Literal["pending", "processing", "completed", "failed"]
 
 class DocumentBase(BaseModel):
     title: Optional[str] = None
@@ -15,13 +23,15 @@ class DocumentCreate(DocumentBase):
     file_type: str
 
 class DocumentUpdate(DocumentBase):
-    processing_status: Optional[str] = None
+    processing_status: Optional[ProcessingStatusName] = None
     legal_concepts: Optional[List[str]] = None
     citations: Optional[List[str]] = None
     summary: Optional[str] = None
     key_points: Optional[List[str]] = None
 
 class DocumentChunk(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     chunk_index: int
     text: str
@@ -34,17 +44,22 @@ class DocumentChunk(BaseModel):
     importance_score: Optional[float] = None
     chunk_summary: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    # Only populated on request; base64 float32 by default, or a float list
+    embedding_b64: Optional[str] = None
+    embedding: Optional[List[float]] = None
 
-class Document(DocumentBase):
+class DocumentSummary(DocumentBase):
+    """Document fields without chunks, for listings"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     filename: str
     original_filename: str
     file_path: str
     file_size: int
     file_type: str
-    processing_status: str
+    file_hash: Optional[str] = None
+    processing_status: ProcessingStatusName
     text_extracted: bool
     embeddings_generated: bool
     ai_analysis_completed: bool
@@ -54,26 +69,26 @@ class Document(DocumentBase):
     key_points: Optional[List[str]] = None
     created_at: datetime
     updated_at: datetime
+
+class Document(DocumentSummary):
     chunks: Optional[List[DocumentChunk]] = None
-    
-    class Config:
-        from_attributes = True
 
 class DocumentList(BaseModel):
-    documents: List[Document]
-    total: int
-    page: int
+    documents: List[DocumentSummary]
+    total: Optional[int] = None  # Only populated when requested with with_total
+    total_estimated: bool = False  # True when total is the planner's row estimate
     per_page: int
+    next_cursor: Optional[int] = None  # Pass as cursor to fetch the next page
 
 class DocumentUploadResponse(BaseModel):
     message: str
     document_id: int
     filename: str
-    processing_status: str
+    processing_status: ProcessingStatusName
 
 class DocumentProcessingStatus(BaseModel):
     document_id: int
-    processing_status: str
+    processing_status: ProcessingStatusName
     text_extracted: bool
     embeddings_generated: bool
     ai_analysis_completed: bool
@@ -1,25 +1,15 @@
-from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 
 class SearchQuery(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     query: str
-    search_type: str = "hybrid"  # semantic, keyword, hybrid
+    search_type: Literal["semantic", "keyword", "hybrid"] = "hybrid"
     filters: Optional[Dict[str, Any]] = None
-    limit: int = 10
-    offset: int = 0
-    
-    @validator('search_type')
-    def validate_search_type(cls, v):
-        if v not in ['semantic', 'keyword', 'hybrid']:
-            raise ValueError('search_type must be one of: semantic, keyword, hybrid')
-        return v
-    
-    @validator('limit')
-    def validate_limit(cls, v):
-        if v > 50:
-            raise ValueError('limit cannot exceed 50')
-        return v
+    limit: int = Field(10, ge=0, le=50)
+    offset: int = Field(0, ge=0)
 
 class SearchFilter(BaseModel):
     document_type: Optional[List[str]] = None
@@ -56,7 +46,7 @@ class SearchResponse(BaseModel):
 class LegalAnalysisQuery(BaseModel):
     query: str
     context_documents: Optional[List[int]] = None  # Document IDs for context
-    analysis_type: str = "general"  # general, case_law, statute, precedent
+    analysis_type: Literal["general", "case_law", "statute", "precedent"] = "general"
     include_citations: bool = True
     include_counterarguments: bool = True
 
@@ -1,30 +1,379 @@
-import openai
+import hashlib
+import io
 import httpx
-import json
-from typing import List, Dict, Any, Optional
+import orjson
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from aiolimiter import AsyncLimiter
 from loguru import logger
 import asyncio
+import random
 import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from itertools import islice
 
 from app.core.config import settings
+from app.core.executor import run_cpu_bound
 from app.schemas.search import LegalAnalysisResponse
+from app.services.batching import AsyncBatcher
+from app.services import prompts
+from app.services.semantic_cache import SemanticCache
+from app.services.tokens import count_tokens, fit_context, fit_tokens
 
-class AIAnalyzer:
-    """Handles AI-powered document analysis and legal reasoning using OpenRouter"""
+# Patterns used when parsing model output, compiled once
+NUMBERED_LINE_PATTERN = re.compile(r'^\d+\.')
+REASONING_STEP_PATTERN = re.compile(r'^(First|Second|Third|Fourth|Fifth|Next|Finally)', re.IGNORECASE)
+# Braces and whole string literals, so braces inside JSON strings aren't counted
+JSON_TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+REASONING_WORD_PATTERN = re.compile(r'therefore|because', re.IGNORECASE)
+CONFIDENCE_KEYWORD_PATTERN = re.compile(r'(?P<citation>citation)|(?P<authority>precedent|case law|statute)', re.IGNORECASE)
+KEY_POINT_PREFIXES = ('•', '-', '*', 'Key point', 'Important', 'Note that')
+
+# Shared across analyzer instances so bursts stay within provider concurrency
+_completion_semaphore = asyncio.Semaphore(settings.OPENROUTER_MAX_CONCURRENCY)
+_completion_limiter = AsyncLimiter(settings.OPENROUTER_REQUESTS_PER_MINUTE, 60)
+_completion_batchers: Dict[Tuple[str, str], AsyncBatcher] = {}
+
+# Completion payloads are encoded with orjson rather than httpx's stdlib json path
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Rate limited or temporarily overloaded; worth retrying after a pause
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's Retry-After if given, else jittered backoff"""
+    retry_after = response.headers.get("Retry-After")
+    delay = None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            # Retry-After may also be an HTTP date
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                pass
+    if delay is None:
+        delay = 0.5 * 2 ** attempt + random.uniform(0, 1)
+    return min(max(delay, 0.0), settings.OPENROUTER_MAX_RETRY_DELAY_SECONDS)
+
+async def _post_completion(client: httpx.AsyncClient, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """POST a single chat completion request to OpenRouter, retrying rate limits and overloads"""
+    content = orjson.dumps(payload)
+    for attempt in range(settings.OPENROUTER_MAX_RETRIES + 1):
+        async with _completion_limiter, _completion_semaphore:
+            response = await client.post(
+                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
+                content=content,
+                headers=JSON_HEADERS
+            )
+        
+        if response.status_code not in RETRYABLE_STATUS_CODES or attempt == settings.OPENROUTER_MAX_RETRIES:
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        
+        # Wait outside the semaphore so other requests can use the slot
+        delay = _retry_delay(response, attempt)
+        logger.warning(f"OpenRouter returned {response.status_code}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+async def _stream_completion(client: httpx.AsyncClient, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """POST a streaming chat completion request, yielding each SSE chunk as it arrives
     
-    def __init__(self):
-        # Configure OpenAI client for OpenRouter
-        openai.api_key = settings.OPENROUTER_API_KEY
-        openai.api_base = settings.OPENROUTER_BASE_URL
-        
-        # HTTP client for direct API calls
-        self.http_client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                "HTTP-Referer": "https://legal-ai-platform.com",
-                "X-Title": "Legal Document Analysis Platform"
+    Rate limits and overloads are retried before the stream starts, like _post_completion.
+    """
+    content = orjson.dumps({**payload, "stream": True})
+    for attempt in range(settings.OPENROUTER_MAX_RETRIES + 1):
+        async with _completion_limiter, _completion_semaphore:
+            async with client.stream(
+                "POST",
+                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
+                content=content,
+                headers=JSON_HEADERS
+            ) as response:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == settings.OPENROUTER_MAX_RETRIES:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        # Skip blank separators and ": keep-alive" comment frames
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        yield orjson.loads(data)
+                    return
+                
+                delay = _retry_delay(response, attempt)
+        
+        logger.warning(f"OpenRouter returned {response.status_code}, retrying stream in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+async def _post_completion_batch(requests: List[Tuple[httpx.AsyncClient, Dict[str, Any]]]) -> List[Any]:
+    """Dispatch a burst of queued completion requests in parallel"""
+    return await asyncio.gather(
+        *(_post_completion(client, payload) for client, payload in requests),
+        return_exceptions=True
+    )
+
+def _with_cache_control(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mark the first system message as a cacheable prompt prefix
+    
+    Uses OpenRouter's content-block form so providers that support prompt
+    caching serve the stable system prompt from cache on repeat calls.
+    """
+    cached = list(messages)
+    for i, message in enumerate(cached):
+        if message["role"] != "system":
+            continue
+        if isinstance(message["content"], str):
+            cached[i] = {
+                **message,
+                "content": [{
+                    "type": "text",
+                    "text": message["content"],
+                    "cache_control": {"type": "ephemeral"}
+                }]
             }
+        break
+    return cached
+
+# Token budgets for document text in each kind of prompt
+REASONING_CONTEXT_TOKENS = 6000
+DOCUMENT_INPUT_TOKENS = 1500
+SUMMARY_INPUT_TOKENS = 2000
+COMPARISON_INPUT_TOKENS = 3000
+BRIEF_CONTEXT_TOKENS = 6000
+# Allowance for the fixed prompt text around the budgeted content
+PROMPT_OVERHEAD_TOKENS = 200
+
+# Document text shorter than this has nothing worth sending to a model
+MIN_DOCUMENT_CHARS = 20
+INSUFFICIENT_CONTEXT_ANALYSIS = (
+    "No relevant legal documents were found for this query, so no analysis could be grounded in sources. "
+    "Try rephrasing the query or selecting context documents."
+)
+
+def _is_trivial(text: Optional[str]) -> bool:
+    """Whether text is too short to be worth a model call"""
+    return not text or len(text.strip()) < MIN_DOCUMENT_CHARS
+
+def _has_context(query: str, context: List[str]) -> bool:
+    """Whether a reasoning request has a query and some non-blank context to ground it"""
+    return bool(query.strip()) and any(text.strip() for text in context)
+
+# Only near-deterministic completions are worth reusing for similar prompts
+SEMANTIC_CACHE_MAX_TEMPERATURE = 0.3
+REASONING_TEMPERATURE = 0.3
+
+# Running prompt token totals, for logging the cache hit rate
+_prompt_tokens = {"total": 0, "cached": 0}
+
+def _record_usage(model: str, usage: Optional[Dict[str, Any]]):
+    if not usage:
+        return
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    _prompt_tokens["total"] += prompt_tokens
+    _prompt_tokens["cached"] += cached_tokens
+    logger.debug(
+        "{}: {}/{} prompt tokens cached (running hit rate {:.1%})",
+        model,
+        cached_tokens,
+        prompt_tokens,
+        _prompt_tokens["cached"] / _prompt_tokens["total"] if _prompt_tokens["total"] else 0.0
+    )
+
+MERGED_ANSWER_MARKER = re.compile(r'###(\d+)###')
+
+def _completion_message(content: str) -> Dict[str, Any]:
+    """Wrap text in the shape of a chat completion response"""
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+async def _post_merged_completion(
+    client: httpx.AsyncClient,
+    payloads: List[Dict[str, Any]]
+) -> List[Any]:
+    """Answer several single-question payloads with one numbered completion
+    
+    The payloads share a model, system prompt and temperature. Answers are
+    split on their ###N### markers; any that can't be recovered are retried
+    as individual requests.
+    """
+    questions = "\n\n".join(
+        f"{i}) {payload['messages'][-1]['content'].strip()}"
+        for i, payload in enumerate(payloads, 1)
+    )
+    merged = {
+        **payloads[0],
+        "messages": payloads[0]["messages"][:-1] + [{
+            "role": "user",
+            "content": (
+                "Answer each numbered query separately and completely. "
+                "Start each answer with ###N### where N is the query number.\n\n"
+                f"{questions}"
+            )
+        }],
+        "max_tokens": sum(payload["max_tokens"] for payload in payloads)
+    }
+    
+    result = await _post_completion(client, merged)
+    _record_usage(merged["model"], result.get("usage"))
+    content = result["choices"][0]["message"]["content"] if result.get("choices") else ""
+    
+    # re.split alternates text and captured numbers: [preamble, "1", answer, "2", answer, ...]
+    parts = MERGED_ANSWER_MARKER.split(content)
+    answers = {int(number): answer.strip() for number, answer in zip(parts[1::2], parts[2::2])}
+    
+    missing = [i for i in range(1, len(payloads) + 1) if not answers.get(i)]
+    if missing:
+        logger.warning(f"Merged completion missing {len(missing)}/{len(payloads)} answers, retrying individually")
+        retried = await _post_completion_batch([(client, payloads[i - 1]) for i in missing])
+        for i, response in zip(missing, retried):
+            answers[i] = response
+    
+    return [
+        answer if not isinstance(answer, str) else _completion_message(answer)
+        for answer in (answers[i] for i in range(1, len(payloads) + 1))
+    ]
+
+async def _post_merged_completion_batch(requests: List[Tuple[httpx.AsyncClient, Dict[str, Any]]]) -> List[Any]:
+    """Merge queued requests that share a system prompt, dispatching the rest in parallel"""
+    groups: Dict[bytes, List[int]] = {}
+    for i, (_, payload) in enumerate(requests):
+        key = orjson.dumps([payload["model"], payload["temperature"], payload["messages"][:-1]])
+        groups.setdefault(key, []).append(i)
+    
+    results: List[Any] = [None] * len(requests)
+    
+    async def dispatch(indices: List[int]):
+        client = requests[indices[0]][0]
+        payloads = [requests[i][1] for i in indices]
+        mergeable = (
+            len(indices) > 1
+            and sum(payload["max_tokens"] for payload in payloads) <= settings.OPENROUTER_MAX_OUTPUT_TOKENS
         )
+        try:
+            if mergeable:
+                responses = await _post_merged_completion(client, payloads)
+            else:
+                responses = await _post_completion_batch([requests[i] for i in indices])
+        except Exception as e:
+            responses = [e] * len(indices)
+        for i, response in zip(indices, responses):
+            results[i] = response
+    
+    await asyncio.gather(*(dispatch(indices) for indices in groups.values()))
+    return results
+
+def _get_completion_batcher(model: str, batch_key: str) -> AsyncBatcher:
+    key = (model, batch_key)
+    if key not in _completion_batchers:
+        if settings.OPENROUTER_MERGE_BATCHES:
+            _completion_batchers[key] = AsyncBatcher(
+                _post_merged_completion_batch,
+                max_batch_size=settings.OPENROUTER_MAX_CONCURRENCY,
+                max_queue_time_ms=settings.OPENROUTER_MERGE_WINDOW_MS
+            )
+        else:
+            _completion_batchers[key] = AsyncBatcher(
+                _post_completion_batch,
+                max_batch_size=settings.OPENROUTER_MAX_CONCURRENCY,
+                max_queue_time_ms=settings.OPENROUTER_BATCH_WINDOW_MS
+            )
+    return _completion_batchers[key]
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.AsyncClient:
+    """Create the process-wide OpenRouter HTTP client
+    
+    One keep-alive pool (HTTP/2, so concurrent completions multiplex over a
+    few connections) is shared by every analyzer instead of one per instance.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        headers={
+            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+            "HTTP-Referer": "https://legal-ai-platform.com",
+            "X-Title": "Legal Document Analysis Platform"
+        },
+        limits=httpx.Limits(max_connections=512, max_keepalive_connections=256, keepalive_expiry=30),
+        # Completions can take a while to generate; fail fast on connect and pool waits
+        timeout=httpx.Timeout(connect=5, read=120, write=30, pool=5)
+    )
+
+@lru_cache(maxsize=1)
+def get_batch_client() -> httpx.AsyncClient:
+    """Create the process-wide client for the offline Batch API"""
+    return httpx.AsyncClient(
+        base_url=settings.BATCH_API_BASE_URL,
+        headers={"Authorization": f"Bearer {settings.BATCH_API_KEY}"},
+        timeout=httpx.Timeout(connect=5, read=120, write=120, pool=5)
+    )
+
+async def close_http_client():
+    """Close the shared HTTP clients, e.g. on shutdown"""
+    for get_client in (get_http_client, get_batch_client):
+        if get_client.cache_info().currsize:
+            await get_client().aclose()
+            get_client.cache_clear()
+
+# Batch API states after which a batch will not change any more
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+@lru_cache(maxsize=32)
+def _build_system_prompt(analysis_type: str, include_citations: bool, include_counterarguments: bool) -> str:
+    """Build system prompt based on analysis parameters
+    
+    Memoized: the inputs span a handful of combinations, and repeat calls get
+    the identical string back for the prompt cache prefix.
+    """
+    
+    base_prompt = "You are an expert legal analyst with deep knowledge of law and legal reasoning. "
+    
+    type_prompts = {
+        "general": "Provide comprehensive legal analysis covering all relevant aspects.",
+        "case_law": "Focus on case law analysis, precedents, and judicial reasoning.",
+        "statute": "Focus on statutory interpretation, legislative intent, and regulatory analysis.",
+        "precedent": "Focus on precedential value, distinguishing cases, and legal evolution."
+    }
+    
+    analysis_prompt = type_prompts.get(analysis_type, type_prompts["general"])
+    
+    additional_instructions = []
+    if include_citations:
+        additional_instructions.append("Include relevant legal citations and references.")
+    if include_counterarguments:
+        additional_instructions.append("Consider potential counterarguments and alternative interpretations.")
+    
+    full_prompt = f"{base_prompt}{analysis_prompt}"
+    if additional_instructions:
+        full_prompt += f" {' '.join(additional_instructions)}"
+    
+    # The glossary makes the prompt long enough for providers to cache it
+    if settings.OPENROUTER_PROMPT_CACHING and settings.OPENROUTER_PAD_REASONING_PROMPT:
+        full_prompt += f"\n{prompts.LEGAL_GLOSSARY}"
+    
+    return full_prompt
+
+@lru_cache(maxsize=64)
+def _system_prompt_tokens(system_prompt: str, model: str) -> int:
+    """Token count of a system prompt; there are only a few distinct ones"""
+    return count_tokens(system_prompt, model)
+
+class AIAnalyzer:
+    """Handles AI-powered document analysis and legal reasoning using OpenRouter"""
+    
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        semantic_cache: Optional[SemanticCache] = None
+    ):
+        # Reuse the shared HTTP client unless one is injected
+        self.http_client = http_client or get_http_client()
+        
+        # Optional cache of reasoning results for near-duplicate queries
+        self.semantic_cache = semantic_cache
         
         logger.info("AIAnalyzer initialized with OpenRouter integration")
     
@@ -38,106 +387,324 @@ class AIAnalyzer:
     ) -> LegalAnalysisResponse:
         """Perform comprehensive legal analysis using AI reasoning"""
         
+        if not _has_context(query, context):
+            return self._insufficient_context_result(query)
+        
         try:
-            # Prepare context from relevant documents
-            context_text = "\n\n".join(context[:10])  # Limit context length
-            
-            # Build system prompt based on analysis type
-            system_prompt = self._build_system_prompt(analysis_type, include_citations, include_counterarguments)
-            
-            # Build user prompt
-            user_prompt = f"""
-            Legal Query: {query}
-            
-            Relevant Legal Documents and Context:
-            {context_text}
-            
-            Please provide a comprehensive legal analysis addressing the query based on the provided context.
-            """
+            # Reuse the analysis of a near-identical query over the same context,
+            # packing the prompt in a worker thread while the lookup is in flight
+            cache_scope = self._reasoning_cache_scope(
+                analysis_type, include_citations, include_counterarguments, context[:10]
+            )
+            cached, messages = await asyncio.gather(
+                self._get_cached_reasoning(query, cache_scope),
+                asyncio.to_thread(
+                    self._reasoning_messages,
+                    query, context, analysis_type, include_citations, include_counterarguments
+                )
+            )
+            if cached is not None:
+                return LegalAnalysisResponse(**{**cached, "query": query})
             
             # Make API call
             response = await self._make_openrouter_call(
                 model=settings.REASONING_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=2000
+                messages=messages,
+                temperature=REASONING_TEMPERATURE,
+                max_tokens=2000,
+                batch_key=analysis_type
             )
             
             # Parse response
             analysis_text = response.get("content", "")
             
-            # Extract structured information from response
-            key_points = self._extract_key_points(analysis_text)
-            citations = self._extract_citations_from_analysis(analysis_text)
-            precedents = self._extract_precedents(analysis_text)
-            counterarguments = self._extract_counterarguments(analysis_text) if include_counterarguments else []
-            reasoning_chain = self._extract_reasoning_chain(analysis_text)
-            
-            # Calculate confidence score
-            confidence_score = self._calculate_confidence_score(analysis_text, context)
-            
-            return LegalAnalysisResponse(
-                query=query,
-                analysis=analysis_text,
-                key_points=key_points,
-                relevant_citations=citations,
-                precedents=precedents,
-                counterarguments=counterarguments,
-                confidence_score=confidence_score,
-                sources_used=[],  # Would be populated with actual document IDs
-                reasoning_chain=reasoning_chain
+            # Extract structured information from response off the event loop
+            structure = await run_cpu_bound(
+                _extract_analysis_structure,
+                analysis_text,
+                include_counterarguments
             )
             
+            result = self._reasoning_result(query, analysis_text, context, structure)
+            
+            # Stores the parsed response, so hits skip the extraction passes too
+            if cache_scope is not None and analysis_text:
+                await self.semantic_cache.set(query, cache_scope, result.model_dump(mode="json"))
+            
+            return result
+        
         except Exception as e:
             logger.error(f"Error in legal reasoning: {str(e)}")
             raise e
     
+    async def stream_legal_reasoning(
+        self,
+        query: str,
+        context: List[str],
+        analysis_type: str = "general",
+        include_citations: bool = True,
+        include_counterarguments: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a legal analysis as it is generated
+        
+        Yields ``{"type": "delta", "content": ...}`` events for each text
+        fragment, then a single ``{"type": "result", "result": ...}`` event with
+        the full LegalAnalysisResponse. Extraction runs line by line while the
+        model is still generating, so the result follows the last token directly.
+        """
+        
+        if not _has_context(query, context):
+            yield {"type": "result", "result": self._insufficient_context_result(query)}
+            return
+        
+        cache_scope = self._reasoning_cache_scope(
+            analysis_type, include_citations, include_counterarguments, context[:10]
+        )
+        cached, messages = await asyncio.gather(
+            self._get_cached_reasoning(query, cache_scope),
+            asyncio.to_thread(
+                self._reasoning_messages,
+                query, context, analysis_type, include_citations, include_counterarguments
+            )
+        )
+        if cached is not None:
+            yield {"type": "result", "result": LegalAnalysisResponse(**{**cached, "query": query})}
+            return
+        
+        if settings.OPENROUTER_PROMPT_CACHING:
+            messages = _with_cache_control(messages)
+        
+        payload = {
+            "model": settings.REASONING_MODEL,
+            "messages": messages,
+            "temperature": REASONING_TEMPERATURE,
+            "max_tokens": 2000
+        }
+        
+        parser = AnalysisStreamParser()
+        try:
+            async for chunk in _stream_completion(self.http_client, payload):
+                # The final chunk carries usage and may have no choices
+                _record_usage(settings.REASONING_MODEL, chunk.get("usage"))
+                delta = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content")
+                if delta:
+                    parser.feed(delta)
+                    yield {"type": "delta", "content": delta}
+        except Exception as e:
+            logger.error(f"Error in streamed legal reasoning: {str(e)}")
+            raise e
+        
+        structure = parser.finish(include_counterarguments)
+        result = self._reasoning_result(query, parser.text, context, structure)
+        
+        if cache_scope is not None and parser.text:
+            await self.semantic_cache.set(query, cache_scope, result.model_dump(mode="json"))
+        
+        yield {"type": "result", "result": result}
+    
+    async def _get_cached_reasoning(self, query: str, cache_scope: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Look up a cached analysis, if reasoning results are cached at all"""
+        if cache_scope is None:
+            return None
+        return await self.semantic_cache.get(query, cache_scope)
+    
+    def _reasoning_messages(
+        self,
+        query: str,
+        context: List[str],
+        analysis_type: str,
+        include_citations: bool,
+        include_counterarguments: bool
+    ) -> List[Dict[str, Any]]:
+        """Prompt for legal reasoning, shared by the buffered and streamed paths"""
+        
+        # Build system prompt based on analysis type
+        system_prompt = self._build_system_prompt(analysis_type, include_citations, include_counterarguments)
+        
+        # Prepare context from relevant documents, sharing a token budget
+        context_text = "\n\n".join(
+            self._fit_inputs(settings.REASONING_MODEL, REASONING_CONTEXT_TOKENS, system_prompt, 2000, context[:10])
+        )
+        
+        # Build user prompt around the variable segments
+        user_prompt = "".join((
+            prompts.REASONING_QUERY_PREFIX, query,
+            prompts.REASONING_CONTEXT_HEADER, context_text,
+            prompts.REASONING_INSTRUCTIONS
+        ))
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    @staticmethod
+    def _insufficient_context_result(query: str) -> LegalAnalysisResponse:
+        """Canned response for requests with nothing to analyze, returned without a model call"""
+        return LegalAnalysisResponse(
+            query=query,
+            analysis=INSUFFICIENT_CONTEXT_ANALYSIS,
+            key_points=[],
+            relevant_citations=[],
+            precedents=[],
+            counterarguments=[],
+            confidence_score=0.0,
+            sources_used=[],
+            reasoning_chain=[]
+        )
+    
+    def _reasoning_result(
+        self,
+        query: str,
+        analysis_text: str,
+        context: List[str],
+        structure: Dict[str, List[str]]
+    ) -> LegalAnalysisResponse:
+        """Assemble the response from the analysis text and its extracted structure"""
+        return LegalAnalysisResponse(
+            query=query,
+            analysis=analysis_text,
+            key_points=structure["key_points"],
+            relevant_citations=structure["citations"],
+            precedents=structure["precedents"],
+            counterarguments=structure["counterarguments"],
+            confidence_score=self._calculate_confidence_score(analysis_text, context),
+            sources_used=[],  # Would be populated with actual document IDs
+            reasoning_chain=structure["reasoning_chain"]
+        )
+    
     async def analyze_document(self, text: str, document_type: str = "unknown") -> Dict[str, Any]:
         """Analyze a single document to extract legal metadata and insights"""
         
+        if _is_trivial(text):
+            return {}
+        
         try:
-            system_prompt = """You are a legal document analyzer. Extract and analyze the following from the provided legal text:
-            
-            1. Document type and jurisdiction
-            2. Key legal concepts and principles
-            3. Important citations and references
-            4. Main arguments and holdings
-            5. Relevant legal entities (parties, judges, etc.)
-            6. Summary of the document
-            7. Legal significance and implications
-            
-            Provide your analysis in a structured JSON format."""
-            
-            user_prompt = f"""
-            Document Type: {document_type}
-            
-            Legal Text:
-            {text[:4000]}  # Limit text length
-            
-            Please analyze this legal document and provide structured output.
-            """
-            
+            # Token-fitting the text is CPU work, so build the prompt in a worker thread
+            messages = await asyncio.to_thread(
+                self._document_analysis_messages, text, document_type, settings.DOCUMENT_ANALYSIS_MODEL
+            )
             response = await self._make_openrouter_call(
                 model=settings.DOCUMENT_ANALYSIS_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.2,
                 max_tokens=1500
             )
             
             # Parse response (try to extract JSON or structure the text)
             analysis_text = response.get("content", "")
-            return self._parse_document_analysis(analysis_text)
+            return await run_cpu_bound(AIAnalyzer._parse_document_analysis, analysis_text)
             
         except Exception as e:
             logger.error(f"Error analyzing document: {str(e)}")
             return {}
     
+    @staticmethod
+    def _document_analysis_messages(text: str, document_type: str, model: str) -> List[Dict[str, Any]]:
+        """Prompt for analyze_document, shared with the offline batch path"""
+        system_prompt = prompts.DOCUMENT_ANALYSIS_SYSTEM_PROMPT
+        
+        text = AIAnalyzer._fit_input(model, DOCUMENT_INPUT_TOKENS, system_prompt, 1500, text)
+        user_prompt = "".join((
+            prompts.DOCUMENT_TYPE_PREFIX, document_type,
+            prompts.DOCUMENT_TEXT_HEADER, text,
+            prompts.DOCUMENT_ANALYSIS_INSTRUCTIONS
+        ))
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    async def submit_batch(self, documents: List[Dict[str, Any]]) -> str:
+        """Queue document analyses on the Batch API, returning the batch id
+        
+        Each document needs an ``id`` and ``content`` (and optionally a
+        ``document_type``). Batches run within 24 hours at reduced cost; collect
+        them with get_batch_results or await_batch.
+        """
+        # Up to a thousand prompts to token-fit and encode, so keep it off the event loop
+        batch_input = await asyncio.to_thread(self._batch_input, documents)
+        
+        client = get_batch_client()
+        upload = await client.post(
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("document_analyses.jsonl", batch_input, "application/jsonl")}
+        )
+        upload.raise_for_status()
+        
+        batch = await client.post("/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        batch.raise_for_status()
+        
+        batch_id = batch.json()["id"]
+        logger.info(f"Submitted batch {batch_id} with {len(documents)} document analyses")
+        return batch_id
+    
+    @staticmethod
+    def _batch_input(documents: List[Dict[str, Any]]) -> bytes:
+        """Encode document analyses as a Batch API JSONL input file"""
+        return b"\n".join(
+            orjson.dumps({
+                "custom_id": f"doc-{document['id']}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": settings.BATCH_ANALYSIS_MODEL,
+                    "messages": AIAnalyzer._document_analysis_messages(
+                        document["content"],
+                        document.get("document_type") or "unknown",
+                        settings.BATCH_ANALYSIS_MODEL
+                    ),
+                    "temperature": 0.2,
+                    "max_tokens": 1500
+                }
+            })
+            for document in documents
+        )
+    
+    async def get_batch_results(self, batch_id: str) -> Dict[str, Any]:
+        """Check a submitted batch, returning parsed analyses keyed by document id once completed"""
+        client = get_batch_client()
+        response = await client.get(f"/batches/{batch_id}")
+        response.raise_for_status()
+        batch = response.json()
+        
+        if batch["status"] != "completed" or not batch.get("output_file_id"):
+            return {"status": batch["status"], "results": None}
+        
+        output = await client.get(f"/files/{batch['output_file_id']}/content")
+        output.raise_for_status()
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            body = (record.get("response") or {}).get("body") or {}
+            if not body.get("choices"):
+                logger.warning(f"Batch {batch_id} request {record.get('custom_id')} failed: {record.get('error')}")
+                continue
+            document_id = int(record["custom_id"].removeprefix("doc-"))
+            results[document_id] = await run_cpu_bound(
+                AIAnalyzer._parse_document_analysis,
+                body["choices"][0]["message"]["content"]
+            )
+        
+        return {"status": "completed", "results": results}
+    
+    async def await_batch(self, batch_id: str, poll_interval: float = 60) -> Dict[int, Dict[str, Any]]:
+        """Poll a submitted batch until it finishes, returning its parsed analyses"""
+        while True:
+            batch = await self.get_batch_results(batch_id)
+            if batch["status"] in BATCH_TERMINAL_STATUSES:
+                return batch["results"] or {}
+            await asyncio.sleep(poll_interval)
+    
     async def generate_document_summary(
         self,
         content: str,
@@ -146,22 +713,21 @@ class AIAnalyzer:
     ) -> str:
         """Generate AI-powered summary of a document"""
         
+        if _is_trivial(content):
+            return ""
+        
         try:
-            system_prompts = {
-                "comprehensive": "You are a legal document summarizer. Create a comprehensive summary that covers all key points, legal principles, and implications.",
-                "executive": "You are creating an executive summary for legal professionals. Focus on the most critical points and practical implications.",
-                "key_points": "You are extracting key points from a legal document. Present only the most essential legal concepts and holdings."
-            }
+            system_prompt = prompts.SUMMARY_SYSTEM_PROMPTS.get(summary_type, prompts.SUMMARY_SYSTEM_PROMPTS["comprehensive"])
             
-            system_prompt = system_prompts.get(summary_type, system_prompts["comprehensive"])
-            
-            user_prompt = f"""
-            Please create a {summary_type} summary of the following legal document (max {max_length} words):
-            
-            {content[:6000]}  # Limit content length
-            
-            Summary:
-            """
+            content = await asyncio.to_thread(
+                self._fit_input, settings.DOCUMENT_ANALYSIS_MODEL, SUMMARY_INPUT_TOKENS, system_prompt, max_length // 3, content
+            )
+            user_prompt = "".join((
+                prompts.SUMMARY_REQUEST_PREFIX, summary_type,
+                prompts.SUMMARY_REQUEST_LENGTH, str(max_length),
+                prompts.SUMMARY_REQUEST_HEADER, content,
+                prompts.SUMMARY_REQUEST_SUFFIX
+            ))
             
             response = await self._make_openrouter_call(
                 model=settings.DOCUMENT_ANALYSIS_MODEL,
@@ -170,7 +736,8 @@ class AIAnalyzer:
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=max_length // 3  # Rough token estimation
+                max_tokens=max_length // 3,  # Rough token estimation
+                batch_key=f"summary:{summary_type}"
             )
             
             return response.get("content", "")
@@ -189,19 +756,16 @@ class AIAnalyzer:
         default_types = ["parties", "judges", "courts", "statutes", "cases", "regulations"]
         types_to_extract = entity_types or default_types
         
+        if _is_trivial(content):
+            return {entity_type: [] for entity_type in types_to_extract}
+        
         try:
-            system_prompt = f"""You are a legal entity extractor. Extract the following types of entities from the legal text:
-            {', '.join(types_to_extract)}
-            
-            Return the results in JSON format with entity types as keys and lists of entities as values."""
-            
-            user_prompt = f"""
-            Extract legal entities from this text:
+            system_prompt = "".join((prompts.ENTITY_SYSTEM_PREFIX, ", ".join(types_to_extract), prompts.ENTITY_SYSTEM_SUFFIX))
             
-            {content[:4000]}
-            
-            Entities:
-            """
+            content = await asyncio.to_thread(
+                self._fit_input, settings.DOCUMENT_ANALYSIS_MODEL, DOCUMENT_INPUT_TOKENS, system_prompt, 800, content
+            )
+            user_prompt = "".join((prompts.ENTITY_REQUEST_PREFIX, content, prompts.ENTITY_REQUEST_SUFFIX))
             
             response = await self._make_openrouter_call(
                 model=settings.DOCUMENT_ANALYSIS_MODEL,
@@ -214,7 +778,7 @@ class AIAnalyzer:
             )
             
             # Parse JSON response or extract entities manually
-            return self._parse_entities_response(response.get("content", ""))
+            return await run_cpu_bound(AIAnalyzer._parse_entities_response, response.get("content", ""))
             
         except Exception as e:
             logger.error(f"Error extracting entities: {str(e)}")
@@ -228,29 +792,25 @@ class AIAnalyzer:
         """Compare multiple legal documents"""
         
         try:
-            # Prepare document texts
+            system_prompt = prompts.COMPARISON_SYSTEM_PROMPTS.get(comparison_type, prompts.COMPARISON_SYSTEM_PROMPTS["similarity"])
+            
+            # Prepare document texts, sharing a token budget
+            contents = await asyncio.to_thread(
+                self._fit_inputs,
+                settings.REASONING_MODEL, COMPARISON_INPUT_TOKENS, system_prompt, 1500, [doc["content"] for doc in documents]
+            )
             doc_texts = []
-            for i, doc in enumerate(documents):
-                doc_text = f"Document {i+1} (ID: {doc['id']}):\n{doc['content'][:2000]}\n"
+            for i, (doc, content) in enumerate(zip(documents, contents)):
+                doc_text = f"Document {i+1} (ID: {doc['id']}):\n{content}\n"
                 doc_texts.append(doc_text)
             
             combined_text = "\n\n".join(doc_texts)
             
-            system_prompts = {
-                "similarity": "You are comparing legal documents for similarities. Identify common themes, legal principles, and overlapping content.",
-                "differences": "You are comparing legal documents for differences. Highlight contrasting positions, different legal approaches, and unique aspects.",
-                "legal_alignment": "You are analyzing legal alignment between documents. Assess consistency, conflicts, and legal coherence."
-            }
-            
-            system_prompt = system_prompts.get(comparison_type, system_prompts["similarity"])
-            
-            user_prompt = f"""
-            Compare these legal documents based on {comparison_type}:
-            
-            {combined_text}
-            
-            Analysis:
-            """
+            user_prompt = "".join((
+                prompts.COMPARISON_REQUEST_PREFIX, comparison_type,
+                prompts.COMPARISON_REQUEST_HEADER, combined_text,
+                prompts.COMPARISON_REQUEST_SUFFIX
+            ))
             
             response = await self._make_openrouter_call(
                 model=settings.REASONING_MODEL,
@@ -283,30 +843,23 @@ class AIAnalyzer:
         """Generate a legal brief on a specific topic"""
         
         try:
-            # Prepare context
-            context = "\n\n".join(relevant_documents[:8])  # Limit context
-            
-            system_prompts = {
-                "research": "You are writing a legal research brief. Provide comprehensive analysis with citations and legal precedents.",
-                "argument": "You are writing a legal argument brief. Structure your argument logically with strong legal support.",
-                "motion": "You are writing a motion brief. Follow proper legal motion format and structure."
-            }
+            system_prompt = prompts.BRIEF_SYSTEM_PROMPTS.get(brief_type, prompts.BRIEF_SYSTEM_PROMPTS["research"])
             
-            system_prompt = system_prompts.get(brief_type, system_prompts["research"])
+            # Prepare context, sharing a token budget
+            fitted = await asyncio.to_thread(
+                self._fit_inputs,
+                settings.REASONING_MODEL, BRIEF_CONTEXT_TOKENS, system_prompt, max_length // 3, relevant_documents[:8]
+            )
+            context = "\n\n".join(fitted)
             
             jurisdiction_text = f" in {jurisdiction}" if jurisdiction else ""
             
-            user_prompt = f"""
-            Topic: {topic}
-            Brief Type: {brief_type}
-            Jurisdiction: {jurisdiction or "General"}
-            Max Length: {max_length} words
-            
-            Relevant Legal Sources:
-            {context}
-            
-            Please write a {brief_type} brief on "{topic}"{jurisdiction_text} based on the provided legal sources:
-            """
+            # Short header and instruction lines around one large context segment
+            user_prompt = "".join((
+                f"Topic: {topic}\nBrief Type: {brief_type}\nJurisdiction: {jurisdiction or 'General'}\nMax Length: {max_length} words",
+                prompts.BRIEF_SOURCES_HEADER, context,
+                f"\n\nPlease write a {brief_type} brief on \"{topic}\"{jurisdiction_text} based on the provided legal sources:"
+            ))
             
             response = await self._make_openrouter_call(
                 model=settings.REASONING_MODEL,
@@ -354,13 +907,21 @@ class AIAnalyzer:
     async def _make_openrouter_call(
         self,
         model: str,
-        messages: List[Dict[str, str]],
+        messages: List[Dict[str, Any]],
         temperature: float = 0.3,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        batch_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Make API call to OpenRouter"""
+        """Make API call to OpenRouter
+        
+        Calls with a ``batch_key`` are coalesced with concurrent calls for the
+        same model and key and dispatched together as one parallel burst.
+        """
         
         try:
+            if settings.OPENROUTER_PROMPT_CACHING:
+                messages = _with_cache_control(messages)
+            
             payload = {
                 "model": model,
                 "messages": messages,
@@ -368,13 +929,13 @@ class AIAnalyzer:
                 "max_tokens": max_tokens
             }
             
-            response = await self.http_client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                json=payload
-            )
+            if batch_key is not None:
+                batcher = _get_completion_batcher(model, batch_key)
+                result = await batcher.process((self.http_client, payload))
+            else:
+                result = await _post_completion(self.http_client, payload)
             
-            response.raise_for_status()
-            result = response.json()
+            _record_usage(model, result.get("usage"))
             
             if result.get("choices") and result["choices"][0].get("message"):
                 return {"content": result["choices"][0]["message"]["content"]}
@@ -386,108 +947,76 @@ class AIAnalyzer:
             logger.error(f"OpenRouter API call failed: {str(e)}")
             raise e
     
+    def _reasoning_cache_scope(
+        self,
+        analysis_type: str,
+        include_citations: bool,
+        include_counterarguments: bool,
+        context: List[str]
+    ) -> Optional[str]:
+        """Everything besides the query that shapes a reasoning response, or None if not cached"""
+        if self.semantic_cache is None or REASONING_TEMPERATURE > SEMANTIC_CACHE_MAX_TEMPERATURE:
+            return None
+        context_hash = hashlib.sha256("\0".join(context).encode()).hexdigest()
+        return f"{settings.REASONING_MODEL}:{analysis_type}:{int(include_citations)}{int(include_counterarguments)}:{context_hash}"
+    
+    @staticmethod
+    def _input_budget(model: str, budget: int, system_prompt: str, max_tokens: int) -> int:
+        """Tokens available for document text, capped so the request fits the context window"""
+        available = (
+            settings.OPENROUTER_CONTEXT_TOKENS
+            - max_tokens
+            - _system_prompt_tokens(system_prompt, model)
+            - PROMPT_OVERHEAD_TOKENS
+        )
+        return max(min(budget, available), 0)
+    
+    @staticmethod
+    def _fit_input(model: str, budget: int, system_prompt: str, max_tokens: int, text: str) -> str:
+        """Truncate text to its share of a prompt's token budget"""
+        return fit_tokens(text, AIAnalyzer._input_budget(model, budget, system_prompt, max_tokens), model)
+    
+    @staticmethod
+    def _fit_inputs(model: str, budget: int, system_prompt: str, max_tokens: int, texts: List[str]) -> List[str]:
+        """Truncate several texts to share a prompt's token budget"""
+        return fit_context(texts, AIAnalyzer._input_budget(model, budget, system_prompt, max_tokens), model)
+    
     def _build_system_prompt(self, analysis_type: str, include_citations: bool, include_counterarguments: bool) -> str:
         """Build system prompt based on analysis parameters"""
-        
-        base_prompt = "You are an expert legal analyst with deep knowledge of law and legal reasoning. "
-        
-        type_prompts = {
-            "general": "Provide comprehensive legal analysis covering all relevant aspects.",
-            "case_law": "Focus on case law analysis, precedents, and judicial reasoning.",
-            "statute": "Focus on statutory interpretation, legislative intent, and regulatory analysis.",
-            "precedent": "Focus on precedential value, distinguishing cases, and legal evolution."
-        }
-        
-        analysis_prompt = type_prompts.get(analysis_type, type_prompts["general"])
-        
-        additional_instructions = []
-        if include_citations:
-            additional_instructions.append("Include relevant legal citations and references.")
-        if include_counterarguments:
-            additional_instructions.append("Consider potential counterarguments and alternative interpretations.")
-        
-        full_prompt = f"{base_prompt}{analysis_prompt}"
-        if additional_instructions:
-            full_prompt += f" {' '.join(additional_instructions)}"
-        
-        return full_prompt
+        return _build_system_prompt(analysis_type, include_citations, include_counterarguments)
     
-    def _extract_key_points(self, text: str) -> List[str]:
+    @staticmethod
+    def _extract_key_points(text: str) -> List[str]:
         """Extract key points from analysis text"""
-        # Simple extraction based on patterns
-        lines = text.split('\n')
-        key_points = []
-        
-        for line in lines:
-            line = line.strip()
-            if (line.startswith(('•', '-', '*')) or 
-                line.startswith(('Key point', 'Important', 'Note that')) or
-                re.match(r'^\d+\.', line)):
-                key_points.append(line.lstrip('•-* '))
-        
-        return key_points[:10]  # Limit to top 10
+        return _extract_analysis_structure(text, False)["key_points"]
     
-    def _extract_citations_from_analysis(self, text: str) -> List[str]:
+    @staticmethod
+    def _extract_citations_from_analysis(text: str) -> List[str]:
         """Extract legal citations from analysis text"""
-        # Basic citation patterns
-        patterns = [
-            r'\d+\s+[A-Z][a-z]+\.?\s+\d+',
-            r'\d+\s+U\.S\.C\.?\s+§?\s*\d+',
-            r'\d+\s+F\.?\s*\d*d?\s+\d+',
-        ]
-        
-        citations = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            citations.extend(matches)
-        
-        return list(set(citations))
+        return _extract_analysis_structure(text, False)["citations"]
     
-    def _extract_precedents(self, text: str) -> List[str]:
+    @staticmethod
+    def _extract_precedents(text: str) -> List[str]:
         """Extract legal precedents from analysis text"""
-        # Look for case names and precedent indicators
-        case_pattern = r'([A-Z][a-zA-Z\s&.,-]+)\s+v\.?\s+([A-Z][a-zA-Z\s&.,-]+)'
-        matches = re.findall(case_pattern, text)
-        
-        precedents = []
-        for match in matches:
-            case_name = f"{match[0].strip()} v. {match[1].strip()}"
-            if len(case_name) < 100:
-                precedents.append(case_name)
-        
-        return list(set(precedents))
+        return _extract_analysis_structure(text, False)["precedents"]
     
-    def _extract_counterarguments(self, text: str) -> List[str]:
+    @staticmethod
+    def _extract_counterarguments(text: str) -> List[str]:
         """Extract counterarguments from analysis text"""
-        # Look for counterargument indicators
-        counter_patterns = [
-            r'However[,\s]+([^.]+\.)',
-            r'On the other hand[,\s]+([^.]+\.)',
-            r'Alternatively[,\s]+([^.]+\.)',
-            r'Critics might argue[,\s]+([^.]+\.)'
-        ]
-        
-        counterarguments = []
-        for pattern in counter_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            counterarguments.extend(matches)
-        
-        return counterarguments
+        # Lazily filter the shared scan, so it stops at the cap and skips citation bookkeeping
+        return list(islice(
+            (
+                match.group("counter_text")
+                for match in ANALYSIS_PATTERN.finditer(text)
+                if match.lastgroup == "counterargument"
+            ),
+            MAX_COUNTERARGUMENTS
+        ))
     
-    def _extract_reasoning_chain(self, text: str) -> List[str]:
+    @staticmethod
+    def _extract_reasoning_chain(text: str) -> List[str]:
         """Extract reasoning chain from analysis text"""
-        # Simple approach: look for numbered or sequential reasoning
-        lines = text.split('\n')
-        reasoning_steps = []
-        
-        for line in lines:
-            line = line.strip()
-            if (re.match(r'^(First|Second|Third|Fourth|Fifth|Next|Finally)', line, re.IGNORECASE) or
-                re.match(r'^\d+\.', line) or
-                'therefore' in line.lower() or 'because' in line.lower()):
-                reasoning_steps.append(line)
-        
-        return reasoning_steps
+        return _extract_analysis_structure(text, False)["reasoning_chain"]
     
     def _calculate_confidence_score(self, analysis: str, context: List[str]) -> float:
         """Calculate confidence score for the analysis"""
@@ -497,25 +1026,26 @@ class AIAnalyzer:
         # Increase score based on analysis quality indicators
         if len(analysis) > 500:
             score += 0.1
-        if 'citation' in analysis.lower():
-            score += 0.1
         if len(context) > 3:
             score += 0.1
-        if any(word in analysis.lower() for word in ['precedent', 'case law', 'statute']):
-            score += 0.1
+        
+        # One case-insensitive pass for both keyword groups, stopping once both are seen
+        found = set()
+        for match in CONFIDENCE_KEYWORD_PATTERN.finditer(analysis):
+            found.add(match.lastgroup)
+            if len(found) == 2:
+                break
+        score += 0.1 * len(found)
         
         return min(score, 1.0)
     
-    def _parse_document_analysis(self, analysis_text: str) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_document_analysis(analysis_text: str) -> Dict[str, Any]:
         """Parse document analysis response into structured data"""
-        # Try to extract JSON or create structure from text
-        try:
-            # Look for JSON in the response
-            json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
+        # Look for JSON in the response, else create structure from text
+        parsed = _find_json_object(analysis_text)
+        if parsed is not None:
+            return parsed
         
         # Fallback to text parsing
         return {
@@ -526,15 +1056,13 @@ class AIAnalyzer:
             "summary": analysis_text[:500] + "..." if len(analysis_text) > 500 else analysis_text
         }
     
-    def _parse_entities_response(self, response_text: str) -> Dict[str, List[str]]:
+    @staticmethod
+    def _parse_entities_response(response_text: str) -> Dict[str, List[str]]:
         """Parse entities extraction response"""
-        try:
-            # Try to extract JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-        except:
-            pass
+        # Try to extract JSON
+        parsed = _find_json_object(response_text)
+        if parsed is not None:
+            return parsed
         
         # Fallback parsing
         return {
@@ -544,4 +1072,129 @@ class AIAnalyzer:
             "statutes": [],
             "cases": [],
             "regulations": []
-        } 
\ No newline at end of file
+        } 
+
+def _find_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the first balanced JSON object embedded in model output
+    
+    Skips from brace to brace (stepping over string literals) instead of
+    greedily matching to the last brace, so prose or a second object after
+    the JSON doesn't break the parse. A candidate that isn't valid JSON is
+    skipped in favour of the next opening brace.
+    """
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        for match in JSON_TOKEN_PATTERN.finditer(text, start):
+            token = match.group()
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return orjson.loads(text[start:match.end()])
+                    except orjson.JSONDecodeError:
+                        break
+        start = text.find('{', start + 1)
+    return None
+
+# Citations, case names and counterargument sentences in one alternation, so a
+# single finditer pass classifies every match by its group name. Counterarguments
+# only consume their lead-in phrase (the sentence is captured by lookahead), so
+# citations and cases inside them are still found.
+ANALYSIS_PATTERN = re.compile(
+    r'(?P<counterargument>(?i:however|on the other hand|alternatively|critics might argue)[,\s]+(?=(?P<counter_text>[^.]+\.)))'
+    r'|(?P<usc>\d+\s+U\.S\.C\.?\s+§?\s*\d+)'
+    r'|(?P<reporter>\d+\s+[A-Z][a-z]+\.?\s+\d+)'
+    r'|(?P<federal>\d+\s+F\.?\s*\d*d?\s+\d+)'
+    r'|(?P<case>(?P<plaintiff>[A-Z][a-zA-Z\s&.,-]{0,60})\s+v\.?\s+(?P<defendant>[A-Z][a-zA-Z\s&.,-]{0,60}))'
+)
+
+# Analyses rarely raise more; beyond this they are repeated hedging
+MAX_COUNTERARGUMENTS = 20
+MAX_KEY_POINTS = 10
+
+class AnalysisExtractor:
+    """Classifies analysis text line by line into the response's structured fields
+    
+    Each line is stripped once, checked for key-point and reasoning-step
+    markers, and scanned once with ANALYSIS_PATTERN for citations, case names
+    and counterarguments, so the text is walked a single time. Matches never
+    span a line break.
+    """
+    
+    def __init__(self):
+        self._key_points: List[str] = []
+        self._reasoning_chain: List[str] = []
+        # Dicts dedupe while keeping first-seen order, so earlier mentions rank first
+        self._citations: Dict[str, None] = {}
+        self._precedents: Dict[str, None] = {}
+        self._counterarguments: List[str] = []
+    
+    def add_line(self, line: str):
+        """Classify one line of the analysis"""
+        line = line.strip()
+        if not line:
+            return
+        
+        numbered = NUMBERED_LINE_PATTERN.match(line) is not None
+        if (numbered or line.startswith(KEY_POINT_PREFIXES)) and len(self._key_points) < MAX_KEY_POINTS:
+            self._key_points.append(line.lstrip('•-* '))
+        if numbered or REASONING_STEP_PATTERN.match(line) or REASONING_WORD_PATTERN.search(line):
+            self._reasoning_chain.append(line)
+        
+        for match in ANALYSIS_PATTERN.finditer(line):
+            kind = match.lastgroup
+            if kind == "counterargument":
+                if len(self._counterarguments) < MAX_COUNTERARGUMENTS:
+                    self._counterarguments.append(match.group("counter_text"))
+            elif kind == "case":
+                case_name = f"{match.group('plaintiff').strip()} v. {match.group('defendant').strip()}"
+                if len(case_name) < 100:
+                    self._precedents[case_name] = None
+            else:
+                self._citations[match.group()] = None
+    
+    def structure(self, include_counterarguments: bool) -> Dict[str, List[str]]:
+        """The fields extracted so far"""
+        return {
+            "key_points": self._key_points,
+            "citations": list(self._citations),
+            "precedents": list(self._precedents),
+            "counterarguments": self._counterarguments if include_counterarguments else [],
+            "reasoning_chain": self._reasoning_chain
+        }
+
+def _extract_analysis_structure(analysis_text: str, include_counterarguments: bool) -> Dict[str, List[str]]:
+    """Run the extractors over a completed analysis (executed in the CPU pool)"""
+    extractor = AnalysisExtractor()
+    for line in analysis_text.split('\n'):
+        extractor.add_line(line)
+    return extractor.structure(include_counterarguments)
+
+class AnalysisStreamParser(AnalysisExtractor):
+    """Accumulates a streamed analysis and runs the extractors on each completed line"""
+    
+    def __init__(self):
+        super().__init__()
+        self._buffer = io.StringIO()
+        self._pending = ""
+    
+    @property
+    def text(self) -> str:
+        return self._buffer.getvalue()
+    
+    def feed(self, delta: str):
+        """Append a streamed fragment, extracting from any lines it completes"""
+        self._buffer.write(delta)
+        *lines, self._pending = (self._pending + delta).split('\n')
+        for line in lines:
+            self.add_line(line)
+    
+    def finish(self, include_counterarguments: bool) -> Dict[str, List[str]]:
+        """Process the trailing partial line and return the extracted structure"""
+        if self._pending:
+            self.add_line(self._pending)
+            self._pending = ""
+        return self.structure(include_counterarguments)
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+class AsyncBatcher(Generic[T, R]):
+    """Coalesces concurrent single-item calls into one batched call.
+
+    Callers await ``process(item)``; a background worker collects queued items
+    until ``max_batch_size`` is reached or ``max_queue_time_ms`` has elapsed since
+    the first item arrived, then invokes ``batch_fn`` once with the whole batch.
+    ``batch_fn`` must return one result per item, in order. A result that is an
+    exception instance is raised to that item's caller only. Batches run as
+    separate tasks, so a slow batch doesn't hold up collecting the next one.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], Awaitable[List[Any]]],
+        max_batch_size: int = 32,
+        max_queue_time_ms: float = 10
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Keep references so in-flight batches aren't garbage collected
+        self._batches: Set[asyncio.Task] = set()
+
+    async def process(self, item: T) -> R:
+        """Submit a single item and wait for its result from the next batch"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # (Re)bind to the running loop, e.g. after a reload or in tests
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_queue_time
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[T, asyncio.Future]]):
+        items = [item for item, _ in batch]
+
+        try:
+            results = await self.batch_fn(items)
+        except Exception as e:
+            logger.error(f"Batched call failed for {len(items)} items: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(results) != len(batch):
+            error = RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # Caller was cancelled
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -3,16 +3,284 @@ import pdfplumber
 import pytesseract
 from PIL import Image
 import re
-import io
-from typing import List, Dict, Tuple, Optional
+import os
+import tempfile
+import threading
+import asyncio
+import bisect
+import numpy as np
+from functools import lru_cache
+from typing import Any, List, Dict, Set, Tuple, Optional
 from pathlib import Path
 from loguru import logger
 import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from sentence_transformers import SentenceTransformer
+import ahocorasick
+from charset_normalizer import from_bytes
+from nltk.tokenize import PunktSentenceTokenizer
+
+try:
+    # In-process tesseract bindings; without them OCR shells out via pytesseract
+    from tesserocr import PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
 
 from app.core.config import settings
+from app.core.executor import has_process_pool, run_cpu_bound
 from app.models.document import Document, DocumentChunk
+from app.services.vector_store import encode_texts, get_embedding_model
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PAGE_NUMBER_PATTERN = re.compile(r'Page \d+ of \d+', re.IGNORECASE)
+# Typographic quotes and dashes folded to their ASCII forms
+PUNCTUATION_TABLE = str.maketrans({
+    '\u201c': '"',
+    '\u201d': '"',
+    '\u2018': "'",
+    '\u2019': "'",
+    '\u2014': '-',
+    '\u2013': '-'
+})
+
+# OCR output tends to lose the spaces between words and between words and numbers
+OCR_CASE_BOUNDARY_PATTERN = re.compile(r'([a-z])([A-Z])')
+OCR_WORD_NUMBER_PATTERN = re.compile(r'(\w)(\d)')
+OCR_NUMBER_WORD_PATTERN = re.compile(r'(\d)(\w)')
+
+# Citations and statutes in one pass; the group name says which list a match
+# belongs to, and U.S.C. references count as both. Specific reporters come
+# before the generic volume/reporter/page form so they win at the same position.
+REFERENCE_PATTERN = re.compile(
+    r'(?P<usc>\d+\s+U\.S\.C\.?\s+§?\s*\d+)'
+    r'|(?P<sct>\d+\s+S\.?\s*Ct\.?\s+\d+)'
+    r'|(?P<led>\d+\s+L\.?\s*Ed\.?\s*\d*d?\s+\d+)'
+    r'|(?P<federal>\d+\s+F\.?\s*\d*d?\s+\d+)'
+    r'|(?P<section>Section\s+\d+[a-z]?)'
+    r'|(?P<symbol>§\s*\d+[a-z]?)'
+    r'|(?P<reporter>\d+\s+[A-Z][a-z]+\.?\s+\d+)',
+    re.IGNORECASE
+)
+CITATION_GROUPS = frozenset({'usc', 'sct', 'led', 'federal', 'reporter'})
+STATUTE_GROUPS = frozenset({'usc', 'section', 'symbol'})
+
+# Full dates come before bare years; a full date's year is recorded as well
+DATE_PATTERN = re.compile(
+    r'(?P<full>\b\d{1,2}/\d{1,2}/\d{4}\b'
+    r'|\b\d{1,2}-\d{1,2}-\d{4}\b'
+    r'|\b[A-Za-z]+ \d{1,2}, \d{4}\b)'
+    r'|(?P<year>\b\d{4}\b)'
+)
+
+CASE_NAME_PATTERN = re.compile(r'([A-Z][a-zA-Z\s&.,-]+)\s+v\.?\s+([A-Z][a-zA-Z\s&.,-]+)')
+
+# Legal concept keywords; a term can signal more than one concept
+LEGAL_CONCEPT_TERMS = {
+    'contract_law': ('contract', 'agreement', 'consideration', 'breach', 'damages'),
+    'tort_law': ('negligence', 'liability', 'duty', 'damages', 'injury'),
+    'criminal_law': ('criminal', 'felony', 'misdemeanor', 'prosecution', 'defendant'),
+    'constitutional_law': ('constitutional', 'amendment', 'rights', 'due process'),
+    'property_law': ('property', 'ownership', 'title', 'easement', 'zoning'),
+}
+
+# Substring keywords for document classification, checked in priority order
+DOCUMENT_TYPE_KEYWORDS = (
+    ('court_decision', ('opinion', 'judgment', 'court', 'appeal')),
+    ('constitutional', ('constitution', 'amendment')),
+    ('statute', ('statute', 'code', 'act', 'law')),
+    ('regulation', ('regulation', 'rule', 'cfr')),
+    ('contract', ('contract', 'agreement', 'lease')),
+)
+JURISDICTION_KEYWORDS = (
+    ('federal', ('federal', 'u.s.', 'united states', 'supreme court')),
+    # State patterns; add more as needed
+    ('california', ('california',)),
+    ('new york', ('new york',)),
+    ('texas', ('texas',)),
+    ('florida', ('florida',)),
+    ('illinois', ('illinois',)),
+)
+
+def _build_automaton(entries: Dict[str, Any]) -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for word, value in entries.items():
+        automaton.add_word(word, value)
+    automaton.make_automaton()
+    return automaton
+
+# One automaton per use, so each text is scanned once for all of its keywords
+CLASSIFICATION_AUTOMATON = _build_automaton({
+    keyword: keyword
+    for groups in (DOCUMENT_TYPE_KEYWORDS, JURISDICTION_KEYWORDS)
+    for _, keywords in groups
+    for keyword in keywords
+})
+CONCEPTS_BY_TERM: Dict[str, List[str]] = {}
+for _concept, _terms in LEGAL_CONCEPT_TERMS.items():
+    for _term in _terms:
+        CONCEPTS_BY_TERM.setdefault(_term, []).append(_concept)
+LEGAL_CONCEPT_AUTOMATON = _build_automaton({
+    term: (len(term), concepts) for term, concepts in CONCEPTS_BY_TERM.items()
+})
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+# Pages handed to each process pool task during PDF text extraction. MuPDF
+# is not thread-safe, so without worker processes one thread handles the whole
+# document on a single handle.
+PDF_PAGES_PER_TASK = 8
+# Plain text extraction, joining words hyphenated across line breaks
+PDF_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT | fitz.TEXT_DEHYPHENATE
+# Pages with less text than this that contain images are treated as scans
+MIN_PAGE_TEXT_CHARS = 20
+
+def _extract_pdfplumber_text(file_path: str) -> str:
+    page_texts = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                page_texts.append(page_text + "\n")
+    return "".join(page_texts)
+
+def _pdf_page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return len(doc)
+
+def _page_texts(doc: fitz.Document, start: int, end: int) -> List[Optional[str]]:
+    """Text of pages [start, end), or None for scanned pages that need OCR"""
+    texts = []
+    for page_num in range(start, end):
+        page = doc.load_page(page_num)
+        text = page.get_text("text", flags=PDF_TEXT_FLAGS)
+        if len(text.strip()) < MIN_PAGE_TEXT_CHARS and page.get_images():
+            texts.append(None)
+        else:
+            texts.append(text)
+    return texts
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[Optional[str]]:
+    """Run in a pool worker, which needs its own document handle"""
+    with fitz.open(file_path) as doc:
+        return _page_texts(doc, start, end)
+
+# OCR covers at most this many pages. Without tesserocr each batch is one tesseract
+# run over a list file, so the engine and language data load once per batch
+# instead of per page; very long list files have been known to stall it.
+OCR_MAX_PAGES = 10
+OCR_BATCH_PAGES = 50
+# Pages are rendered at 144 dpi in grayscale: enough resolution for
+# recognition, and a third of the bytes of RGB
+OCR_RENDER_MATRIX = fitz.Matrix(2, 2)
+
+def _render_for_ocr(doc: fitz.Document, page_num: int) -> fitz.Pixmap:
+    return doc.load_page(page_num).get_pixmap(matrix=OCR_RENDER_MATRIX, colorspace=fitz.csGRAY)
+
+# The tesseract API isn't thread-safe, so each OCR thread keeps its own
+_tesseract = threading.local()
+
+def _tesseract_api() -> "PyTessBaseAPI":
+    api = getattr(_tesseract, "api", None)
+    if api is None:
+        api = _tesseract.api = PyTessBaseAPI(lang='eng')
+    return api
+
+def _ocr_pdf_pages(file_path: str, page_numbers: Optional[List[int]] = None) -> List[str]:
+    """OCR PDF pages (the first ones by default), returning one text per page"""
+    with fitz.open(file_path) as doc:
+        if page_numbers is None:
+            page_numbers = list(range(min(OCR_MAX_PAGES, len(doc))))
+        return _ocr_pages(doc, page_numbers)
+
+def _ocr_pages(doc: fitz.Document, page_numbers: List[int]) -> List[str]:
+    if PyTessBaseAPI is None:
+        return _ocr_pages_batched(doc, page_numbers)
+    
+    # Persistent in-process API, so the model loads once per thread
+    api = _tesseract_api()
+    texts = []
+    for page_num in page_numbers:
+        pix = _render_for_ocr(doc, page_num)
+        api.SetImage(Image.frombytes("L", (pix.width, pix.height), pix.samples))
+        texts.append(api.GetUTF8Text() + "\n")
+    return texts
+
+def _extract_pdf_document(file_path: str) -> Tuple[List[Optional[str]], List[int], List[str]]:
+    """Page texts, scanned pages and their OCR text, all from one document handle"""
+    with fitz.open(file_path) as doc:
+        page_texts = _page_texts(doc, 0, len(doc))
+        scanned_pages = [i for i, text in enumerate(page_texts) if text is None][:OCR_MAX_PAGES]
+        ocr_texts = []
+        if scanned_pages:
+            try:
+                ocr_texts = _ocr_pages(doc, scanned_pages)
+            except Exception as e:
+                logger.warning(f"OCR of scanned pages failed: {str(e)}")
+        return page_texts, scanned_pages, ocr_texts
+
+def _ocr_pages_batched(doc: fitz.Document, page_numbers: List[int]) -> List[str]:
+    """Render pages and OCR them in batched tesseract calls"""
+    texts = []
+    with tempfile.TemporaryDirectory(prefix="ocr_") as tmp_dir:
+        for start in range(0, len(page_numbers), OCR_BATCH_PAGES):
+            image_paths = []
+            for page_num in page_numbers[start:start + OCR_BATCH_PAGES]:
+                image_path = os.path.join(tmp_dir, f"page_{page_num}.png")
+                _render_for_ocr(doc, page_num).save(image_path)
+                image_paths.append(image_path)
+            
+            list_path = os.path.join(tmp_dir, f"batch_{start}.txt")
+            with open(list_path, "w") as list_file:
+                list_file.write("\n".join(image_paths) + "\n")
+            
+            # Tesseract ends each page of a list-file run with a form feed
+            page_texts = pytesseract.image_to_string(list_path, lang='eng').split("\f")
+            page_texts += [""] * (len(image_paths) - len(page_texts))
+            texts.extend(page_text + "\n" for page_text in page_texts[:len(image_paths)])
+    return texts
+
+def _pack_sentences(sentences: List[str], topic_shifts: Optional[np.ndarray] = None) -> List[str]:
+    """Greedily pack consecutive sentences into chunks of at most CHUNK_SIZE words
+
+    A chunk also ends before a sentence listed in ``topic_shifts`` once it
+    holds SEMANTIC_CHUNK_MIN_SIZE words. A sentence longer than CHUNK_SIZE
+    gets a chunk of its own.
+    """
+    if not sentences:
+        return []
+    
+    # Chunk sizes only need a word count, not real tokenization
+    word_counts = np.fromiter((len(sentence.split()) for sentence in sentences), dtype=np.int64, count=len(sentences))
+    cumulative = np.cumsum(word_counts)
+    
+    chunks = []
+    start = 0
+    while start < len(sentences):
+        words_before = cumulative[start - 1] if start else 0
+        # First sentence that would push the chunk past CHUNK_SIZE
+        end = max(int(np.searchsorted(cumulative, words_before + settings.CHUNK_SIZE, side='right')), start + 1)
+        
+        if topic_shifts is not None and len(topic_shifts):
+            # Earliest cut that leaves the chunk at least SEMANTIC_CHUNK_MIN_SIZE words
+            earliest = max(
+                int(np.searchsorted(cumulative, words_before + settings.SEMANTIC_CHUNK_MIN_SIZE, side='left')) + 1,
+                start + 1
+            )
+            shift = int(np.searchsorted(topic_shifts, earliest))
+            if shift < len(topic_shifts) and topic_shifts[shift] < end:
+                end = int(topic_shifts[shift])
+        
+        chunks.append(' '.join(sentences[start:end]))
+        start = end
+    
+    return chunks
+
+@lru_cache(maxsize=8)
+def _sentence_embeddings(sentences: Tuple[str, ...]) -> np.ndarray:
+    """Unit-length embeddings for a document's sentences, kept for re-ingested documents"""
+    # encode sorts by length internally, so each batch pads only to its own longest sentence
+    embeddings = encode_texts(list(sentences), batch_size=64)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
 
 class DocumentProcessor:
     """Handles document processing including text extraction, cleaning, and chunking"""
@@ -25,8 +293,15 @@ class DocumentProcessor:
         except:
             pass
         
+        # Load the Punkt model once; sent_tokenize looks it up again on every call
+        try:
+            self.sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+        except LookupError:
+            logger.warning("Punkt model unavailable, using an untrained sentence tokenizer")
+            self.sentence_tokenizer = PunktSentenceTokenizer()
+        
         # Initialize sentence transformer for semantic chunking
-        self.sentence_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self.sentence_model = get_embedding_model()
     
     async def process_document(self, document: Document) -> bool:
         """Main document processing pipeline"""
@@ -79,14 +354,38 @@ class DocumentProcessor:
     async def _extract_pdf_text(self, file_path: str) -> str:
         """Extract text from PDF using multiple methods"""
         text_content = ""
+        ocr_attempted = False
         
         try:
-            # Method 1: Try PyMuPDF first (faster and better for text-based PDFs)
-            doc = fitz.open(file_path)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text_content += page.get_text()
-            doc.close()
+            # Method 1: Try PyMuPDF first (faster and better for text-based PDFs),
+            # OCRing only the scanned pages
+            if has_process_pool():
+                # Extract blocks of pages in parallel; each worker opens the file itself
+                page_count = await asyncio.to_thread(_pdf_page_count, file_path)
+                blocks = await asyncio.gather(*(
+                    run_cpu_bound(_extract_pdf_pages, file_path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+                    for start in range(0, page_count, PDF_PAGES_PER_TASK)
+                ))
+                page_texts = [text for block in blocks for text in block]
+                scanned_pages = [i for i, text in enumerate(page_texts) if text is None][:OCR_MAX_PAGES]
+                ocr_texts = []
+                if scanned_pages:
+                    try:
+                        ocr_texts = await asyncio.to_thread(_ocr_pdf_pages, file_path, scanned_pages)
+                    except Exception as e:
+                        logger.warning(f"OCR of scanned pages failed: {str(e)}")
+            else:
+                # One thread does it all on a single document handle
+                page_texts, scanned_pages, ocr_texts = await asyncio.to_thread(_extract_pdf_document, file_path)
+            
+            # Splice the OCR text in place of the scanned pages
+            ocr_attempted = bool(scanned_pages)
+            for page_num, ocr_text in zip(scanned_pages, ocr_texts):
+                page_texts[page_num] = self._fix_ocr_errors(ocr_text)
+            if ocr_texts:
+                logger.info(f"OCR'd {len(ocr_texts)} scanned pages of {file_path}")
+            
+            text_content = "".join(text or "" for text in page_texts)
             
             # If we got reasonable text, return it
             if len(text_content.strip()) > 100:
@@ -98,20 +397,19 @@ class DocumentProcessor:
         
         try:
             # Method 2: Try pdfplumber (better for tables and complex layouts)
-            text_content = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n"
+            plumber_text = await asyncio.to_thread(_extract_pdfplumber_text, file_path)
             
-            if len(text_content.strip()) > 100:
-                logger.info(f"Extracted text using pdfplumber: {len(text_content)} characters")
-                return text_content
+            if len(plumber_text.strip()) > 100:
+                logger.info(f"Extracted text using pdfplumber: {len(plumber_text)} characters")
+                return plumber_text
                 
         except Exception as e:
             logger.warning(f"pdfplumber extraction failed: {str(e)}")
         
+        if ocr_attempted:
+            # The scanned pages already went through OCR above
+            return text_content
+        
         try:
             # Method 3: OCR as last resort (for scanned PDFs)
             text_content = await self._ocr_pdf(file_path)
@@ -125,22 +423,9 @@ class DocumentProcessor:
     
     async def _ocr_pdf(self, file_path: str) -> str:
         """Extract text from PDF using OCR"""
-        text_content = ""
-        
         try:
-            doc = fitz.open(file_path)
-            for page_num in range(min(10, len(doc))):  # Limit OCR to first 10 pages
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Perform OCR
-                ocr_text = pytesseract.image_to_string(img, lang='eng')
-                text_content += ocr_text + "\n"
-            
-            doc.close()
-            return text_content
+            page_texts = await asyncio.to_thread(_ocr_pdf_pages, file_path)
+            return self._fix_ocr_errors("".join(page_texts))
             
         except Exception as e:
             logger.error(f"OCR processing failed: {str(e)}")
@@ -148,15 +433,13 @@ class DocumentProcessor:
     
     async def _extract_docx_text(self, file_path: str) -> str:
         """Extract text from DOCX files"""
+        return await asyncio.to_thread(self._extract_docx_text_sync, file_path)
+    
+    def _extract_docx_text_sync(self, file_path: str) -> str:
         try:
             from docx import Document as DocxDocument
             doc = DocxDocument(file_path)
-            text_content = ""
-            
-            for paragraph in doc.paragraphs:
-                text_content += paragraph.text + "\n"
-            
-            return text_content
+            return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
             
         except Exception as e:
             logger.error(f"Error extracting DOCX text: {str(e)}")
@@ -164,74 +447,75 @@ class DocumentProcessor:
     
     async def _extract_txt_text(self, file_path: str) -> str:
         """Extract text from TXT files"""
+        return await asyncio.to_thread(self._extract_txt_text_sync, file_path)
+    
+    def _extract_txt_text_sync(self, file_path: str) -> str:
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        except UnicodeDecodeError:
-            # Try different encodings
-            for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        return file.read()
-                except:
-                    continue
+            with open(file_path, 'rb') as file:
+                data = file.read()
         except Exception as e:
             logger.error(f"Error extracting TXT text: {str(e)}")
+            return ""
         
-        return ""
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            # Detect the encoding from the bytes already read
+            best = from_bytes(data).best()
+            return str(best) if best is not None else data.decode('latin-1')
+    
+    def _fix_ocr_errors(self, text: str) -> str:
+        """Restore spacing that OCR commonly drops"""
+        text = OCR_CASE_BOUNDARY_PATTERN.sub(r'\1 \2', text)  # Add space between words
+        text = OCR_WORD_NUMBER_PATTERN.sub(r'\1 \2', text)  # Space between word and number
+        text = OCR_NUMBER_WORD_PATTERN.sub(r'\1 \2', text)  # Space between number and word
+        return text
     
     async def clean_text(self, text: str) -> str:
         """Clean and normalize extracted text"""
+        return await asyncio.to_thread(self._clean_text_sync, text)
+    
+    def _clean_text_sync(self, text: str) -> str:
+        # Remove excessive whitespace (this also folds line breaks into spaces)
+        text = WHITESPACE_PATTERN.sub(' ', text)
         
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove page numbers and headers/footers (common patterns)
-        text = re.sub(r'\n\d+\n', '\n', text)  # Page numbers on separate lines
-        text = re.sub(r'Page \d+ of \d+', '', text, flags=re.IGNORECASE)
-        
-        # Remove excessive line breaks
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Fix common OCR errors
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # Add space between words
-        text = re.sub(r'(\w)(\d)', r'\1 \2', text)  # Space between word and number
-        text = re.sub(r'(\d)(\w)', r'\1 \2', text)  # Space between number and word
+        # Remove page headers/footers
+        text = PAGE_NUMBER_PATTERN.sub('', text)
         
         # Normalize quotes and dashes
-        text = re.sub(r'["""]', '"', text)
-        text = re.sub(r"[''']", "'", text)
-        text = re.sub(r'[—–]', '-', text)
+        text = text.translate(PUNCTUATION_TABLE)
         
         return text.strip()
     
     async def extract_metadata(self, text: str, file_type: str) -> Dict[str, any]:
         """Extract metadata and legal entities from text"""
+        return await asyncio.to_thread(self._extract_metadata_sync, text)
+    
+    def _extract_metadata_sync(self, text: str) -> Dict[str, any]:
         metadata = {}
         
         try:
-            # Extract legal citations
-            citations = self._extract_citations(text)
+            # Extract legal citations, statutes and regulations
+            citations, statutes = self._extract_references(text)
             metadata['citations'] = citations
             
             # Extract case names
             case_names = self._extract_case_names(text)
             metadata['case_names'] = case_names
             
-            # Extract statutes and regulations
-            statutes = self._extract_statutes(text)
             metadata['statutes'] = statutes
             
             # Extract dates
             dates = self._extract_dates(text)
             metadata['dates'] = dates
             
-            # Determine document type
-            doc_type = self._determine_document_type(text)
+            # Determine document type and jurisdiction from one keyword scan
+            keywords = self._find_classification_keywords(text)
+            
+            doc_type = self._determine_document_type(keywords)
             metadata['document_type'] = doc_type
             
-            # Extract jurisdiction
-            jurisdiction = self._extract_jurisdiction(text)
+            jurisdiction = self._extract_jurisdiction(keywords)
             metadata['jurisdiction'] = jurisdiction
             
         except Exception as e:
@@ -239,101 +523,64 @@ class DocumentProcessor:
         
         return metadata
     
+    def _extract_references(self, text: str) -> Tuple[List[str], List[str]]:
+        """Extract legal citations and statute references in one pass"""
+        citations = {}
+        statutes = {}
+        
+        for match in REFERENCE_PATTERN.finditer(text):
+            if match.lastgroup in CITATION_GROUPS:
+                citations[match.group()] = None
+            if match.lastgroup in STATUTE_GROUPS:
+                statutes[match.group()] = None
+        
+        return list(citations), list(statutes)
+    
     def _extract_citations(self, text: str) -> List[str]:
         """Extract legal citations from text"""
-        citations = []
-        
-        # Common citation patterns
-        patterns = [
-            r'\d+\s+[A-Z][a-z]+\.?\s+\d+',  # Volume Reporter Page
-            r'\d+\s+U\.S\.C\.?\s+§?\s*\d+',  # USC citations
-            r'\d+\s+F\.?\s*\d*d?\s+\d+',  # Federal Reporter
-            r'\d+\s+S\.?\s*Ct\.?\s+\d+',  # Supreme Court Reporter
-            r'\d+\s+L\.?\s*Ed\.?\s*\d*d?\s+\d+',  # Lawyers Edition
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            citations.extend(matches)
-        
-        return list(set(citations))  # Remove duplicates
+        return self._extract_references(text)[0]
     
     def _extract_case_names(self, text: str) -> List[str]:
         """Extract case names from text"""
-        # Pattern for case names (simplified)
-        pattern = r'([A-Z][a-zA-Z\s&.,-]+)\s+v\.?\s+([A-Z][a-zA-Z\s&.,-]+)'
-        matches = re.findall(pattern, text)
-        
-        case_names = []
-        for match in matches:
-            case_name = f"{match[0].strip()} v. {match[1].strip()}"
+        case_names = {}
+        for match in CASE_NAME_PATTERN.finditer(text):
+            case_name = f"{match.group(1).strip()} v. {match.group(2).strip()}"
             if len(case_name) < 100:  # Filter out overly long matches
-                case_names.append(case_name)
+                case_names[case_name] = None
         
-        return list(set(case_names))
+        return list(case_names)
     
     def _extract_statutes(self, text: str) -> List[str]:
         """Extract statute references"""
-        patterns = [
-            r'\d+\s+U\.S\.C\.?\s+§?\s*\d+',
-            r'Section\s+\d+[a-z]?',
-            r'§\s*\d+[a-z]?',
-        ]
-        
-        statutes = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            statutes.extend(matches)
-        
-        return list(set(statutes))
+        return self._extract_references(text)[1]
     
     def _extract_dates(self, text: str) -> List[str]:
         """Extract dates from text"""
-        patterns = [
-            r'\b\d{1,2}/\d{1,2}/\d{4}\b',
-            r'\b\d{1,2}-\d{1,2}-\d{4}\b',
-            r'\b[A-Za-z]+ \d{1,2}, \d{4}\b',
-            r'\b\d{4}\b',  # Years
-        ]
-        
-        dates = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            dates.extend(matches)
-        
-        return list(set(dates))
+        dates = {}
+        for match in DATE_PATTERN.finditer(text):
+            date = match.group()
+            dates[date] = None
+            if match.lastgroup == 'full':
+                dates[date[-4:]] = None
+        
+        return list(dates)
+    
+    def _find_classification_keywords(self, text: str) -> Set[str]:
+        """Document type and jurisdiction keywords occurring anywhere in the text"""
+        return {keyword for _, keyword in CLASSIFICATION_AUTOMATON.iter(text.lower())}
     
-    def _determine_document_type(self, text: str) -> str:
+    def _determine_document_type(self, keywords: Set[str]) -> str:
         """Determine the type of legal document"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['opinion', 'judgment', 'court', 'appeal']):
-            return 'court_decision'
-        elif any(word in text_lower for word in ['constitution', 'amendment']):
-            return 'constitutional'
-        elif any(word in text_lower for word in ['statute', 'code', 'act', 'law']):
-            return 'statute'
-        elif any(word in text_lower for word in ['regulation', 'rule', 'cfr']):
-            return 'regulation'
-        elif any(word in text_lower for word in ['contract', 'agreement', 'lease']):
-            return 'contract'
-        else:
-            return 'unknown'
+        for doc_type, type_keywords in DOCUMENT_TYPE_KEYWORDS:
+            if not keywords.isdisjoint(type_keywords):
+                return doc_type
+        return 'unknown'
     
-    def _extract_jurisdiction(self, text: str) -> str:
+    def _extract_jurisdiction(self, keywords: Set[str]) -> str:
         """Extract jurisdiction information"""
-        text_lower = text.lower()
-        
-        # Federal indicators
-        if any(word in text_lower for word in ['federal', 'u.s.', 'united states', 'supreme court']):
-            return 'federal'
-        
-        # State patterns
-        states = ['california', 'new york', 'texas', 'florida', 'illinois']  # Add more as needed
-        for state in states:
-            if state in text_lower:
-                return state
-        
+        for jurisdiction, jurisdiction_keywords in JURISDICTION_KEYWORDS:
+            if not keywords.isdisjoint(jurisdiction_keywords):
+                return jurisdiction
         return 'unknown'
     
     async def create_chunks(self, text: str, document_id: int) -> List[DocumentChunk]:
@@ -345,26 +592,11 @@ class DocumentProcessor:
             semantic_chunks = await self._create_semantic_chunks(text)
             
             if semantic_chunks:
-                for i, chunk_text in enumerate(semantic_chunks):
-                    chunk = self._create_chunk_object(
-                        text=chunk_text,
-                        document_id=document_id,
-                        chunk_index=i,
-                        method="semantic"
-                    )
-                    chunks.append(chunk)
+                chunks = await asyncio.to_thread(self._create_chunk_objects, text, semantic_chunks, document_id, "semantic")
             else:
                 # Method 2: Fallback to sentence-based chunking
                 sentence_chunks = await self._create_sentence_chunks(text)
-                
-                for i, chunk_text in enumerate(sentence_chunks):
-                    chunk = self._create_chunk_object(
-                        text=chunk_text,
-                        document_id=document_id,
-                        chunk_index=i,
-                        method="sentence"
-                    )
-                    chunks.append(chunk)
+                chunks = await asyncio.to_thread(self._create_chunk_objects, text, sentence_chunks, document_id, "sentence")
             
         except Exception as e:
             logger.error(f"Error creating chunks: {str(e)}")
@@ -385,66 +617,91 @@ class DocumentProcessor:
     async def _create_semantic_chunks(self, text: str) -> List[str]:
         """Create chunks based on semantic similarity"""
         # Split into sentences
-        sentences = sent_tokenize(text)
+        sentences = await asyncio.to_thread(self.sentence_tokenizer.tokenize, text)
         
         if len(sentences) < 3:
             return [text]  # Too short to chunk meaningfully
         
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for sentence in sentences:
-            sentence_length = len(sentence.split())
-            
-            # Check if adding this sentence would exceed chunk size
-            if current_length + sentence_length > settings.CHUNK_SIZE and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [sentence]
-                current_length = sentence_length
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
+        # Similarity of each sentence to the next, from one batched encode
+        try:
+            embeddings = await asyncio.to_thread(_sentence_embeddings, tuple(sentences))
+            similarities = (embeddings[:-1] * embeddings[1:]).sum(axis=1)
+        except Exception as e:
+            logger.warning(f"Sentence embedding failed, chunking by length only: {str(e)}")
+            similarities = None
         
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        # Sentences that start a new topic may start a new chunk
+        topic_shifts = None
+        if similarities is not None:
+            topic_shifts = np.flatnonzero(similarities < settings.SEMANTIC_CHUNK_THRESHOLD) + 1
         
-        return chunks
+        return _pack_sentences(sentences, topic_shifts)
     
     async def _create_sentence_chunks(self, text: str) -> List[str]:
         """Create chunks based on sentence boundaries"""
-        sentences = sent_tokenize(text)
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for sentence in sentences:
-            words = word_tokenize(sentence)
-            sentence_length = len(words)
-            
-            if current_length + sentence_length > settings.CHUNK_SIZE and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [sentence]
-                current_length = sentence_length
-            else:
-                current_chunk.append(sentence)
-                current_length += sentence_length
-        
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-        
-        return chunks
+        sentences = await asyncio.to_thread(self.sentence_tokenizer.tokenize, text)
+        return _pack_sentences(sentences)
+    
+    def _create_chunk_objects(
+        self,
+        text: str,
+        chunk_texts: List[str],
+        document_id: int,
+        method: str
+    ) -> List[DocumentChunk]:
+        """Create chunk objects for consecutive chunks of a document's text"""
+        chunk_citations = self._chunk_citations(text, chunk_texts)
+        return [
+            self._create_chunk_object(
+                text=chunk_text,
+                document_id=document_id,
+                chunk_index=i,
+                method=method,
+                citations=chunk_citations[i] if chunk_citations is not None else None
+            )
+            for i, chunk_text in enumerate(chunk_texts)
+        ]
+    
+    def _chunk_citations(self, text: str, chunk_texts: List[str]) -> Optional[List[List[str]]]:
+        """Citations of each chunk from a single scan of the whole text
+        
+        Returns None if the chunks can't be located in the text, in which case
+        each chunk is scanned on its own.
+        """
+        chunk_starts = []
+        chunk_ends = []
+        position = 0
+        for chunk_text in chunk_texts:
+            start = text.find(chunk_text, position)
+            if start < 0:
+                return None
+            position = start + len(chunk_text)
+            chunk_starts.append(start)
+            chunk_ends.append(position)
+        
+        citations = [{} for _ in chunk_texts]
+        for match in REFERENCE_PATTERN.finditer(text):
+            if match.lastgroup not in CITATION_GROUPS:
+                continue
+            i = bisect.bisect_right(chunk_starts, match.start()) - 1
+            # Citations straddling a chunk boundary belong to neither chunk
+            if i >= 0 and match.end() <= chunk_ends[i]:
+                citations[i][match.group()] = None
+        
+        return [list(chunk) for chunk in citations]
     
-    def _create_chunk_object(self, text: str, document_id: int, chunk_index: int, method: str) -> DocumentChunk:
+    def _create_chunk_object(
+        self,
+        text: str,
+        document_id: int,
+        chunk_index: int,
+        method: str,
+        citations: Optional[List[str]] = None
+    ) -> DocumentChunk:
         """Create a DocumentChunk object with metadata"""
         
-        # Calculate basic statistics
-        word_count = len(text.split())
-        char_count = len(text)
-        
         # Extract chunk-specific metadata
-        chunk_citations = self._extract_citations(text)
+        chunk_citations = citations if citations is not None else self._extract_citations(text)
         chunk_concepts = self._extract_legal_concepts(text)
         
         # Create chunk object (not saved to DB yet)
@@ -452,8 +709,6 @@ class DocumentProcessor:
             document_id=document_id,
             text=text,
             chunk_index=chunk_index,
-            word_count=word_count,
-            char_count=char_count,
             legal_concepts=chunk_concepts,
             citations=chunk_citations
         )
@@ -462,19 +717,19 @@ class DocumentProcessor:
     
     def _extract_legal_concepts(self, text: str) -> List[str]:
         """Extract legal concepts from text chunk"""
-        concepts = []
-        
-        # Legal concept patterns
-        concept_patterns = {
-            'contract_law': r'\b(contract|agreement|consideration|breach|damages)\b',
-            'tort_law': r'\b(negligence|liability|duty|damages|injury)\b',
-            'criminal_law': r'\b(criminal|felony|misdemeanor|prosecution|defendant)\b',
-            'constitutional_law': r'\b(constitutional|amendment|rights|due process)\b',
-            'property_law': r'\b(property|ownership|title|easement|zoning)\b',
-        }
-        
-        for concept, pattern in concept_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                concepts.append(concept)
-        
-        return concepts 
\ No newline at end of file
+        found = set()
+        text_lower = text.lower()
+        
+        for end, (length, concepts) in LEGAL_CONCEPT_AUTOMATON.iter(text_lower):
+            # Only whole words count, as with a \b-delimited pattern
+            start = end - length + 1
+            if start > 0 and _is_word_char(text_lower[start - 1]):
+                continue
+            if end + 1 < len(text_lower) and _is_word_char(text_lower[end + 1]):
+                continue
+            
+            found.update(concepts)
+            if len(found) == len(LEGAL_CONCEPT_TERMS):
+                break
+        
+        return [concept for concept in LEGAL_CONCEPT_TERMS if concept in found] 
\ No newline at end of file
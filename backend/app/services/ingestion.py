@@ -0,0 +1,190 @@
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.core.cache import get_cached_compressed_json, make_cache_key, set_cached_compressed_json
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, dialect_insert
+from app.models.document import Document, DocumentChunk, EmbeddingModel
+from app.services.document_processor import DocumentProcessor
+from app.services.search_engine import SearchEngine, invalidate_search_caches
+from app.services.vector_store import (
+    VectorStore,
+    chunk_vector_id,
+    encode_texts,
+    quantize_binary,
+    quantize_sq8
+)
+
+CHUNK_COLUMNS = (
+    "text",
+    "chunk_index",
+    "page_number",
+    "section_title",
+    "legal_concepts",
+    "citations"
+)
+
+# Embedding model ids never change once assigned, so cache them per process
+_embedding_model_ids: Dict[str, int] = {}
+
+async def get_embedding_model_id(db: AsyncSession, name: str, dim: int) -> int:
+    """Get the id of an embedding model, registering it on first use"""
+    if name in _embedding_model_ids:
+        return _embedding_model_ids[name]
+    
+    await db.execute(
+        dialect_insert(db)(EmbeddingModel)
+        .values(name=name, dim=dim)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    # Commit now so a later rollback can't invalidate the cached id
+    await db.commit()
+    model_id = await db.scalar(select(EmbeddingModel.id).where(EmbeddingModel.name == name))
+    _embedding_model_ids[name] = model_id
+    return model_id
+
+def _extraction_cache_key(file_hash: str) -> str:
+    # Chunk boundaries depend on these settings, so changing one starts a fresh entry;
+    # the prefix changed when entries became compressed
+    return make_cache_key(
+        "extraction:z",
+        file_hash,
+        settings.CHUNK_SIZE,
+        settings.SEMANTIC_CHUNK_THRESHOLD,
+        settings.SEMANTIC_CHUNK_MIN_SIZE,
+        settings.EMBEDDING_MODEL
+    )
+
+async def _cached_extraction(document: Document) -> Optional[Tuple[Dict[str, Any], List[DocumentChunk]]]:
+    """Metadata and chunks from an earlier upload of the same file, if cached"""
+    if not document.file_hash:
+        return None
+    cached = await get_cached_compressed_json(_extraction_cache_key(document.file_hash))
+    if cached is None:
+        return None
+    
+    chunks = [
+        DocumentChunk(
+            document_id=document.id,
+            text=chunk["text"],
+            chunk_index=i,
+            legal_concepts=chunk["legal_concepts"],
+            citations=chunk["citations"]
+        )
+        for i, chunk in enumerate(cached["chunks"])
+    ]
+    return cached["metadata"], chunks
+
+async def _cache_extraction(document: Document, metadata: Dict[str, Any], chunks: List[DocumentChunk]):
+    if not document.file_hash:
+        return
+    await set_cached_compressed_json(
+        _extraction_cache_key(document.file_hash),
+        {
+            "metadata": metadata,
+            "chunks": [
+                {"text": chunk.text, "legal_concepts": chunk.legal_concepts, "citations": chunk.citations}
+                for chunk in chunks
+            ]
+        },
+        settings.EXTRACTION_CACHE_TTL_SECONDS,
+        settings.EXTRACTION_CACHE_MAX_BYTES
+    )
+
+def _chunk_mappings(
+    chunks: List[DocumentChunk],
+    embeddings: np.ndarray,
+    embedding_model_id: int
+) -> List[Dict[str, Any]]:
+    return [
+        {
+            **{column: getattr(chunk, column) for column in CHUNK_COLUMNS},
+            "vector_id": chunk_vector_id(chunk.document_id, chunk.chunk_index),
+            "embedding_model_id": embedding_model_id,
+            "embedding_sq8": quantize_sq8(embedding),
+            "embedding_binary": quantize_binary(embedding)
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+
+async def ingest_document(
+    document_id: int,
+    processor: DocumentProcessor,
+    vector_store: VectorStore
+) -> bool:
+    """Extract, chunk, store and index an uploaded document
+    
+    Runs outside the request that triggered it, so it opens its own session.
+    """
+    async with AsyncSessionLocal() as db:
+        return await _ingest(db, document_id, processor, vector_store)
+
+async def _ingest(
+    db: AsyncSession,
+    document_id: int,
+    processor: DocumentProcessor,
+    vector_store: VectorStore
+) -> bool:
+    try:
+        document = await db.get(Document, document_id)
+        if not document:
+            logger.warning(f"Document {document_id} not found for processing")
+            return False
+        
+        logger.info(f"Starting document processing for: {document.filename}")
+        
+        # Re-uploads of the same file skip extraction, OCR and chunking
+        extraction = await _cached_extraction(document)
+        if extraction is not None:
+            logger.info(f"Reusing cached extraction for: {document.filename}")
+            metadata, chunks = extraction
+        else:
+            text_content = await processor.extract_text(document.file_path, document.file_type)
+            if not text_content:
+                logger.error(f"No text extracted from document: {document.filename}")
+                document.processing_status = "failed"
+                await db.commit()
+                return False
+            
+            cleaned_text = await processor.clean_text(text_content)
+            metadata = await processor.extract_metadata(cleaned_text, document.file_type)
+            chunks = await processor.create_chunks(cleaned_text, document.id)
+            await _cache_extraction(document, metadata, chunks)
+        
+        # Embed once; the vectors feed both the index and the quantized columns
+        embeddings = await asyncio.to_thread(encode_texts, [chunk.text for chunk in chunks])
+        
+        embedding_model_id = await get_embedding_model_id(
+            db,
+            settings.EMBEDDING_MODEL,
+            vector_store.embedding_model.get_sentence_embedding_dimension()
+        )
+        
+        search_engine = SearchEngine(db, vector_store=vector_store)
+        await search_engine.bulk_store_chunks(document.id, _chunk_mappings(chunks, embeddings, embedding_model_id))
+        
+        document.text_extracted = True
+        document.citations = metadata.get("citations")
+        await search_engine.store_document_citations(document.id, document.citations or [])
+        document.document_type = document.document_type or metadata.get("document_type")
+        document.jurisdiction = document.jurisdiction or metadata.get("jurisdiction")
+        document.embeddings_generated = await vector_store.add_document_chunks(chunks, embeddings)
+        document.processing_status = "completed"
+        await db.commit()
+        await invalidate_search_caches()
+        
+        logger.info(f"Document processing completed: {len(chunks)} chunks stored for {document_id}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error processing document {document_id}: {str(e)}")
+        await db.rollback()
+        await db.execute(
+            update(Document).where(Document.id == document_id).values(processing_status="failed")
+        )
+        await db.commit()
+        return False
@@ -0,0 +1,119 @@
+"""Stable prompt text shared by the AI analyzer
+
+Kept byte-for-byte constant so providers with prompt caching can serve it
+from cache; changing it invalidates every cached prefix.
+"""
+
+# Optionally appended to the legal reasoning system prompt (see
+# OPENROUTER_PAD_REASONING_PROMPT). Besides grounding the model's terminology,
+# it lifts the prefix past the ~1024-token minimum that providers require
+# before they will cache it, at the cost of those tokens on every call.
+LEGAL_GLOSSARY = """
+Reference glossary (use these meanings unless the context clearly says otherwise):
+- Holding: the court's determination of the legal question actually decided; it binds later courts within the same hierarchy.
+- Dictum (obiter dictum): a remark in an opinion not necessary to the decision; persuasive at most, never binding.
+- Ratio decidendi: the principle of law on which the decision rests; the common law term for the holding.
+- Stare decisis: the doctrine that courts follow their own precedents and those of higher courts in the same jurisdiction.
+- Binding authority: precedent or enacted law a court must follow, such as decisions of a higher court in its hierarchy.
+- Persuasive authority: sources a court may consider but need not follow, such as decisions of other jurisdictions or treatises.
+- Distinguishing: showing that a precedent's material facts or issues differ enough that its holding does not control.
+- Overruling: a higher or the same court expressly rejecting an earlier precedent, depriving it of binding force.
+- Abrogation: displacement of a common law rule or precedent by statute or by a later change in the governing law.
+- Case of first impression: a legal question no court in the jurisdiction has yet decided.
+- Jurisdiction: a court's power to hear a case (subject matter jurisdiction) and to bind the parties (personal jurisdiction).
+- Venue: the particular court or district where a case should be heard among courts that have jurisdiction.
+- Standing: a party's entitlement to bring a claim, typically requiring injury, causation and redressability.
+- Ripeness and mootness: doctrines barring review of disputes that are not yet concrete or that have already been resolved.
+- Standard of review: the deference an appellate court gives a lower court's ruling, e.g. de novo, clear error, abuse of discretion.
+- De novo review: the appellate court decides the question afresh, giving no deference to the lower court.
+- Burden of proof: the obligation to prove a fact, comprising the burden of production and the burden of persuasion.
+- Preponderance of the evidence: the civil standard; the fact is more likely true than not.
+- Clear and convincing evidence: an intermediate standard requiring that the fact be highly probable.
+- Beyond a reasonable doubt: the criminal standard; no reasonable doubt about guilt remains.
+- Statute: a law enacted by a legislature; codified statutes are collected in an official code by title and section.
+- Regulation: a rule issued by an administrative agency under authority delegated by statute, with the force of law.
+- Plain meaning rule: statutory text is applied according to its ordinary meaning unless that leads to absurdity.
+- Legislative intent: the purpose the legislature sought to achieve, inferred from text, structure and legislative history.
+- Canons of construction: interpretive maxims such as expressio unius, ejusdem generis and the rule of lenity.
+- Preemption: displacement of state or local law by conflicting or field-occupying higher-level law.
+- Severability: the principle that an invalid provision can be struck while the remainder of the statute stands.
+- Cause of action: the set of facts and legal theory entitling a party to relief.
+- Elements: the components a claimant must establish for a claim or a prosecutor for an offense.
+- Affirmative defense: a defense on which the defendant bears the burden, such as self-defense or the statute of limitations.
+- Statute of limitations: the period within which a claim must be filed, subject to tolling and accrual rules.
+- Res judicata (claim preclusion): bars relitigating claims decided or that could have been decided in a prior final judgment.
+- Collateral estoppel (issue preclusion): bars relitigating issues actually and necessarily decided in a prior case.
+- Summary judgment: judgment without trial when there is no genuine dispute of material fact.
+- Motion to dismiss: a request to end a case because the complaint fails to state a claim or the court lacks jurisdiction.
+- Injunction: a court order requiring or forbidding conduct; preliminary injunctions preserve the status quo pending trial.
+- Damages: monetary relief, including compensatory, consequential, nominal, liquidated and punitive damages.
+- Equitable relief: non-monetary remedies such as specific performance, rescission, reformation and injunctions.
+- Negligence: breach of a duty of reasonable care that proximately causes legally cognizable harm.
+- Strict liability: liability without proof of fault, as for abnormally dangerous activities or defective products.
+- Consideration: the bargained-for exchange that makes a promise enforceable as a contract.
+- Material breach: a failure of performance significant enough to excuse the other party's performance.
+- Due process: procedural fairness (notice and an opportunity to be heard) and substantive limits on government action.
+- Equal protection: the requirement that government treat similarly situated persons alike, reviewed at varying levels of scrutiny.
+- Strict scrutiny: the most demanding review; the law must be narrowly tailored to a compelling government interest.
+- Rational basis review: the most deferential review; the law must be rationally related to a legitimate interest.
+- Mens rea: the mental state an offense requires, such as purpose, knowledge, recklessness or negligence.
+- Actus reus: the voluntary act or omission that constitutes the physical element of an offense.
+- Citation forms: reporters are cited volume, reporter, first page (e.g. 347 U.S. 483); codes are cited title, code, section (e.g. 42 U.S.C. § 1983).
+"""
+
+# Per-task system prompts, keyed by the request's type option
+DOCUMENT_ANALYSIS_SYSTEM_PROMPT = """You are a legal document analyzer. Extract and analyze the following from the provided legal text:
+
+1. Document type and jurisdiction
+2. Key legal concepts and principles
+3. Important citations and references
+4. Main arguments and holdings
+5. Relevant legal entities (parties, judges, etc.)
+6. Summary of the document
+7. Legal significance and implications
+
+Provide your analysis in a structured JSON format."""
+
+SUMMARY_SYSTEM_PROMPTS = {
+    "comprehensive": "You are a legal document summarizer. Create a comprehensive summary that covers all key points, legal principles, and implications.",
+    "executive": "You are creating an executive summary for legal professionals. Focus on the most critical points and practical implications.",
+    "key_points": "You are extracting key points from a legal document. Present only the most essential legal concepts and holdings."
+}
+
+COMPARISON_SYSTEM_PROMPTS = {
+    "similarity": "You are comparing legal documents for similarities. Identify common themes, legal principles, and overlapping content.",
+    "differences": "You are comparing legal documents for differences. Highlight contrasting positions, different legal approaches, and unique aspects.",
+    "legal_alignment": "You are analyzing legal alignment between documents. Assess consistency, conflicts, and legal coherence."
+}
+
+BRIEF_SYSTEM_PROMPTS = {
+    "research": "You are writing a legal research brief. Provide comprehensive analysis with citations and legal precedents.",
+    "argument": "You are writing a legal argument brief. Structure your argument logically with strong legal support.",
+    "motion": "You are writing a motion brief. Follow proper legal motion format and structure."
+}
+
+ENTITY_SYSTEM_PREFIX = "You are a legal entity extractor. Extract the following types of entities from the legal text:\n"
+ENTITY_SYSTEM_SUFFIX = "\n\nReturn the results in JSON format with entity types as keys and lists of entities as values."
+
+# Fixed segments of the user prompts; only the request-specific parts are joined in between
+REASONING_QUERY_PREFIX = "Legal Query: "
+REASONING_CONTEXT_HEADER = "\n\nRelevant Legal Documents and Context:\n"
+REASONING_INSTRUCTIONS = "\n\nPlease provide a comprehensive legal analysis addressing the query based on the provided context."
+
+DOCUMENT_TYPE_PREFIX = "Document Type: "
+DOCUMENT_TEXT_HEADER = "\n\nLegal Text:\n"
+DOCUMENT_ANALYSIS_INSTRUCTIONS = "\n\nPlease analyze this legal document and provide structured output."
+
+SUMMARY_REQUEST_PREFIX = "Please create a "
+SUMMARY_REQUEST_LENGTH = " summary of the following legal document (max "
+SUMMARY_REQUEST_HEADER = " words):\n\n"
+SUMMARY_REQUEST_SUFFIX = "\n\nSummary:"
+
+ENTITY_REQUEST_PREFIX = "Extract legal entities from this text:\n\n"
+ENTITY_REQUEST_SUFFIX = "\n\nEntities:"
+
+COMPARISON_REQUEST_PREFIX = "Compare these legal documents based on "
+COMPARISON_REQUEST_HEADER = ":\n\n"
+COMPARISON_REQUEST_SUFFIX = "\n\nAnalysis:"
+
+BRIEF_SOURCES_HEADER = "\n\nRelevant Legal Sources:\n"
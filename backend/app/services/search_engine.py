@@ -1,26 +1,129 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
-from typing import List, Dict, Any, Optional
+import asyncio
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy import select, delete, insert, or_, and_, func, literal, true, type_coerce
+from typing import Iterable, List, Dict, Any, Optional
+import numpy as np
+from datetime import datetime
+from functools import reduce
 import re
+import ahocorasick
+from cachetools import TTLCache
 from loguru import logger
 
-from app.models.document import Document, DocumentChunk, SearchResult
-from app.services.vector_store import VectorStore
+from app.core.cache import bump_generation
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, dialect_insert
+from app.models.document import (
+    ChunkBody,
+    Citation,
+    Document,
+    DocumentChunk,
+    chunk_text_sha256,
+    delete_unreferenced_chunk_bodies,
+    document_citations,
+    normalize_citation,
+    TEXT_SEARCH_CONFIG,
+    text_search_vector
+)
+from app.services.search_log import log_search
+from app.services.vector_store import VectorStore, chunk_vector_id
 from app.schemas.search import SearchResult as SearchResultSchema, CitationResult
 
+# Filter options only change when documents do. Changes made in this process
+# clear the cache; the TTL bounds staleness from ingestion in other processes
+_filters_cache: TTLCache = TTLCache(maxsize=1, ttl=settings.FILTERS_CACHE_TTL_SECONDS)
+
+# Counter included in the keys of cached search, suggestion, autocomplete and
+# analysis responses, so document changes retire answers built from them
+SEARCH_CACHE_GENERATION_KEY = "ans:search:generation"
+
+async def invalidate_search_caches():
+    """Drop cached filter options and search responses after documents change"""
+    _filters_cache.clear()
+    await bump_generation(SEARCH_CACHE_GENERATION_KEY)
+
+# Fallback suggestions, already lowercase
+COMMON_LEGAL_TERMS = (
+    "contract law", "tort law", "criminal law", "constitutional law",
+    "property law", "evidence", "procedure", "jurisdiction"
+)
+
+# Rank offset for reciprocal rank fusion; 60 is the usual choice
+RRF_K = 60
+
+def _min_max(scores: List[float]) -> List[float]:
+    """Scale scores to [0, 1]; a list of equal scores maps to all ones"""
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+def query_term_pattern(query: str) -> Optional[re.Pattern]:
+    """One case-insensitive alternation over the query's terms, longest first"""
+    terms = sorted(set(query.split()), key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile("|".join(map(re.escape, terms)), re.IGNORECASE)
+
+def term_automaton(terms: Iterable[str]) -> Optional[ahocorasick.Automaton]:
+    """Aho-Corasick automaton over lowercased terms, each mapped to itself"""
+    automaton = ahocorasick.Automaton()
+    for term in terms:
+        automaton.add_word(term.lower(), term.lower())
+    if not len(automaton):
+        return None
+    automaton.make_automaton()
+    return automaton
+
+def json_array_elements(column, dialect_name: str):
+    """Table-valued function over a JSON array column's elements, as text in "value" """
+    if dialect_name == "postgresql":
+        return func.jsonb_array_elements_text(type_coerce(column, JSONB)).table_valued("value")
+    return func.json_each(column).table_valued("value")
+
+def json_array_contains(column, values: List[str], dialect_name: str):
+    """Match rows whose JSON array column contains every value
+    
+    On Postgres this is JSONB containment (@>), which the GIN indexes serve;
+    elsewhere it falls back to json_each lookups.
+    """
+    if dialect_name == "postgresql":
+        return type_coerce(column, JSONB).contains(values)
+    
+    conditions = []
+    for value in values:
+        elements = func.json_each(column).table_valued("value")
+        conditions.append(
+            select(literal(1)).select_from(elements).where(elements.c.value == value).exists()
+        )
+    return and_(*conditions)
+
 class SearchEngine:
     """Orchestrates document search combining semantic, keyword, and hybrid approaches"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, vector_store: Optional[VectorStore] = None):
         self.db = db
-        self.vector_store = VectorStore()
+        # Share the application's vector store when given; it holds the embedding model
+        self.vector_store = vector_store or VectorStore()
+        # Set when a search returned fewer results than it should have because of an
+        # error, so callers don't cache the incomplete response
+        self.search_failed = False
+    
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query via the shared batcher so concurrent searches share a model call"""
+        return await self.vector_store.embed_query(query)
     
     async def semantic_search(
         self,
         query: str,
         limit: int = 10,
         offset: int = 0,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[SearchResultSchema]:
         """Perform semantic search using vector similarity"""
         try:
@@ -28,21 +131,27 @@ class SearchEngine:
             vector_results = await self.vector_store.semantic_search(
                 query=query,
                 limit=limit + offset,
-                filters=filters
+                filters=filters,
+                query_embedding=query_embedding
             )
             
             # Convert to SearchResult schema and apply offset
+            page = vector_results[offset:offset + limit]
+            documents = await self._documents_by_id(result['document_id'] for result in page)
+            chunk_ids = await self._chunk_ids_by_vector_id(
+                chunk_vector_id(result['document_id'], result['chunk_index']) for result in page
+            )
+            term_pattern = query_term_pattern(query)
+            
             search_results = []
-            for i, result in enumerate(vector_results[offset:offset + limit]):
-                # Get document information from database
-                document = self.db.query(Document).filter(
-                    Document.id == result['document_id']
-                ).first()
+            for result in page:
+                document = documents.get(result['document_id'])
                 
                 if document:
-                    search_result = SearchResultSchema(
+                    # Values come from our own index and database, so skip validation
+                    search_result = SearchResultSchema.model_construct(
                         document_id=result['document_id'],
-                        chunk_id=result.get('chunk_index'),
+                        chunk_id=chunk_ids.get(chunk_vector_id(result['document_id'], result['chunk_index'])),
                         document_title=document.title or document.original_filename,
                         document_type=document.document_type,
                         jurisdiction=document.jurisdiction,
@@ -50,7 +159,7 @@ class SearchEngine:
                         semantic_score=result['similarity_score'],
                         keyword_score=None,
                         final_score=result['similarity_score'],
-                        highlighted_text=self._highlight_text(result['text'], query),
+                        highlighted_text=self._highlight_text(result['text'], term_pattern),
                         legal_concepts=result.get('legal_concepts', []),
                         citations=result.get('citations', []),
                         page_number=result.get('page_number'),
@@ -59,12 +168,13 @@ class SearchEngine:
                     search_results.append(search_result)
             
             # Log search for analytics
-            await self._log_search(query, search_results, "semantic")
+            log_search(query, search_results, "semantic")
             
             return search_results
             
         except Exception as e:
             logger.error(f"Error in semantic search: {str(e)}")
+            self.search_failed = True
             return []
     
     async def keyword_search(
@@ -76,48 +186,77 @@ class SearchEngine:
     ) -> List[SearchResultSchema]:
         """Perform keyword search using database text matching"""
         try:
-            # Build database query
-            db_query = self.db.query(DocumentChunk).join(Document)
+            # Build database query; the chunk's document is read for every result and
+            # is already joined for filtering, so hydrate it from that same join
+            db_query = select(DocumentChunk).join(DocumentChunk.document).join(DocumentChunk.body).options(
+                contains_eager(DocumentChunk.document),
+                contains_eager(DocumentChunk.body)
+            )
             
             # Add text search conditions
             search_terms = query.split()
+            term_pattern = query_term_pattern(query)
             text_conditions = []
+            rank = None
+            
+            dialect_name = self.db.bind.dialect.name
+            if dialect_name == "postgresql" and search_terms:
+                # Chunk text goes through the full-text index, matching any term,
+                # and is ranked in the database; normalization 32 scales to [0, 1)
+                ts_query = reduce(
+                    lambda left, right: left.op('||')(right),
+                    [func.plainto_tsquery(TEXT_SEARCH_CONFIG, term) for term in search_terms]
+                )
+                text_vector = text_search_vector(ChunkBody.text)
+                text_conditions.append(text_vector.op('@@')(ts_query))
+                rank = func.ts_rank_cd(text_vector, ts_query, 32)
             
             for term in search_terms:
-                term_condition = or_(
-                    DocumentChunk.text.ilike(f'%{term}%'),
+                term_conditions = [
                     Document.title.ilike(f'%{term}%'),
-                    Document.legal_concepts.contains([term]),
-                    Document.citations.contains([term])
-                )
-                text_conditions.append(term_condition)
+                    json_array_contains(Document.legal_concepts, [term], dialect_name),
+                    json_array_contains(Document.citations, [term], dialect_name)
+                ]
+                if rank is None:
+                    term_conditions.append(ChunkBody.text.ilike(f'%{term}%'))
+                text_conditions.append(or_(*term_conditions))
             
             if text_conditions:
-                db_query = db_query.filter(or_(*text_conditions))
+                db_query = db_query.where(or_(*text_conditions))
             
             # Apply filters
             if filters:
                 if filters.get('document_type'):
-                    db_query = db_query.filter(Document.document_type.in_(filters['document_type']))
+                    db_query = db_query.where(Document.document_type.in_(filters['document_type']))
                 if filters.get('jurisdiction'):
-                    db_query = db_query.filter(Document.jurisdiction.in_(filters['jurisdiction']))
+                    db_query = db_query.where(Document.jurisdiction.in_(filters['jurisdiction']))
+                if filters.get('legal_concepts'):
+                    db_query = db_query.where(
+                        json_array_contains(Document.legal_concepts, filters['legal_concepts'], dialect_name)
+                    )
+                if filters.get('citations'):
+                    db_query = db_query.where(
+                        json_array_contains(Document.citations, filters['citations'], dialect_name)
+                    )
                 if filters.get('date_range'):
-                    date_range = filters['date_range']
-                    if date_range.get('start'):
-                        db_query = db_query.filter(Document.date_published >= date_range['start'])
-                    if date_range.get('end'):
-                        db_query = db_query.filter(Document.date_published <= date_range['end'])
-            
-            # Apply pagination and get results
-            chunks = db_query.offset(offset).limit(limit).all()
+                    date_condition = self._date_range_condition(filters['date_range'])
+                    if date_condition is not None:
+                        db_query = db_query.where(date_condition)
+            
+            # Apply ranking and pagination and get results
+            if rank is not None:
+                db_query = db_query.add_columns(rank).order_by(rank.desc(), DocumentChunk.id)
+                scored_chunks = (await self.db.execute(db_query.offset(offset).limit(limit))).all()
+            else:
+                chunks = (await self.db.scalars(db_query.offset(offset).limit(limit))).all()
+                scored_chunks = [
+                    (chunk, self._calculate_keyword_score(chunk.text, term_pattern)) for chunk in chunks
+                ]
             
             # Convert to SearchResult schema
             search_results = []
-            for chunk in chunks:
-                # Calculate keyword score
-                keyword_score = self._calculate_keyword_score(chunk.text, search_terms)
-                
-                search_result = SearchResultSchema(
+            for chunk, keyword_score in scored_chunks:
+                search_result = SearchResultSchema.model_construct(
                     document_id=chunk.document_id,
                     chunk_id=chunk.id,
                     document_title=chunk.document.title or chunk.document.original_filename,
@@ -127,7 +266,7 @@ class SearchEngine:
                     semantic_score=None,
                     keyword_score=keyword_score,
                     final_score=keyword_score,
-                    highlighted_text=self._highlight_text(chunk.text, query),
+                    highlighted_text=self._highlight_text(chunk.text, term_pattern),
                     legal_concepts=chunk.legal_concepts or [],
                     citations=chunk.citations or [],
                     page_number=chunk.page_number,
@@ -135,16 +274,18 @@ class SearchEngine:
                 )
                 search_results.append(search_result)
             
-            # Sort by keyword score
-            search_results.sort(key=lambda x: x.keyword_score or 0, reverse=True)
+            # Without database ranking, sort the page by keyword score
+            if rank is None:
+                search_results.sort(key=lambda x: x.keyword_score or 0, reverse=True)
             
             # Log search for analytics
-            await self._log_search(query, search_results, "keyword")
+            log_search(query, search_results, "keyword")
             
             return search_results
             
         except Exception as e:
             logger.error(f"Error in keyword search: {str(e)}")
+            self.search_failed = True
             return []
     
     async def hybrid_search(
@@ -153,38 +294,56 @@ class SearchEngine:
         limit: int = 10,
         offset: int = 0,
         filters: Optional[Dict[str, Any]] = None,
-        semantic_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        alpha: float = 0.7,
+        fusion_method: str = "convex",
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[SearchResultSchema]:
-        """Perform hybrid search combining semantic and keyword approaches"""
+        """Perform hybrid search combining semantic and keyword approaches
+        
+        ``fusion_method`` "convex" min-max normalizes both score lists over the
+        candidates and mixes them as alpha * semantic + (1 - alpha) * keyword;
+        "rrf" uses reciprocal rank fusion and ignores the raw scores.
+        """
         try:
-            # Get results from both approaches
-            semantic_results = await self.semantic_search(query, limit * 2, 0, filters)
-            keyword_results = await self.keyword_search(query, limit * 2, 0, filters)
+            # Get results from both approaches concurrently
+            semantic_results, keyword_results = await asyncio.gather(
+                self.semantic_search(query, limit * 2, 0, filters, query_embedding),
+                self._keyword_search_own_session(query, limit * 2, filters)
+            )
+            
+            if fusion_method == "rrf":
+                semantic_fused = [1.0 / (RRF_K + rank) for rank in range(1, len(semantic_results) + 1)]
+                keyword_fused = [1.0 / (RRF_K + rank) for rank in range(1, len(keyword_results) + 1)]
+            else:
+                semantic_fused = [
+                    alpha * score
+                    for score in _min_max([result.semantic_score or 0 for result in semantic_results])
+                ]
+                keyword_fused = [
+                    (1 - alpha) * score
+                    for score in _min_max([result.keyword_score or 0 for result in keyword_results])
+                ]
             
             # Combine results
             combined_results = {}
             
             # Add semantic results
-            for result in semantic_results:
+            for result, fused in zip(semantic_results, semantic_fused):
                 key = f"{result.document_id}_{result.chunk_id}"
                 combined_results[key] = result
-                result.final_score = (result.semantic_score or 0) * semantic_weight
+                result.final_score = fused
             
             # Add or update with keyword results
-            for result in keyword_results:
+            for result, fused in zip(keyword_results, keyword_fused):
                 key = f"{result.document_id}_{result.chunk_id}"
                 if key in combined_results:
                     # Update existing result
                     combined_results[key].keyword_score = result.keyword_score
-                    combined_results[key].final_score = (
-                        (combined_results[key].semantic_score or 0) * semantic_weight +
-                        (result.keyword_score or 0) * keyword_weight
-                    )
+                    combined_results[key].final_score += fused
                 else:
                     # Add new result
                     combined_results[key] = result
-                    result.final_score = (result.keyword_score or 0) * keyword_weight
+                    result.final_score = fused
             
             # Sort by final score and apply pagination
             sorted_results = sorted(
@@ -196,14 +355,28 @@ class SearchEngine:
             paginated_results = sorted_results[offset:offset + limit]
             
             # Log search for analytics
-            await self._log_search(query, paginated_results, "hybrid")
+            log_search(query, paginated_results, "hybrid")
             
             return paginated_results
             
         except Exception as e:
             logger.error(f"Error in hybrid search: {str(e)}")
+            self.search_failed = True
             return []
     
+    async def _keyword_search_own_session(
+        self,
+        query: str,
+        limit: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[SearchResultSchema]:
+        # A session runs one statement at a time, so a concurrent search needs its own
+        async with AsyncSessionLocal() as db:
+            engine = SearchEngine(db, vector_store=self.vector_store)
+            results = await engine.keyword_search(query, limit, 0, filters)
+        self.search_failed = self.search_failed or engine.search_failed
+        return results
+    
     async def search_citations(
         self,
         citation: str,
@@ -212,32 +385,56 @@ class SearchEngine:
         """Search for specific legal citations"""
         try:
             citation_results = []
+            citation_norm = normalize_citation(citation)
             
             if exact_match:
-                # Exact citation matching
-                chunks = self.db.query(DocumentChunk).join(Document).filter(
-                    or_(
-                        DocumentChunk.text.contains(citation),
-                        DocumentChunk.citations.contains([citation])
+                chunk_filter = or_(
+                    ChunkBody.text.contains(citation),
+                    json_array_contains(
+                        DocumentChunk.citations, [citation], self.db.bind.dialect.name
+                    )
+                )
+                # When ingest extracted this exact citation, only the documents linked to
+                # it can match; forms the extractor doesn't produce fall back to a text scan
+                citation_id = await self.db.scalar(
+                    select(Citation.id).where(Citation.text_norm == citation_norm)
+                )
+                if citation_id is not None:
+                    chunk_filter = and_(
+                        DocumentChunk.document_id.in_(
+                            select(document_citations.c.document_id).where(
+                                document_citations.c.citation_id == citation_id
+                            )
+                        ),
+                        chunk_filter
                     )
-                ).all()
             else:
-                # Fuzzy citation matching
-                citation_terms = citation.split()
-                conditions = []
-                for term in citation_terms:
-                    conditions.append(DocumentChunk.text.ilike(f'%{term}%'))
-                
-                chunks = self.db.query(DocumentChunk).join(Document).filter(
-                    and_(*conditions)
-                ).all()
+                # Fuzzy citation matching: every term must appear in the chunk
+                citation_terms = citation_norm.split()
+                if not citation_terms:
+                    return []
+                chunk_filter = and_(*[
+                    ChunkBody.text.ilike(f'%{term}%') for term in citation_terms
+                ])
+            
+            chunks = (await self.db.scalars(
+                select(DocumentChunk).join(DocumentChunk.body).options(
+                    joinedload(DocumentChunk.document),
+                    contains_eager(DocumentChunk.body)
+                ).where(chunk_filter)
+            )).all()
+            
+            # Built once so each chunk is scanned a single time for all citation terms
+            citation_automaton = None if exact_match else term_automaton(citation.split())
             
             for chunk in chunks:
                 # Extract citation context
                 context = self._extract_citation_context(chunk.text, citation)
-                confidence_score = 1.0 if exact_match else self._calculate_citation_confidence(chunk.text, citation)
+                confidence_score = 1.0 if exact_match else self._calculate_citation_confidence(
+                    chunk.text, citation_automaton
+                )
                 
-                citation_result = CitationResult(
+                citation_result = CitationResult.model_construct(
                     citation=citation,
                     document_id=chunk.document_id,
                     document_title=chunk.document.title or chunk.document.original_filename,
@@ -263,17 +460,20 @@ class SearchEngine:
     ) -> List[Dict[str, Any]]:
         """Find documents similar to a given document"""
         try:
-            # Get document chunks
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).limit(3).all()  # Use first few chunks as representation
-            
-            if not chunks:
+            # Use the first chunk's vector as the document's representation
+            vector_id = (await self.db.scalars(
+                select(DocumentChunk.vector_id).where(
+                    DocumentChunk.document_id == document_id,
+                    DocumentChunk.vector_id.isnot(None)
+                ).order_by(DocumentChunk.chunk_index).limit(1)
+            )).first()
+            
+            if not vector_id:
                 return []
             
             # Use the first chunk for similarity search
             similar_results = await self.vector_store.find_similar_chunks(
-                chunk_id=f"doc_{chunks[0].document_id}_chunk_{chunks[0].chunk_index}",
+                chunk_id=vector_id,
                 limit=limit * 3  # Get more to filter by document
             )
             
@@ -287,9 +487,10 @@ class SearchEngine:
                     document_scores[doc_id].append(result['similarity_score'])
             
             # Calculate average similarity per document
+            documents = await self._documents_by_id(document_scores)
             similar_docs = []
             for doc_id, scores in document_scores.items():
-                document = self.db.query(Document).filter(Document.id == doc_id).first()
+                document = documents.get(doc_id)
                 if document:
                     avg_score = sum(scores) / len(scores)
                     similar_docs.append({
@@ -316,36 +517,19 @@ class SearchEngine:
     ) -> List[str]:
         """Get search suggestions based on query"""
         try:
-            suggestions = []
-            
-            # Get legal concepts from documents that might be relevant
-            legal_concepts = self.db.query(Document.legal_concepts).filter(
-                Document.legal_concepts.isnot(None)
-            ).all()
+            # Unnest and match legal concepts in the database so only matches come back
+            concepts = json_array_elements(Document.legal_concepts, self.db.bind.dialect.name)
+            suggestions = list((await self.db.scalars(
+                select(concepts.c.value).distinct().select_from(Document).join(concepts, true()).where(
+                    concepts.c.value.icontains(query, autoescape=True)
+                ).limit(limit)
+            )).all())
             
-            # Flatten and filter concepts
-            all_concepts = []
-            for concepts_list in legal_concepts:
-                if concepts_list[0]:  # concepts_list is a tuple
-                    all_concepts.extend(concepts_list[0])
-            
-            # Find matching concepts
             query_lower = query.lower()
-            matching_concepts = [
-                concept for concept in set(all_concepts)
-                if query_lower in concept.lower()
-            ]
-            
-            suggestions.extend(matching_concepts[:limit])
             
             # Add common legal terms if needed
-            common_terms = [
-                "contract law", "tort law", "criminal law", "constitutional law",
-                "property law", "evidence", "procedure", "jurisdiction"
-            ]
-            
-            for term in common_terms:
-                if query_lower in term.lower() and term not in suggestions:
+            for term in COMMON_LEGAL_TERMS:
+                if query_lower in term and term not in suggestions:
                     suggestions.append(term)
                     if len(suggestions) >= limit:
                         break
@@ -354,28 +538,39 @@ class SearchEngine:
             
         except Exception as e:
             logger.error(f"Error getting suggestions: {str(e)}")
+            self.search_failed = True
             return []
     
     async def get_available_filters(self) -> Dict[str, List[str]]:
         """Get available filter options"""
+        cached = _filters_cache.get("filters")
+        if cached is not None:
+            return cached
+        
         try:
             # Get unique document types
-            doc_types = self.db.query(Document.document_type).distinct().filter(
-                Document.document_type.isnot(None)
-            ).all()
+            doc_types = (await self.db.execute(
+                select(Document.document_type).distinct().where(
+                    Document.document_type.isnot(None)
+                )
+            )).all()
             
             # Get unique jurisdictions
-            jurisdictions = self.db.query(Document.jurisdiction).distinct().filter(
-                Document.jurisdiction.isnot(None)
-            ).all()
+            jurisdictions = (await self.db.execute(
+                select(Document.jurisdiction).distinct().where(
+                    Document.jurisdiction.isnot(None)
+                )
+            )).all()
             
             # Get date range
-            date_range = self.db.query(
-                func.min(Document.date_published),
-                func.max(Document.date_published)
-            ).first()
+            date_range = (await self.db.execute(
+                select(
+                    func.min(Document.date_published),
+                    func.max(Document.date_published)
+                )
+            )).first()
             
-            return {
+            available_filters = {
                 "document_types": [dt[0] for dt in doc_types if dt[0]],
                 "jurisdictions": [j[0] for j in jurisdictions if j[0]],
                 "date_range": {
@@ -383,6 +578,8 @@ class SearchEngine:
                     "max": date_range[1].isoformat() if date_range[1] else None
                 }
             }
+            _filters_cache["filters"] = available_filters
+            return available_filters
             
         except Exception as e:
             logger.error(f"Error getting filters: {str(e)}")
@@ -422,9 +619,11 @@ class SearchEngine:
             suggestions = []
             
             # Search in document titles
-            title_matches = self.db.query(Document.title).filter(
-                Document.title.ilike(f'%{query}%')
-            ).limit(limit // 2).all()
+            title_matches = (await self.db.execute(
+                select(Document.title).where(
+                    Document.title.ilike(f'%{query}%')
+                ).limit(limit // 2)
+            )).all()
             
             suggestions.extend([title[0] for title in title_matches if title[0]])
             
@@ -436,27 +635,127 @@ class SearchEngine:
             
         except Exception as e:
             logger.error(f"Error getting autocomplete suggestions: {str(e)}")
+            self.search_failed = True
             return []
     
     async def get_document_content(self, document_id: int) -> Optional[str]:
         """Get full content of a document"""
         try:
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).order_by(DocumentChunk.chunk_index).all()
-            
-            if chunks:
-                return "\n\n".join([chunk.text for chunk in chunks])
+            texts = (await self.db.scalars(
+                select(ChunkBody.text).select_from(DocumentChunk).join(DocumentChunk.body).where(
+                    DocumentChunk.document_id == document_id
+                ).order_by(DocumentChunk.chunk_index)
+            )).all()
+            
+            if texts:
+                return "\n\n".join(texts)
             return None
             
         except Exception as e:
             logger.error(f"Error getting document content: {str(e)}")
             return None
     
+    async def bulk_store_chunks(self, document_id: int, chunks: List[Dict[str, Any]]) -> int:
+        """Replace a document's chunks with a single executemany insert"""
+        try:
+            rows = []
+            bodies: Dict[bytes, str] = {}
+            for chunk in chunks:
+                row = {**chunk, "document_id": document_id}
+                text = row.pop("text")
+                row["text_sha256"] = chunk_text_sha256(text)
+                bodies[row["text_sha256"]] = text
+                rows.append(row)
+            
+            # Reprocessing a document replaces its previous chunks
+            old_bodies = (await self.db.scalars(
+                delete(DocumentChunk).where(
+                    DocumentChunk.document_id == document_id
+                ).returning(DocumentChunk.text_sha256)
+            )).all()
+            
+            if rows:
+                # Repeated boilerplate is stored once; existing bodies are reused
+                await self.db.execute(
+                    dialect_insert(self.db)(ChunkBody).on_conflict_do_nothing(index_elements=["sha256"]),
+                    [{"sha256": sha256, "text": text} for sha256, text in bodies.items()]
+                )
+                await self.db.execute(insert(DocumentChunk), rows)
+            if old_bodies:
+                await self.db.execute(delete_unreferenced_chunk_bodies(old_bodies))
+            await self.db.commit()
+            
+            return len(rows)
+            
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error storing chunks for document {document_id}: {str(e)}")
+            raise
+    
+    async def store_document_citations(self, document_id: int, citations: List[str]) -> int:
+        """Replace a document's links in the normalized citation tables"""
+        try:
+            # First spelling seen wins for each normalized citation
+            by_norm: Dict[str, str] = {}
+            for citation in citations:
+                by_norm.setdefault(normalize_citation(citation), citation)
+            by_norm.pop("", None)
+            
+            await self.db.execute(
+                delete(document_citations).where(document_citations.c.document_id == document_id)
+            )
+            
+            if by_norm:
+                await self.db.execute(
+                    dialect_insert(self.db)(Citation).values([
+                        {"text": text, "text_norm": text_norm} for text_norm, text in by_norm.items()
+                    ]).on_conflict_do_nothing(index_elements=["text_norm"])
+                )
+                citation_ids = (await self.db.scalars(
+                    select(Citation.id).where(Citation.text_norm.in_(list(by_norm)))
+                )).all()
+                await self.db.execute(insert(document_citations), [
+                    {"document_id": document_id, "citation_id": citation_id}
+                    for citation_id in citation_ids
+                ])
+            await self.db.commit()
+            
+            return len(by_norm)
+            
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Error storing citations for document {document_id}: {str(e)}")
+            raise
+    
+    async def get_document_contents(self, document_ids: List[int]) -> Dict[int, str]:
+        """Get full content for several documents in a single query"""
+        try:
+            if not document_ids:
+                return {}
+            
+            rows = (await self.db.execute(
+                select(DocumentChunk.document_id, ChunkBody.text).join(DocumentChunk.body).where(
+                    DocumentChunk.document_id.in_(document_ids)
+                ).order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+            )).all()
+            
+            texts_by_document: Dict[int, List[str]] = {}
+            for document_id, text in rows:
+                texts_by_document.setdefault(document_id, []).append(text)
+            
+            return {
+                document_id: "\n\n".join(texts)
+                for document_id, texts in texts_by_document.items()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting document contents: {str(e)}")
+            return {}
+    
     async def get_document_by_id(self, document_id: int) -> Optional[Document]:
         """Get document by ID"""
         try:
-            return self.db.query(Document).filter(Document.id == document_id).first()
+            return await self.db.get(Document, document_id)
         except Exception as e:
             logger.error(f"Error getting document: {str(e)}")
             return None
@@ -464,43 +763,63 @@ class SearchEngine:
     async def get_documents_by_ids(self, document_ids: List[int]) -> List[str]:
         """Get document contents by IDs"""
         try:
-            documents = []
-            for doc_id in document_ids:
-                content = await self.get_document_content(doc_id)
-                if content:
-                    documents.append(content)
-            return documents
+            contents = await self.get_document_contents(document_ids)
+            return [contents[doc_id] for doc_id in document_ids if doc_id in contents]
         except Exception as e:
             logger.error(f"Error getting documents by IDs: {str(e)}")
             return []
     
-    def _highlight_text(self, text: str, query: str) -> str:
+    async def _documents_by_id(self, document_ids: Iterable[int]) -> Dict[int, Document]:
+        """Load several documents in one query, keyed by id"""
+        ids = set(document_ids)
+        if not ids:
+            return {}
+        documents = (await self.db.scalars(select(Document).where(Document.id.in_(ids)))).all()
+        return {document.id: document for document in documents}
+    
+    async def _chunk_ids_by_vector_id(self, vector_ids: Iterable[str]) -> Dict[str, int]:
+        """Map vector store ids to chunk row ids in one query"""
+        ids = set(vector_ids)
+        if not ids:
+            return {}
+        rows = (await self.db.execute(
+            select(DocumentChunk.vector_id, DocumentChunk.id).where(DocumentChunk.vector_id.in_(ids))
+        )).all()
+        return {vector_id: chunk_id for vector_id, chunk_id in rows}
+    
+    def _date_range_condition(self, date_range: Dict[str, Any]):
+        """Translate a start/end (or gte/lte) date filter into one range predicate"""
+        start = date_range.get('gte') or date_range.get('start')
+        end = date_range.get('lte') or date_range.get('end')
+        start = datetime.fromisoformat(start) if isinstance(start, str) else start
+        end = datetime.fromisoformat(end) if isinstance(end, str) else end
+        
+        if start and end:
+            return Document.date_published.between(start, end)
+        if start:
+            return Document.date_published >= start
+        if end:
+            return Document.date_published <= end
+        return None
+    
+    def _highlight_text(self, text: str, term_pattern: Optional[re.Pattern]) -> str:
         """Highlight search terms in text"""
         try:
-            highlighted = text
-            terms = query.split()
-            
-            for term in terms:
-                pattern = re.compile(re.escape(term), re.IGNORECASE)
-                highlighted = pattern.sub(f"<mark>{term}</mark>", highlighted)
-            
-            return highlighted
+            if term_pattern is None:
+                return text
+            return term_pattern.sub(r"<mark>\g<0></mark>", text)
         except:
             return text
     
-    def _calculate_keyword_score(self, text: str, search_terms: List[str]) -> float:
+    def _calculate_keyword_score(self, text: str, term_pattern: Optional[re.Pattern]) -> float:
         """Calculate keyword relevance score"""
         try:
-            text_lower = text.lower()
-            total_words = len(text_lower.split())
-            score = 0.0
+            if term_pattern is None:
+                return 0.0
+            total_words = len(text.split())
+            count = sum(1 for _ in term_pattern.finditer(text))
             
-            for term in search_terms:
-                term_lower = term.lower()
-                count = text_lower.count(term_lower)
-                score += count / total_words
-            
-            return min(score, 1.0)
+            return min(count / max(total_words, 1), 1.0)
         except:
             return 0.0
     
@@ -526,43 +845,17 @@ class SearchEngine:
         except:
             return text[:200] + "..." if len(text) > 200 else text
     
-    def _calculate_citation_confidence(self, text: str, citation: str) -> float:
+    def _calculate_citation_confidence(
+        self,
+        text: str,
+        citation_automaton: Optional[ahocorasick.Automaton]
+    ) -> float:
         """Calculate confidence score for citation match"""
         try:
-            citation_terms = citation.split()
-            text_lower = text.lower()
+            if citation_automaton is None:
+                return 0.0
             
-            matches = 0
-            for term in citation_terms:
-                if term.lower() in text_lower:
-                    matches += 1
-            
-            return matches / len(citation_terms) if citation_terms else 0.0
+            matches = {term for _, term in citation_automaton.iter(text.lower())}
+            return len(matches) / len(citation_automaton)
         except:
             return 0.0
-    
-    async def _log_search(
-        self,
-        query: str,
-        results: List[SearchResultSchema],
-        search_type: str
-    ):
-        """Log search for analytics"""
-        try:
-            # Save search results to database for analytics
-            for result in results:
-                search_result = SearchResult(
-                    query=query,
-                    document_id=result.document_id,
-                    chunk_id=result.chunk_id,
-                    semantic_score=result.semantic_score,
-                    keyword_score=result.keyword_score,
-                    final_score=result.final_score,
-                    search_type=search_type
-                )
-                self.db.add(search_result)
-            
-            self.db.commit()
-        except Exception as e:
-            logger.error(f"Error logging search: {str(e)}")
-            # Don't raise error as this is non-critical 
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Search analytics logging, kept off the search request path
+
+Searches append one entry to a Redis Stream and return immediately. A
+SearchLogFlusher in each API process reads the stream through a consumer
+group and batch-inserts the entries into search_results. When Redis is
+unavailable, entries are written straight to the database in a background
+task instead.
+"""
+import asyncio
+import hashlib
+import os
+import socket
+from typing import Any, Dict, List, Optional, Set, Tuple
+import orjson
+import redis.asyncio as redis
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, dialect_insert
+from app.models.document import QueryLog, SearchResult
+
+CONSUMER_GROUP = "search-log-writers"
+READ_BATCH_SIZE = 500
+STALE_ENTRY_MS = 60_000
+MAX_RETRY_INTERVAL_SECONDS = 60.0
+
+# Keep references so fire-and-forget tasks aren't garbage collected mid-flight
+_pending_tasks: Set[asyncio.Task] = set()
+
+def log_search(query: str, results: List[Any], search_type: str):
+    """Queue a search and its results for analytics without waiting on I/O"""
+    if not results:
+        return
+    
+    entry = {
+        "q": query,
+        "type": search_type,
+        "hits": orjson.dumps([
+            [r.document_id, r.chunk_id, r.semantic_score, r.keyword_score, r.final_score]
+            for r in results
+        ])
+    }
+    task = asyncio.create_task(_publish(entry))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+async def _publish(entry: Dict[str, Any]):
+    client = get_redis()
+    if client is not None:
+        try:
+            await client.xadd(
+                settings.SEARCH_LOG_STREAM,
+                entry,
+                maxlen=settings.SEARCH_LOG_STREAM_MAXLEN,
+                approximate=True
+            )
+            return
+        except Exception as e:
+            logger.warning(f"Search log stream unavailable, writing directly: {str(e)}")
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            await write_search_logs(db, [entry])
+    except Exception as e:
+        logger.error(f"Error logging search: {str(e)}")
+
+async def get_query_id(db: AsyncSession, query: str) -> int:
+    """Get the id of a logged query, storing its text once"""
+    text_sha1 = hashlib.sha1(query.encode()).digest()
+    lookup = select(QueryLog.id).where(QueryLog.text_sha1 == text_sha1)
+    
+    query_id = await db.scalar(lookup)
+    if query_id is not None:
+        return query_id
+    
+    # Concurrent searches for the same new query may race; let one insert win
+    await db.execute(
+        dialect_insert(db)(QueryLog)
+        .values(text_sha1=text_sha1, text=query)
+        .on_conflict_do_nothing(index_elements=["text_sha1"])
+    )
+    return await db.scalar(lookup)
+
+async def write_search_logs(db: AsyncSession, entries: List[Dict[str, Any]]) -> int:
+    """Insert logged searches into search_results with one executemany
+    
+    If the batch violates a constraint (e.g. a hit on a document deleted while
+    the entry was queued), entries are retried one per savepoint and the ones
+    that still fail are dropped. Other errors propagate so nothing is lost
+    while the database is unreachable.
+    """
+    try:
+        count = await _insert_search_logs(db, entries)
+        await db.commit()
+        return count
+    except (IntegrityError, DataError) as e:
+        await db.rollback()
+        if len(entries) == 1:
+            logger.warning(f"Dropping search log entry for {_as_str(entries[0]['q'])!r}: {str(e)}")
+            return 0
+        logger.warning(f"Search log batch rejected, writing entries one by one: {str(e)}")
+    
+    count = 0
+    for entry in entries:
+        try:
+            async with db.begin_nested():
+                count += await _insert_search_logs(db, [entry])
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"Dropping search log entry for {_as_str(entry['q'])!r}: {str(e)}")
+    await db.commit()
+    return count
+
+async def _insert_search_logs(db: AsyncSession, entries: List[Dict[str, Any]]) -> int:
+    rows = []
+    query_ids: Dict[str, int] = {}
+    for entry in entries:
+        query = _as_str(entry["q"])
+        if query not in query_ids:
+            query_ids[query] = await get_query_id(db, query)
+        search_type = _as_str(entry["type"])
+        
+        for document_id, chunk_id, semantic_score, keyword_score, final_score in orjson.loads(entry["hits"]):
+            rows.append({
+                "query_id": query_ids[query],
+                "document_id": document_id,
+                "chunk_id": chunk_id,
+                "semantic_score": semantic_score,
+                "keyword_score": keyword_score,
+                "final_score": final_score,
+                "search_type": search_type
+            })
+    
+    if rows:
+        await db.execute(insert(SearchResult), rows)
+    return len(rows)
+
+def _as_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class SearchLogFlusher:
+    """Drains the search log stream into the database in batches"""
+    
+    def __init__(self, interval_seconds: float = settings.SEARCH_LOG_FLUSH_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._client: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start flushing in the background on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop flushing; unacknowledged entries are picked up on the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _run(self):
+        # A dedicated client: blocking reads would trip the cache client's short timeouts
+        self._client = redis.from_url(settings.REDIS_URL)
+        ready = False
+        # Replay entries this consumer holds but never acknowledged, then take new ones
+        stream_id = "0"
+        delay = self.interval_seconds
+        
+        while True:
+            try:
+                if not ready:
+                    await self._prepare()
+                    ready = True
+                entries = await self._read(stream_id)
+                if entries:
+                    await self._flush(entries)
+                elif stream_id == "0":
+                    stream_id = ">"
+                delay = self.interval_seconds
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis or the database is down: back off, then replay what is still pending
+                logger.error(f"Error flushing search log, retrying in {delay:.0f}s: {str(e)}")
+                stream_id = "0"
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_INTERVAL_SECONDS)
+                continue
+            
+            await asyncio.sleep(self.interval_seconds)
+    
+    async def _prepare(self):
+        try:
+            await self._client.xgroup_create(
+                settings.SEARCH_LOG_STREAM, CONSUMER_GROUP, id="0", mkstream=True
+            )
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        
+        # Take over entries left unacknowledged by consumers that have since exited
+        await self._client.xautoclaim(
+            settings.SEARCH_LOG_STREAM,
+            CONSUMER_GROUP,
+            self.consumer,
+            min_idle_time=STALE_ENTRY_MS,
+            count=READ_BATCH_SIZE
+        )
+    
+    async def _read(self, stream_id: str) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        response = await self._client.xreadgroup(
+            CONSUMER_GROUP,
+            self.consumer,
+            {settings.SEARCH_LOG_STREAM: stream_id},
+            count=READ_BATCH_SIZE
+        )
+        return response[0][1] if response else []
+    
+    async def _flush(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]):
+        async with AsyncSessionLocal() as db:
+            count = await write_search_logs(
+                db,
+                [{key.decode(): value for key, value in fields.items()} for _, fields in entries]
+            )
+        await self._client.xack(
+            settings.SEARCH_LOG_STREAM, CONSUMER_GROUP, *[entry_id for entry_id, _ in entries]
+        )
+        logger.debug("Flushed {} search log entries ({} results)", len(entries), count)
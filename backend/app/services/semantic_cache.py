@@ -0,0 +1,98 @@
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+import numpy as np
+from loguru import logger
+
+from app.core.cache import get_cached_json, get_redis, normalize_query, set_cached_json
+from app.core.config import settings
+
+class SemanticCache:
+    """Response cache that also serves near-duplicate prompts
+
+    Entries are grouped by a scope (everything besides the prompt text that
+    shapes the response, e.g. analysis type and context). A lookup first tries
+    the exact prompt, then compares the prompt's embedding against the most
+    recent entries in the same scope and reuses the closest one above
+    ``threshold`` cosine similarity.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        embed_fn: Callable[[str], Awaitable[np.ndarray]],
+        threshold: float = settings.SEMANTIC_CACHE_THRESHOLD,
+        ttl: int = settings.CACHE_TTL_SECONDS,
+        max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        self.namespace = namespace
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _entry_id(self, text: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\0{normalize_query(text)}".encode()).hexdigest()
+
+    def _value_key(self, entry_id: str) -> str:
+        return f"sem:{self.namespace}:{entry_id}"
+
+    def _index_key(self, scope: str) -> str:
+        return f"sem:{self.namespace}:idx:{hashlib.sha256(scope.encode()).hexdigest()}"
+
+    async def get(self, text: str, scope: str) -> Optional[Any]:
+        """Return the cached value for this prompt or a near-duplicate of it"""
+        cached = await get_cached_json(self._value_key(self._entry_id(text, scope)))
+        if cached is not None:
+            return cached
+
+        client = get_redis()
+        if client is None:
+            return None
+
+        try:
+            # Each index item is a 64-char entry id followed by a float16 embedding
+            items = await client.lrange(self._index_key(scope), 0, -1)
+            if not items:
+                return None
+
+            query = _unit(await self.embed_fn(text))
+            matrix = np.stack([np.frombuffer(item[64:], dtype=np.float16) for item in items])
+            similarities = (matrix.astype(np.float32) @ query) / np.maximum(
+                np.linalg.norm(matrix, axis=1), 1e-12
+            )
+
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            logger.debug("Semantic cache hit in {} (similarity {:.3f})", self.namespace, similarities[best])
+            # The entry may have expired even though it is still in the index
+            return await get_cached_json(self._value_key(items[best][:64].decode()))
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+            return None
+
+    async def set(self, text: str, scope: str, value: Any):
+        """Cache a value for this prompt and index its embedding"""
+        entry_id = self._entry_id(text, scope)
+        await set_cached_json(self._value_key(entry_id), value, self.ttl)
+
+        client = get_redis()
+        if client is None:
+            return
+
+        try:
+            embedding = _unit(await self.embed_fn(text)).astype(np.float16)
+            index_key = self._index_key(scope)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.lpush(index_key, entry_id.encode() + embedding.tobytes())
+                pipe.ltrim(index_key, 0, self.max_entries - 1)
+                pipe.expire(index_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {str(e)}")
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
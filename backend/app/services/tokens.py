@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import List
+import tiktoken
+
+# OpenRouter model ids ("anthropic/claude-3-opus") mostly aren't known to
+# tiktoken; cl100k_base is a close enough approximation for budgeting
+FALLBACK_ENCODING = "cl100k_base"
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Tokenizer for a model, falling back to cl100k_base for unknown models"""
+    try:
+        return tiktoken.encoding_for_model(model.rsplit("/", 1)[-1])
+    except KeyError:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens in text under the model's tokenizer"""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+def fit_tokens(text: str, budget: int, model: str) -> str:
+    """Truncate text to at most ``budget`` tokens"""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:max(budget, 0)])
+
+def fit_context(texts: List[str], budget: int, model: str) -> List[str]:
+    """Truncate texts to share a token budget
+    
+    Texts are fitted shortest first, each to an even share of what is left,
+    so budget unused by short texts goes to the longer ones.
+    """
+    encoding = get_encoding(model)
+    encoded = [encoding.encode(text, disallowed_special=()) for text in texts]
+    fitted = list(texts)
+    remaining = budget
+    order = sorted(range(len(texts)), key=lambda i: len(encoded[i]))
+    for position, i in enumerate(order):
+        share = max(remaining // (len(texts) - position), 0)
+        if len(encoded[i]) > share:
+            fitted[i] = encoding.decode(encoded[i][:share])
+        remaining -= min(len(encoded[i]), share)
+    return fitted
@@ -3,21 +3,100 @@ from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
 from loguru import logger
+import asyncio
 import json
 
 from app.core.config import settings
+from app.core.cache import get_cached_embedding, set_cached_embedding
 from app.models.document import DocumentChunk
+from app.services.batching import AsyncBatcher
+
+@lru_cache(maxsize=None)
+def get_embedding_model(model_name: str = settings.EMBEDDING_MODEL) -> SentenceTransformer:
+    """Load a sentence-transformer once per process and share it"""
+    return SentenceTransformer(model_name)
+
+def encode_texts(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """Embed a list of texts in a single model call"""
+    model = get_embedding_model()
+    cleaned = [text.strip().replace('\n', ' ') for text in texts]
+    embeddings = np.zeros(
+        (len(cleaned), model.get_sentence_embedding_dimension()),
+        dtype=np.float32
+    )
+
+    # Empty strings keep their zero vector, matching generate_embedding
+    non_empty = [i for i, text in enumerate(cleaned) if text]
+    if non_empty:
+        embeddings[non_empty] = model.encode(
+            [cleaned[i] for i in non_empty],
+            batch_size=batch_size,
+            show_progress_bar=False
+        )
+    return embeddings
+
+def quantize_sq8(vector: np.ndarray) -> bytes:
+    """Scalar-quantize a vector to uint8, prefixed with its float32 min and max"""
+    vector = np.asarray(vector, dtype=np.float32)
+    low, high = float(vector.min()), float(vector.max())
+    scale = (high - low) or 1.0
+    codes = np.round((vector - low) / scale * 255).astype(np.uint8)
+    return np.array([low, high], dtype=np.float32).tobytes() + codes.tobytes()
+
+def dequantize_sq8(data: bytes) -> np.ndarray:
+    """Approximate float32 vector from quantize_sq8 output"""
+    low, high = np.frombuffer(data[:8], dtype=np.float32)
+    codes = np.frombuffer(data[8:], dtype=np.uint8)
+    return low + codes.astype(np.float32) / 255 * ((high - low) or 1.0)
+
+def quantize_binary(vector: np.ndarray) -> bytes:
+    """1-bit sign quantization, packed 8 dimensions per byte"""
+    return np.packbits(np.asarray(vector) > 0).tobytes()
+
+async def _encode_query_batch(queries: List[str]) -> List[np.ndarray]:
+    embeddings = await asyncio.to_thread(encode_texts, queries, len(queries))
+    return list(embeddings)
+
+# Concurrent search requests share one encode() call per batch window
+query_embedding_batcher: AsyncBatcher[str, np.ndarray] = AsyncBatcher(
+    _encode_query_batch,
+    max_batch_size=32,
+    max_queue_time_ms=10
+)
+
+# Fields returned by collection queries, in row-per-query form
+QUERY_INCLUDE = ('documents', 'metadatas', 'distances')
+
+@lru_cache(maxsize=1)
+def get_chroma_client():
+    """Create the process-wide ChromaDB client
+    
+    In http mode the client keeps one pooled keep-alive session to the
+    Chroma server instead of reconnecting per request.
+    """
+    if settings.CHROMA_MODE == "http":
+        return chromadb.HttpClient(
+            host=settings.CHROMA_HOST,
+            port=settings.CHROMA_PORT,
+            settings=Settings(anonymized_telemetry=False)
+        )
+    return chromadb.Client(Settings(
+        chroma_db_impl="duckdb+parquet",
+        persist_directory="./chroma_db"
+    ))
+
+def chunk_vector_id(document_id: int, chunk_index: int) -> str:
+    """ID of a chunk's vector in the collection"""
+    return f"doc_{document_id}_chunk_{chunk_index}"
 
 class VectorStore:
     """Handles vector database operations and semantic search"""
     
-    def __init__(self):
-        # Initialize ChromaDB client
-        self.client = chromadb.Client(Settings(
-            chroma_db_impl="duckdb+parquet",
-            persist_directory="./chroma_db"
-        ))
+    def __init__(self, client=None):
+        # Reuse the shared ChromaDB client unless one is injected
+        self.client = client or get_chroma_client()
         
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
@@ -26,51 +105,58 @@ class VectorStore:
         )
         
         # Initialize embedding model
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self.embedding_model = get_embedding_model()
+        
+        # Concurrent unfiltered searches share one multi-vector query per batch window
+        self._query_batcher: AsyncBatcher[Tuple[np.ndarray, int], Dict[str, List[Any]]] = AsyncBatcher(
+            self._query_batch,
+            max_batch_size=32,
+            max_queue_time_ms=5
+        )
         
         logger.info(f"VectorStore initialized with collection: {settings.CHROMA_COLLECTION_NAME}")
     
-    async def add_document_chunks(self, chunks: List[DocumentChunk]) -> bool:
-        """Add document chunks to the vector store"""
+    async def add_document_chunks(
+        self,
+        chunks: List[DocumentChunk],
+        embeddings: Optional[np.ndarray] = None
+    ) -> bool:
+        """Add document chunks to the vector store, embedding them unless given"""
         try:
             if not chunks:
                 return True
             
+            if embeddings is None:
+                embeddings = await asyncio.to_thread(encode_texts, [chunk.text for chunk in chunks])
+            
             # Prepare data for insertion
             texts = []
-            embeddings = []
             metadatas = []
             ids = []
             
             for chunk in chunks:
-                # Generate embedding
-                embedding = await self.generate_embedding(chunk.text)
-                
                 # Prepare metadata
                 metadata = {
                     "document_id": chunk.document_id,
                     "chunk_index": chunk.chunk_index,
                     "page_number": chunk.page_number or 0,
                     "section_title": chunk.section_title or "",
-                    "word_count": chunk.word_count or 0,
-                    "char_count": chunk.char_count or 0,
                     "legal_concepts": json.dumps(chunk.legal_concepts or []),
                     "citations": json.dumps(chunk.citations or []),
                     "importance_score": chunk.importance_score or 0.0
                 }
                 
                 # Create unique ID
-                chunk_id = f"doc_{chunk.document_id}_chunk_{chunk.chunk_index}"
+                chunk_id = chunk_vector_id(chunk.document_id, chunk.chunk_index)
                 
                 texts.append(chunk.text)
-                embeddings.append(embedding.tolist())
                 metadatas.append(metadata)
                 ids.append(chunk_id)
             
             # Add to collection
             self.collection.add(
                 documents=texts,
-                embeddings=embeddings,
+                embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
                 metadatas=metadatas,
                 ids=ids
             )
@@ -98,16 +184,32 @@ class VectorStore:
             logger.error(f"Error generating embedding: {str(e)}")
             return np.zeros(self.embedding_model.get_sentence_embedding_dimension())
     
+    async def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, coalescing concurrent calls into one batch"""
+        try:
+            cached = await get_cached_embedding(settings.EMBEDDING_MODEL, query)
+            if cached is not None:
+                return cached
+            
+            embedding = await query_embedding_batcher.process(query)
+            await set_cached_embedding(settings.EMBEDDING_MODEL, query, embedding)
+            return embedding
+        except Exception as e:
+            logger.error(f"Error generating query embedding: {str(e)}")
+            raise
+    
     async def semantic_search(
         self, 
         query: str, 
         limit: int = 10,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """Perform semantic search using vector similarity"""
         try:
-            # Generate query embedding
-            query_embedding = await self.generate_embedding(query)
+            # Generate query embedding unless the caller already has one
+            if query_embedding is None:
+                query_embedding = await self.embed_query(query)
             
             # Prepare where clause for filtering
             where_clause = {}
@@ -123,40 +225,76 @@ class VectorStore:
                     pass
             
             # Perform search
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=limit,
-                where=where_clause if where_clause else None,
-                include=['documents', 'metadatas', 'distances']
-            )
+            if where_clause:
+                results = await asyncio.to_thread(
+                    self.collection.query,
+                    query_embeddings=[query_embedding.tolist()],
+                    n_results=limit,
+                    where=where_clause,
+                    include=list(QUERY_INCLUDE)
+                )
+                results = {key: results[key][0] for key in QUERY_INCLUDE}
+            else:
+                results = await self._query_batcher.process((query_embedding, limit))
             
             # Format results
             formatted_results = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    metadata = results['metadatas'][0][i]
-                    distance = results['distances'][0][i]
-                    
-                    # Convert distance to similarity score
-                    similarity_score = 1.0 - distance
-                    
-                    formatted_results.append({
-                        'text': doc,
-                        'metadata': metadata,
-                        'similarity_score': similarity_score,
-                        'document_id': metadata.get('document_id'),
-                        'chunk_index': metadata.get('chunk_index'),
-                        'page_number': metadata.get('page_number'),
-                        'legal_concepts': json.loads(metadata.get('legal_concepts', '[]')),
-                        'citations': json.loads(metadata.get('citations', '[]'))
-                    })
-            
-            logger.info(f"Semantic search completed: {len(formatted_results)} results")
+            for doc, metadata, distance in zip(
+                results['documents'], results['metadatas'], results['distances']
+            ):
+                # Convert distance to similarity score
+                similarity_score = 1.0 - distance
+                
+                formatted_results.append({
+                    'text': doc,
+                    'metadata': metadata,
+                    'similarity_score': similarity_score,
+                    'document_id': metadata.get('document_id'),
+                    'chunk_index': metadata.get('chunk_index'),
+                    'page_number': metadata.get('page_number'),
+                    'legal_concepts': json.loads(metadata.get('legal_concepts', '[]')),
+                    'citations': json.loads(metadata.get('citations', '[]'))
+                })
+            
+            logger.debug("Semantic search completed: {} results", len(formatted_results))
             return formatted_results
             
         except Exception as e:
             logger.error(f"Error in semantic search: {str(e)}")
-            return []
+            raise
+    
+    async def _query_batch(self, requests: List[Tuple[np.ndarray, int]]) -> List[Dict[str, List[Any]]]:
+        """Answer several searches with one multi-vector collection query"""
+        results = await asyncio.to_thread(
+            self.collection.query,
+            query_embeddings=np.stack([embedding for embedding, _ in requests]).tolist(),
+            n_results=max(1, max(limit for _, limit in requests)),
+            include=list(QUERY_INCLUDE)
+        )
+        
+        # Each search gets its own row, trimmed to the limit it asked for
+        return [
+            {key: results[key][row][:limit] for key in QUERY_INCLUDE}
+            for row, (_, limit) in enumerate(requests)
+        ]
+    
+    async def get_chunk_embeddings(self, vector_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch stored embeddings for chunks, keyed by vector ID"""
+        try:
+            if not vector_ids:
+                return {}
+            
+            result = await asyncio.to_thread(
+                self.collection.get, ids=vector_ids, include=['embeddings']
+            )
+            return {
+                vector_id: np.asarray(embedding, dtype=np.float32)
+                for vector_id, embedding in zip(result['ids'], result['embeddings'])
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting chunk embeddings: {str(e)}")
+            return {}
     
     async def find_similar_chunks(
         self, 
@@ -166,7 +304,8 @@ class VectorStore:
         """Find chunks similar to a given chunk"""
         try:
             # Get the chunk by ID
-            chunk_result = self.collection.get(
+            chunk_result = await asyncio.to_thread(
+                self.collection.get,
                 ids=[chunk_id],
                 include=['documents', 'metadatas', 'embeddings']
             )
@@ -178,7 +317,8 @@ class VectorStore:
             chunk_embedding = chunk_result['embeddings'][0]
             
             # Search for similar chunks (excluding the original)
-            results = self.collection.query(
+            results = await asyncio.to_thread(
+                self.collection.query,
                 query_embeddings=[chunk_embedding],
                 n_results=limit + 1,  # +1 to account for the original chunk
                 include=['documents', 'metadatas', 'distances']
@@ -188,7 +328,7 @@ class VectorStore:
             formatted_results = []
             if results['documents'] and results['documents'][0]:
                 for i, doc in enumerate(results['documents'][0]):
-                    result_id = f"doc_{results['metadatas'][0][i]['document_id']}_chunk_{results['metadatas'][0][i]['chunk_index']}"
+                    result_id = chunk_vector_id(results['metadatas'][0][i]['document_id'], results['metadatas'][0][i]['chunk_index'])
                     
                     # Skip the original chunk
                     if result_id == chunk_id:
@@ -218,7 +358,7 @@ class VectorStore:
     async def update_chunk_embedding(self, chunk: DocumentChunk) -> bool:
         """Update embedding for a specific chunk"""
         try:
-            chunk_id = f"doc_{chunk.document_id}_chunk_{chunk.chunk_index}"
+            chunk_id = chunk_vector_id(chunk.document_id, chunk.chunk_index)
             
             # Generate new embedding
             embedding = await self.generate_embedding(chunk.text)
@@ -229,8 +369,6 @@ class VectorStore:
                 "chunk_index": chunk.chunk_index,
                 "page_number": chunk.page_number or 0,
                 "section_title": chunk.section_title or "",
-                "word_count": chunk.word_count or 0,
-                "char_count": chunk.char_count or 0,
                 "legal_concepts": json.dumps(chunk.legal_concepts or []),
                 "citations": json.dumps(chunk.citations or []),
                 "importance_score": chunk.importance_score or 0.0
@@ -268,7 +406,7 @@ class VectorStore:
                 # Extract chunk IDs
                 chunk_ids = []
                 for metadata in results['metadatas']:
-                    chunk_id = f"doc_{metadata['document_id']}_chunk_{metadata['chunk_index']}"
+                    chunk_id = chunk_vector_id(metadata['document_id'], metadata['chunk_index'])
                     chunk_ids.append(chunk_id)
                 
                 # Delete chunks
@@ -319,7 +457,7 @@ class VectorStore:
             
             # Add semantic results
             for result in semantic_results:
-                chunk_id = f"doc_{result['document_id']}_chunk_{result['chunk_index']}"
+                chunk_id = chunk_vector_id(result['document_id'], result['chunk_index'])
                 combined_results[chunk_id] = {
                     **result,
                     'semantic_score': result['similarity_score'],
@@ -329,7 +467,7 @@ class VectorStore:
             
             # Add keyword results
             for result in keyword_results:
-                chunk_id = f"doc_{result['document_id']}_chunk_{result['chunk_index']}"
+                chunk_id = chunk_vector_id(result['document_id'], result['chunk_index'])
                 if chunk_id in combined_results:
                     # Update existing result
                     combined_results[chunk_id]['keyword_score'] = result['keyword_score']
@@ -0,0 +1,43 @@
+"""Celery worker for document ingestion
+
+Run with: celery -A app.worker worker --concurrency=N
+"""
+import asyncio
+from celery import Celery
+
+from app.core.config import settings
+
+celery_app = Celery("law_ai", broker=settings.REDIS_URL)
+celery_app.conf.update(
+    task_acks_late=True,
+    worker_prefetch_multiplier=1
+)
+
+# Loaded once per worker process on first task
+_processor = None
+_vector_store = None
+
+@celery_app.task(name="documents.process")
+def process_document_task(document_id: int) -> bool:
+    """Extract, chunk and index a document outside the API process"""
+    global _processor, _vector_store
+    from app.services.document_processor import DocumentProcessor
+    from app.services.vector_store import VectorStore
+    
+    if _processor is None:
+        _processor = DocumentProcessor()
+        _vector_store = VectorStore()
+    
+    return asyncio.run(_run_ingestion(document_id))
+
+async def _run_ingestion(document_id: int) -> bool:
+    from app.core.cache import close_redis
+    from app.core.database import async_engine
+    from app.services.ingestion import ingest_document
+    
+    try:
+        return await ingest_document(document_id, _processor, _vector_store)
+    finally:
+        # Pooled connections and the Redis client are bound to this task's event loop
+        await async_engine.dispose()
+        await close_redis()
@@ -0,0 +1,77 @@
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app.api import analysis
+from app.api.deps import get_ai_analyzer, get_search_engine
+from app.core.config import settings
+
+class FakeSearchEngine:
+    async def get_documents_by_ids(self, document_ids):
+        return ["Context text"]
+
+class FakeAnalyzer:
+    def __init__(self, events):
+        self.events = events
+    
+    async def stream_legal_reasoning(self, **kwargs):
+        for i in range(3):
+            self.events.append(f"yield {i}")
+            yield {"type": "delta", "content": "x" * 600}
+
+@pytest.mark.asyncio
+async def test_stream_deltas_arrive_incrementally_with_gzip(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_ENABLED", False)
+    events = []
+    
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+    app.include_router(analysis.router, prefix="/api/analysis")
+    app.dependency_overrides[get_search_engine] = lambda: FakeSearchEngine()
+    app.dependency_overrides[get_ai_analyzer] = lambda: FakeAnalyzer(events)
+    
+    body = orjson.dumps({"query": "Is this binding?", "context_documents": [1]})
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/analysis/legal-reasoning/stream",
+        "raw_path": b"/api/analysis/legal-reasoning/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"test"),
+            (b"content-type", b"application/json"),
+            (b"accept-encoding", b"gzip"),
+        ],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    received = False
+    
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+    
+    headers = {}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update((key.decode(), value.decode()) for key, value in message["headers"])
+        elif message.get("body"):
+            events.append(message["body"])
+    
+    await app(scope, receive, send)
+    
+    assert headers.get("content-encoding") != "gzip"
+    # Each delta is sent before the next one is generated
+    assert [event if isinstance(event, str) else "sent" for event in events] == [
+        "yield 0", "sent", "yield 1", "sent", "yield 2", "sent"
+    ]
+    assert all(event.startswith(b"event: delta\n") for event in events if isinstance(event, bytes))
@@ -0,0 +1,40 @@
+import asyncio
+
+from app import worker
+from app.core import cache
+from app.core.config import settings
+from app.services import ingestion
+
+class FakeRedis:
+    """Redis client that, like redis.asyncio, only works on the loop it was created on"""
+    
+    def __init__(self, calls):
+        self.loop = asyncio.get_running_loop()
+        self.calls = calls
+    
+    async def incr(self, key):
+        if asyncio.get_running_loop() is not self.loop:
+            raise RuntimeError("attached to a different loop")
+        self.calls.append(key)
+    
+    async def aclose(self):
+        pass
+
+def test_redis_works_across_back_to_back_tasks(monkeypatch):
+    calls = []
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "_redis_client", None)
+    monkeypatch.setattr(cache, "_disabled_until", 0.0)
+    monkeypatch.setattr(cache.redis, "from_url", lambda *args, **kwargs: FakeRedis(calls))
+    
+    async def fake_ingest_document(document_id, processor, vector_store):
+        await cache.bump_generation("generation")
+        return True
+    
+    monkeypatch.setattr(ingestion, "ingest_document", fake_ingest_document)
+    
+    # Celery runs each task under its own asyncio.run()
+    assert asyncio.run(worker._run_ingestion(1))
+    assert asyncio.run(worker._run_ingestion(2))
+    
+    assert calls == ["generation", "generation"]